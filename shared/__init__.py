@@ -0,0 +1,6 @@
+"""
+Módulos compartidos entre snmp-monitor y telegram-bot
+
+Ambos contenedores copian este paquete a /app/shared y comparten el volumen
+/app/data, por lo que aquí vive todo lo que escribe un servicio y lee el otro.
+"""
@@ -0,0 +1,141 @@
+"""
+Canal de control entre servicios por socket Unix de flujo en el volumen compartido
+
+telegram-bot hace peticiones puntuales a snmp-monitor (ej: un sondeo en vivo
+para /status live). Cada conexión lleva una petición y una respuesta, ambas
+como una línea JSON:
+
+    → {"cmd": "status", "device": "ups2"}
+    ← {"ok": true, "message": "...", "data": {...}}
+    ← {"ok": false, "error": "Dispositivo desconocido: ups2"}
+
+A diferencia de notify.py, aquí sí se espera respuesta: si el monitor no
+escucha, el llamador recibe ControlError y decide cómo seguir.
+"""
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Tope de una línea de petición o respuesta
+MAX_LINE = 1024 * 1024
+
+
+class ControlError(Exception):
+    """El monitor no respondió o respondió con un error"""
+
+
+class ControlServer:
+    """Servidor de peticiones de control dentro del event loop del monitor"""
+
+    def __init__(self, socket_path, handlers, timeout=60.0):
+        """
+        Args:
+            socket_path: Ruta del socket Unix
+            handlers: Diccionario cmd -> corrutina handler(request) que retorna
+                un diccionario de respuesta (se le agrega "ok": true); un
+                ValueError se responde como error esperado, sin registrarlo
+            timeout: Segundos máximos por petición
+        """
+        self.socket_path = socket_path
+        self.handlers = handlers
+        self.timeout = timeout
+        self._server = None
+
+    async def start(self):
+        """Abre el socket. Retorna False si no se pudo (el monitor sigue sin control)"""
+        try:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # socket huérfano de una ejecución anterior
+            self._server = await asyncio.start_unix_server(
+                self._handle, path=self.socket_path, limit=MAX_LINE
+            )
+            logger.info(f"Canal de control en {self.socket_path}")
+            return True
+        except OSError as e:
+            logger.warning(f"No se pudo abrir el socket de control {self.socket_path}: {str(e)}")
+            return False
+
+    async def _dispatch(self, line):
+        try:
+            request = json.loads(line)
+            handler = self.handlers.get(request.get('cmd'))
+        except (ValueError, AttributeError):
+            return {'ok': False, 'error': 'Petición inválida'}
+        if handler is None:
+            return {'ok': False, 'error': f"Comando desconocido: {request.get('cmd')}"}
+        try:
+            response = await asyncio.wait_for(handler(request), self.timeout)
+        except asyncio.TimeoutError:
+            return {'ok': False, 'error': 'Tiempo de espera agotado'}
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f"Error en petición de control '{request.get('cmd')}': {str(e)}")
+            return {'ok': False, 'error': str(e)}
+        return dict(response, ok=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            if line:
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            logger.error(f"Error en canal de control: {str(e)}")
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+async def request(socket_path, payload, timeout):
+    """
+    Envía una petición de control y espera la respuesta.
+
+    Args:
+        socket_path: Ruta del socket Unix del monitor
+        payload: Diccionario con al menos 'cmd'
+        timeout: Segundos máximos de espera
+
+    Returns:
+        Diccionario de respuesta (con "ok": true)
+
+    Raises:
+        ControlError: Monitor no disponible, sin respuesta a tiempo o con error
+    """
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(socket_path, limit=MAX_LINE), timeout
+        )
+        writer.write(json.dumps(payload).encode('utf-8') + b'\n')
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        response = json.loads(line) if line else None
+    except asyncio.TimeoutError:
+        raise ControlError('El monitor no respondió a tiempo')
+    except (OSError, ValueError) as e:
+        raise ControlError(f'Monitor no disponible: {str(e)}')
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if not isinstance(response, dict):
+        raise ControlError('Respuesta vacía del monitor')
+    if not response.get('ok'):
+        raise ControlError(response.get('error', 'Error desconocido'))
+    return response
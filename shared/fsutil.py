@@ -0,0 +1,71 @@
+"""
+Utilidades de escritura segura en disco
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def fsync_dir(path):
+    """Sincroniza el directorio para que un rename sobreviva a un corte de energía"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    """
+    Escribe un archivo de forma atómica: archivo temporal + fsync + rename.
+    Un lector ve siempre la versión anterior completa o la nueva completa.
+
+    Args:
+        path: Archivo destino
+        data: Contenido (bytes o str)
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(path) or '.'
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+    fsync_dir(directory)
+
+
+def json_checksum(data):
+    """SHA-256 de la serialización canónica (claves ordenadas, sin espacios) de data"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def quarantine(path):
+    """
+    Aparta un archivo dañado como <path>.corrupt-<epoch> para inspeccionarlo
+    sin que se vuelva a leer.
+
+    Returns:
+        Nueva ruta, o None si no se pudo mover
+    """
+    target = f"{path}.corrupt-{int(time.time())}"
+    suffix = 1
+    while os.path.exists(target):
+        target = f"{path}.corrupt-{int(time.time())}-{suffix}"
+        suffix += 1
+    try:
+        os.replace(path, target)
+        return target
+    except OSError as e:
+        logger.error(f"No se pudo poner en cuarentena {path}: {str(e)}")
+        return None
@@ -0,0 +1,271 @@
+"""
+Histórico de sondeos en SQLite (series temporales embebidas)
+
+Tablas:
+    samples    Muestras crudas (device, metric, ts, value), índice (device, metric, ts)
+    rollup_1m  Agregados por minuto (count, min, max, sum, last)
+    rollup_1h  Agregados por hora
+
+Las muestras se acumulan en memoria y se escriben en lotes (executemany) dentro
+de una transacción en modo WAL. Los rollups se actualizan de forma incremental
+al escribir cada lote (upsert), por lo que nunca se re-escanean muestras crudas.
+Cada tabla tiene su propia retención.
+"""
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = (
+    ('rollup_1m', 60),
+    ('rollup_1h', 3600),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    device TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts     REAL NOT NULL,
+    value  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_samples ON samples (device, metric, ts);
+""" + ''.join(f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    device TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count  INTEGER NOT NULL,
+    min    REAL NOT NULL,
+    max    REAL NOT NULL,
+    sum    REAL NOT NULL,
+    last   REAL NOT NULL,
+    PRIMARY KEY (device, metric, bucket)
+) WITHOUT ROWID;
+""" for table, _ in ROLLUPS)
+
+
+def parse_numeric(value):
+    """Convierte un valor SNMP ('220', '50.0 Hz') a float; None si no es numérico"""
+    if value is None:
+        return None
+    try:
+        return float(str(value).split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+class HistoryStore:
+    """Almacén de series temporales de los sondeos"""
+
+    def __init__(self, path, batch_size=500, flush_interval=10.0,
+                 retention_days=None, readonly=False):
+        """
+        Args:
+            path: Archivo SQLite
+            batch_size: Muestras en memoria que fuerzan una escritura
+            flush_interval: Segundos máximos que una muestra espera en memoria
+            retention_days: Días de retención por tabla, ej:
+                {'samples': 7, 'rollup_1m': 90, 'rollup_1h': 730}
+            readonly: Abrir en solo lectura (telegram-bot)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days or {'samples': 7, 'rollup_1m': 90, 'rollup_1h': 730}
+        self.readonly = readonly
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._last_prune = 0.0
+        self._conn = None
+
+    def _connect(self):
+        """Abre la conexión (bajo demanda) y crea el esquema"""
+        if self._conn is not None:
+            return self._conn
+        if self.readonly:
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+        else:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def record(self, device, data, timestamp=None):
+        """
+        Agrega las métricas numéricas de un sondeo al buffer.
+
+        Args:
+            device: Nombre del dispositivo
+            data: Diccionario métrica -> valor (strings SNMP)
+            timestamp: Epoch en segundos (por defecto ahora)
+        """
+        ts = time.time() if timestamp is None else timestamp
+        for metric, value in data.items():
+            number = parse_numeric(value)
+            if number is not None:
+                self._buffer.append((device, metric, ts, number))
+
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Escribe el buffer si alguna muestra superó flush_interval en memoria"""
+        if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Escribe el buffer en una única transacción"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO samples (device, metric, ts, value) VALUES (?, ?, ?, ?)', rows
+                )
+                for table, seconds in ROLLUPS:
+                    conn.executemany(f"""
+                        INSERT INTO {table} (device, metric, bucket, count, min, max, sum, last)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (device, metric, bucket) DO UPDATE SET
+                            count = count + excluded.count,
+                            min   = min(min, excluded.min),
+                            max   = max(max, excluded.max),
+                            sum   = sum + excluded.sum,
+                            last  = excluded.last
+                    """, self._aggregate(rows, seconds))
+            self._maybe_prune()
+        except sqlite3.Error as e:
+            logger.error(f"Error al guardar histórico ({len(rows)} muestras): {str(e)}")
+
+    @staticmethod
+    def _aggregate(rows, seconds):
+        """Pre-agrega el lote por (device, metric, bucket) antes del upsert"""
+        buckets = {}
+        for device, metric, ts, value in sorted(rows, key=lambda row: row[2]):
+            key = (device, metric, int(ts // seconds) * seconds)
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = [1, value, value, value, value]
+            else:
+                agg[0] += 1
+                agg[1] = min(agg[1], value)
+                agg[2] = max(agg[2], value)
+                agg[3] += value
+                agg[4] = value
+        return [key + tuple(agg) for key, agg in buckets.items()]
+
+    def _maybe_prune(self):
+        """Aplica la retención como máximo una vez por hora"""
+        now = time.time()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        conn = self._connect()
+        with conn:
+            for table, days in self.retention_days.items():
+                column = 'ts' if table == 'samples' else 'bucket'
+                conn.execute(f'DELETE FROM {table} WHERE {column} < ?', (now - days * 86400,))
+
+    def close(self):
+        """Escribe lo pendiente y cierra la conexión"""
+        if not self.readonly:
+            self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # Consultas
+
+    def value_at(self, device, metric, timestamp):
+        """
+        Valor de una métrica en un instante: última muestra cruda anterior o,
+        si ya fue purgada, el último valor del minuto correspondiente.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT ts, value FROM samples WHERE device = ? AND metric = ? AND ts <= ? '
+            'ORDER BY ts DESC LIMIT 1', (device, metric, timestamp)
+        ).fetchone()
+        if row is not None:
+            return row
+        for table, _ in ROLLUPS:
+            row = conn.execute(
+                f'SELECT bucket, last FROM {table} WHERE device = ? AND metric = ? AND bucket <= ? '
+                'ORDER BY bucket DESC LIMIT 1', (device, metric, timestamp)
+            ).fetchone()
+            if row is not None:
+                return row
+        return None
+
+    def series(self, device, metric, since, until=None, table='rollup_1m'):
+        """
+        Serie agregada de una métrica.
+
+        Returns:
+            Lista de tuplas (bucket, min, avg, max)
+        """
+        until = time.time() if until is None else until
+        return self._connect().execute(
+            f'SELECT bucket, min, sum / count, max FROM {table} '
+            'WHERE device = ? AND metric = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket',
+            (device, metric, since, until)
+        ).fetchall()
+
+    def devices(self):
+        """Dispositivos con datos en el histórico"""
+        rows = self._connect().execute('SELECT DISTINCT device FROM rollup_1h ORDER BY device')
+        return [row[0] for row in rows]
+
+    def summary(self, device, metric, since, until=None, table='rollup_1m'):
+        """
+        Resumen de una métrica en un rango.
+
+        Returns:
+            Tupla (min, avg, max, muestras) o None si no hay datos
+        """
+        until = time.time() if until is None else until
+        row = self._connect().execute(
+            f'SELECT min(min), sum(sum) / sum(count), max(max), sum(count) FROM {table} '
+            'WHERE device = ? AND metric = ? AND bucket >= ? AND bucket <= ?',
+            (device, metric, since, until)
+        ).fetchone()
+        if row is None or row[3] is None:
+            return None
+        return row
+
+    def summaries(self, device, since, until=None, table='rollup_1m'):
+        """
+        Resumen de todas las métricas de un dispositivo en un rango (una sola consulta).
+
+        Returns:
+            Diccionario métrica -> (min, avg, max, muestras)
+        """
+        until = time.time() if until is None else until
+        rows = self._connect().execute(
+            f'SELECT metric, min(min), sum(sum) / sum(count), max(max), sum(count) FROM {table} '
+            'WHERE device = ? AND bucket >= ? AND bucket <= ? GROUP BY metric',
+            (device, since, until)
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def points(self, device, metric, since, until=None):
+        """
+        Muestras crudas de una métrica en un rango.
+
+        Returns:
+            Lista de tuplas (ts, value) ordenadas por ts
+        """
+        until = time.time() if until is None else until
+        return self._connect().execute(
+            'SELECT ts, value FROM samples WHERE device = ? AND metric = ? AND ts >= ? AND ts <= ? '
+            'ORDER BY ts', (device, metric, since, until)
+        ).fetchall()
@@ -0,0 +1,250 @@
+"""
+Cola de mensajes append-only compartida entre snmp-monitor (productor)
+y telegram-bot (consumidor)
+
+Archivos en el directorio de datos:
+    message_queue.log     Un registro JSON por línea, solo se agrega al final
+    message_queue.offset  Posición confirmada por el consumidor (+ inodo del log)
+    message_queue.lock    Lock (flock) que serializa escrituras y compactación
+
+Encolar es O(1): una escritura O_APPEND + fsync bajo lock, sin releer la cola.
+El consumidor lee desde su offset y confirma con commit(); como nadie reescribe
+registros ajenos, un mensaje encolado mientras el bot envía no se pierde.
+maybe_compact() descarta la parte ya consumida cuando supera compact_bytes.
+"""
+import fcntl
+import json
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from shared.fsutil import atomic_write, fsync_dir
+
+logger = logging.getLogger(__name__)
+
+
+class QueueRecord:
+    """Registro leído de la cola con su posición en el log"""
+
+    __slots__ = ('offset', 'end', 'inode', 'data')
+
+    def __init__(self, offset, end, inode, data):
+        self.offset = offset
+        self.end = end
+        self.inode = inode
+        self.data = data
+
+    def __repr__(self):
+        return f"QueueRecord({self.offset}-{self.end}, {self.data.get('type')!r})"
+
+
+class MessageQueue:
+    """Cola de mensajes persistente basada en un log append-only"""
+
+    def __init__(self, data_dir, name='message_queue', compact_bytes=256 * 1024):
+        """
+        Args:
+            data_dir: Directorio compartido entre ambos servicios
+            name: Prefijo de los archivos de la cola
+            compact_bytes: Bytes consumidos a partir de los cuales se compacta el log
+        """
+        self.data_dir = data_dir
+        self.log_path = os.path.join(data_dir, f'{name}.log')
+        self.offset_path = os.path.join(data_dir, f'{name}.offset')
+        self.lock_path = os.path.join(data_dir, f'{name}.lock')
+        self.legacy_path = os.path.join(data_dir, f'{name}.json')
+        self.compact_bytes = compact_bytes
+        os.makedirs(data_dir, exist_ok=True)
+        self._migrate_legacy()
+
+    @contextmanager
+    def _locked(self):
+        """Lock exclusivo entre procesos (ambos contenedores comparten el volumen)"""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _append(self, records):
+        """Agrega registros al log (llamar con el lock tomado)"""
+        payload = ''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for record in records
+        ).encode('utf-8')
+        fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # Un corte a mitad de escritura deja una línea incompleta: se cierra
+            # para que el siguiente registro no quede pegado a ella
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                payload = b'\n' + payload
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def put(self, message):
+        """
+        Encola un mensaje.
+
+        Args:
+            message: Diccionario con al menos 'type' y 'message'
+        """
+        record = dict(message)
+        record.setdefault('id', uuid.uuid4().hex)
+        record.setdefault('timestamp', datetime.now().isoformat())
+        with self._locked():
+            self._append([record])
+
+    def requeue(self, message):
+        """Vuelve a encolar un mensaje cuyo envío falló"""
+        record = dict(message)
+        record['attempts'] = record.get('attempts', 0) + 1
+        self.put(record)
+
+    def _read_offset(self):
+        """Offset confirmado; 0 si el log fue reemplazado (compactación) o no existe"""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return 0, None
+        try:
+            with open(self.offset_path, 'r') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0, stat
+        except (ValueError, OSError) as e:
+            logger.error(f"Offset de la cola ilegible, releyendo desde el inicio: {str(e)}")
+            return 0, stat
+
+        if saved.get('inode') != stat.st_ino:
+            return 0, stat
+        offset = int(saved.get('offset', 0))
+        if offset > stat.st_size:
+            logger.error("Offset de la cola fuera de rango, releyendo desde el inicio")
+            return 0, stat
+        return offset, stat
+
+    def has_pending(self):
+        """Verificación barata (solo stat) de si hay registros sin consumir"""
+        offset, stat = self._read_offset()
+        return stat is not None and stat.st_size > offset
+
+    def pending_count(self):
+        """Cantidad de registros sin consumir (lee solo la parte pendiente del log)"""
+        offset, stat = self._read_offset()
+        if stat is None or stat.st_size <= offset:
+            return 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            return f.read().count(b'\n')
+
+    def read_pending(self, limit=None):
+        """
+        Lee los registros aún no confirmados, en orden de llegada.
+
+        Args:
+            limit: Máximo de registros a retornar
+
+        Returns:
+            Lista de QueueRecord
+        """
+        offset, stat = self._read_offset()
+        if stat is None or stat.st_size <= offset:
+            return []
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read()
+
+        records = []
+        position = offset
+        for line in chunk.split(b'\n')[:-1]:  # la última parte no terminó en '\n'
+            start = position
+            position += len(line) + 1
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                logger.error(f"Registro corrupto en la cola (offset {start}), descartado")
+                continue
+            records.append(QueueRecord(start, position, stat.st_ino, data))
+            if limit is not None and len(records) >= limit:
+                break
+
+        # Sin registros válidos pero con bytes consumibles (líneas vacías o corruptas)
+        if not records and position > offset:
+            self._write_offset(stat.st_ino, position)
+        return records
+
+    def _write_offset(self, inode, offset):
+        atomic_write(self.offset_path, json.dumps({'inode': inode, 'offset': offset}))
+
+    def commit(self, record):
+        """
+        Confirma como consumido todo el log hasta el final de record.
+        Los registros leídos antes de una compactación se ignoran.
+        """
+        try:
+            inode = os.stat(self.log_path).st_ino
+        except FileNotFoundError:
+            return
+        if inode != record.inode:
+            logger.debug(f"Commit de un registro previo a la compactación ignorado: {record}")
+            return
+        self._write_offset(inode, record.end)
+
+    def maybe_compact(self):
+        """
+        Compacta el log si la parte consumida supera compact_bytes.
+        Llamar sin registros leídos pendientes de confirmar.
+        """
+        offset, stat = self._read_offset()
+        if stat is not None and offset >= self.compact_bytes:
+            self.compact()
+
+    def compact(self):
+        """Reescribe el log sin la parte ya consumida"""
+        with self._locked():
+            offset, stat = self._read_offset()
+            if stat is None or offset == 0:
+                return
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                remaining = f.read()
+            # Si el proceso muere tras el rename, el inodo guardado ya no coincide
+            # y el offset vuelve a 0: el log nuevo solo contiene lo no consumido
+            atomic_write(self.log_path, remaining)
+            self._write_offset(os.stat(self.log_path).st_ino, 0)
+        logger.info(f"Cola compactada: {offset} bytes consumidos descartados")
+
+    def _migrate_legacy(self):
+        """Importa la cola JSON del formato anterior (message_queue.json) si existe"""
+        if not os.path.exists(self.legacy_path):
+            return
+        with self._locked():
+            if not os.path.exists(self.legacy_path):
+                return
+            try:
+                with open(self.legacy_path, 'r') as f:
+                    legacy = json.load(f)
+            except (ValueError, OSError) as e:
+                logger.error(f"No se pudo leer la cola anterior {self.legacy_path}: {str(e)}")
+                legacy = []
+            records = []
+            for message in legacy if isinstance(legacy, list) else []:
+                record = dict(message)
+                record.setdefault('id', uuid.uuid4().hex)
+                records.append(record)
+            if records:
+                self._append(records)
+            os.replace(self.legacy_path, self.legacy_path + '.migrated')
+            fsync_dir(self.data_dir)
+        logger.info(f"Cola anterior migrada: {len(records)} mensaje(s)")
@@ -0,0 +1,112 @@
+"""
+Avisos entre servicios por socket Unix de datagramas en el volumen compartido
+
+snmp-monitor envía un datagrama corto ('queue', 'state', ...) cada vez que
+escribe algo que interesa al bot; telegram-bot lo recibe dentro de su event
+loop y reacciona al instante. Si el bot no está escuchando el aviso se descarta
+y el bot lo compensa con su verificación periódica de respaldo.
+"""
+import asyncio
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+
+class Notifier:
+    """Emisor de avisos (no bloqueante, nunca falla hacia el llamador)"""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._sock = None
+
+    def notify(self, event):
+        """
+        Envía un aviso.
+
+        Args:
+            event: Nombre corto del evento (ej: 'queue')
+        """
+        try:
+            if self._sock is None:
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sock.setblocking(False)
+            self._sock.sendto(event.encode('utf-8'), self.socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            # Nadie escuchando: el receptor usará su verificación de respaldo
+            pass
+        except OSError as e:
+            logger.debug(f"No se pudo enviar aviso '{event}': {str(e)}")
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class _ListenerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener._received(data.decode('utf-8', 'replace'))
+
+
+class NotificationListener:
+    """Receptor de avisos dentro del event loop"""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._transport = None
+        self._events = set()
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        """
+        Abre el socket. Retorna False si no se pudo (se sigue solo con polling).
+        """
+        try:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # socket huérfano de una ejecución anterior
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(self.socket_path)
+            sock.setblocking(False)
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _ListenerProtocol(self), sock=sock
+            )
+            logger.info(f"Escuchando avisos en {self.socket_path}")
+            return True
+        except OSError as e:
+            logger.warning(f"No se pudo abrir el socket de avisos {self.socket_path}: {str(e)}")
+            return False
+
+    def _received(self, event):
+        self._events.add(event)
+        self._wakeup.set()
+
+    async def wait(self, timeout):
+        """
+        Espera avisos hasta timeout segundos.
+
+        Returns:
+            Conjunto de eventos recibidos (vacío si venció el timeout)
+        """
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        events, self._events = self._events, set()
+        self._wakeup.clear()
+        return events
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
@@ -0,0 +1,211 @@
+"""
+Mensaje de estado de la UPS, único para snmp-monitor y telegram-bot
+
+El mismo texto sale en /status, en el estado inicial tras el arranque y en el
+reporte diario. La plantilla está precompilada como una tupla de secciones
+(cada una produce sus líneas o nada si faltan los datos) y el mensaje se arma
+con un solo join. El cuerpo se cachea por el hash de la instantánea sin
+last_update, por lo que un mismo estado (reportes multi-dispositivo, /status
+repetidos) no se vuelve a formatear; la línea de última actualización se
+agrega en cada render.
+"""
+from collections import OrderedDict
+from datetime import datetime
+
+# Mapeo validado contra Eaton 93E real
+# OID: 1.3.6.1.2.1.33.1.4.1.0
+# Valor confirmado: 3=Online (UPS en red normal)
+STATUS_MAP = {
+    '1':  'Unknown',
+    '2':  'Online (Normal)',
+    '3':  'Online',                # Confirmado: valor normal en Eaton 93E
+    '4':  'On Boost',
+    '5':  'On Battery',            # CRÍTICO: UPS en batería
+    '6':  'Off',
+    '7':  'Rebooting',
+    '8':  'On Bypass',
+    '9':  'Hardware Failure',
+    '10': 'Software Failure',
+    '11': 'In Test',
+    '12': 'Emergency Static Bypass',
+    '14': 'Power Saving (ECOnversion)',
+}
+
+# OID: 1.3.6.1.2.1.33.1.2.1.0
+BATTERY_STATUS_MAP = {
+    '1': 'Unknown',
+    '2': 'Battery Normal',
+    '3': 'Battery Low',       # CRÍTICO
+    '4': 'Battery Depleted',  # CRÍTICO
+    '8': 'Charging',
+}
+
+# Estados que requieren alerta inmediata
+CRITICAL_STATUSES = {'5', '9', '10', '12'}         # On Battery, failures
+CRITICAL_BATTERY_STATUSES = {'3', '4'}              # Low, Depleted
+
+CACHE_SIZE = 256
+
+
+def phases(data, key):
+    """
+    Valores por fase de una métrica de tabla ('230 / 231 / 229'):
+    key es la fase 1 y key_l2, key_l3... el resto. None si no hay datos.
+    """
+    first = data.get(key)
+    if not first:
+        return None
+    values = [str(first)]
+    line = 2
+    while data.get(f'{key}_l{line}') is not None:
+        values.append(str(data[f'{key}_l{line}']))
+        line += 1
+    return ' / '.join(values)
+
+
+def format_runtime(runtime):
+    """
+    Formatea el tiempo de autonomía.
+    OID Eaton privado 1.3.6.1.4.1.534.1.2.1.0 devuelve SEGUNDOS.
+    Validado: 7747s = 2h 9min (coincide con interfaz web Eaton).
+    """
+    if runtime is None or runtime == 'N/A':
+        return 'N/A'
+    try:
+        total_seconds = int(float(str(runtime).split()[0]))  # tolera "7680 s" o "7680"
+    except (ValueError, IndexError):
+        return str(runtime)
+    hours = total_seconds // 3600
+    mins = (total_seconds % 3600) // 60
+    if hours > 0:
+        return f"{hours}h {mins}min"
+    return f"{mins} min"
+
+
+def format_timestamp(value=None):
+    """Fecha legible de un last_update ISO (ahora si no hay)"""
+    if not value:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str) and len(value) >= 19 and value[10] == 'T':
+        return f'{value[:10]} {value[11:19]}'  # ISO de datetime.isoformat(): sin parsear
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return str(value)
+
+
+# Secciones de la plantilla: data -> línea(s), o None si no corresponde
+
+def _summary(data):
+    status_code = data.get('status', '1')
+    battery_code = data.get('battery_status', '1')
+    status_icon = '🔴' if status_code in CRITICAL_STATUSES else '🟢'
+    battery_icon = '🔴' if battery_code in CRITICAL_BATTERY_STATUSES else '🔋'
+    return (
+        f"{status_icon} *Estado General:* {STATUS_MAP.get(status_code, f'Desconocido ({status_code})')}\n"
+        f"{battery_icon} *Batería:* {BATTERY_STATUS_MAP.get(battery_code, f'Desconocido ({battery_code})')}\n"
+        f"⚡ *Carga Batería:* {data.get('battery_capacity') or 'N/A'}%\n"
+        f"⏱️ *Autonomía:* {format_runtime(data.get('battery_runtime'))}\n"
+    )
+
+
+def _optional(template, key, multi_phase=True):
+    """Sección de una línea que solo aparece si la métrica tiene valor"""
+    def section(data):
+        if not data.get(key):
+            return None
+        return template.format(phases(data, key) if multi_phase else data[key])
+    return section
+
+
+def _required(template, key):
+    """Sección de una línea que muestra N/A si falta la métrica"""
+    def section(data):
+        return template.format(phases(data, key) or 'N/A')
+    return section
+
+
+def _output_power(data):
+    power = data.get('output_power')
+    if not power:
+        return None
+    try:
+        return f"   • Potencia: {float(power) / 1000:.1f} kW"
+    except (ValueError, TypeError):
+        return f"   • Potencia: {power} W"
+
+
+def _alarms(data):
+    alarms = data.get('alarms')
+    if not alarms or alarms == '0':
+        return None
+    return f"⚠️ *Alarmas Activas:* {alarms}"
+
+
+STATE_TEMPLATE = (
+    lambda data: "🔋 *Estado de la UPS*\n",
+    _summary,
+    lambda data: "📥 *Entrada:*",
+    _required("   • Voltaje: {} V", 'input_voltage'),
+    _optional("   • Frecuencia: {} Hz", 'input_frequency', multi_phase=False),
+    _optional("   • Corriente: {} A", 'input_current'),
+    lambda data: "\n📤 *Salida:*",
+    _required("   • Voltaje: {} V", 'output_voltage'),
+    _optional("   • Frecuencia: {} Hz", 'output_frequency', multi_phase=False),
+    _required("   • Carga: {}%", 'output_load'),
+    _optional("   • Corriente: {} A", 'output_current'),
+    _output_power,
+    _optional("\n🔄 *Bypass:* {} V", 'bypass_voltage'),
+    lambda data: f"\n🌡️ *Temperatura:* {data.get('temperature') or 'N/A'}°C",
+    _alarms,
+    _optional("🚨 *Alarmas UPS:* {}", 'active_alarms', multi_phase=False),
+)
+
+
+class StateRenderer:
+    """Renderiza mensajes de estado con una caché LRU de cuerpos por instantánea"""
+
+    def __init__(self, template=STATE_TEMPLATE, cache_size=CACHE_SIZE):
+        self.template = template
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _body(self, data):
+        return '\n'.join([line for section in self.template if (line := section(data)) is not None])
+
+    def render(self, data):
+        """
+        Args:
+            data: Estado del dispositivo (valores como strings SNMP)
+
+        Returns:
+            Mensaje de estado en Markdown
+        """
+        try:
+            key = frozenset(item for item in data.items() if item[0] != 'last_update')
+        except TypeError:
+            key = None  # valores no hasheables: se formatea sin caché
+
+        body = self._cache.get(key) if key is not None else None
+        if body is None:
+            self.misses += 1
+            body = self._body(data)
+            if key is not None:
+                self._cache[key] = body
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+
+        return ''.join((body, "\n\n🕐 *Última actualización:* ", format_timestamp(data.get('last_update'))))
+
+
+_renderer = StateRenderer()
+
+
+def render_state(data):
+    """Mensaje de estado de un dispositivo (renderer compartido del proceso)"""
+    return _renderer.render(data)
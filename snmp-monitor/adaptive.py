@@ -0,0 +1,139 @@
+"""
+Intervalo de sondeo adaptativo según el estado de cada UPS
+
+Modos por dispositivo:
+    normal  Intervalo configurado del dispositivo (CHECK_INTERVAL_SECONDS o devices.json)
+    slow    UPS Online y métricas estables durante varios sondeos seguidos
+    fast    Estado crítico (en batería, fallas), batería baja/agotada, métricas
+            cuyo delta entre sondeos se acerca a CHANGE_THRESHOLDS, un cambio
+            de estado o de alarmas (DISCRETE_KEYS) o una alerta pendiente de
+            confirmación (alert_state.py): el sondeo que la confirma no espera
+            al intervalo lento
+
+Al salir de las condiciones de 'fast' se mantiene el modo rápido un tiempo
+(fast_hold) para no oscilar, y se vuelve a 'normal' antes de pasar a 'slow'.
+"""
+import logging
+import time
+from ups_state import UPSState
+
+logger = logging.getLogger(__name__)
+
+# Estados considerados en línea y sin novedad
+STABLE_STATUSES = {'2', '3'}
+
+# Métricas sin umbral cuyo cambio entre sondeos pasa a 'fast'
+DISCRETE_KEYS = ('status', 'battery_status', 'alarms', 'active_alarms')
+
+
+class _DeviceMode:
+    __slots__ = ('mode', 'last', 'stable_polls', 'fast_until')
+
+    def __init__(self):
+        self.mode = 'normal'
+        self.last = {}
+        self.stable_polls = 0
+        self.fast_until = 0.0
+
+
+class AdaptiveInterval:
+    """Calcula el intervalo del próximo sondeo de cada dispositivo"""
+
+    def __init__(self, slow_interval, fast_interval, stable_polls=3,
+                 near_fraction=0.5, fast_hold=60.0):
+        """
+        Args:
+            slow_interval: Segundos entre sondeos en estado estable
+            fast_interval: Segundos entre sondeos en estado crítico
+            stable_polls: Sondeos estables seguidos necesarios para pasar a 'slow'
+            near_fraction: Fracción del umbral de cambio a partir de la cual un
+                delta entre sondeos se considera cercano al umbral
+            fast_hold: Segundos que se mantiene 'fast' tras la última condición crítica
+        """
+        self.slow_interval = slow_interval
+        self.fast_interval = fast_interval
+        self.stable_polls = stable_polls
+        self.near_fraction = near_fraction
+        self.fast_hold = fast_hold
+        self._devices = {}
+
+    def _state(self, device):
+        state = self._devices.get(device.name)
+        if state is None:
+            state = self._devices[device.name] = _DeviceMode()
+        return state
+
+    def interval(self, device):
+        """Intervalo (s) hasta el próximo sondeo del dispositivo"""
+        mode = self._state(device).mode
+        if mode == 'fast':
+            return min(self.fast_interval, device.interval)
+        if mode == 'slow':
+            return max(self.slow_interval, device.interval)
+        return device.interval
+
+    def mode(self, device):
+        return self._state(device).mode
+
+    def _is_critical(self, data):
+        return (
+            data.get('status') in UPSState.CRITICAL_STATUSES or
+            data.get('battery_status') in UPSState.CRITICAL_BATTERY_STATUSES
+        )
+
+    def _near_threshold(self, last, data):
+        """Algún delta entre sondeos consecutivos se acerca a su umbral de alerta"""
+        for key, threshold in UPSState.CHANGE_THRESHOLDS.items():
+            old = UPSState._parse_numeric(last.get(key))
+            new = UPSState._parse_numeric(data.get(key))
+            if old is not None and new is not None and abs(new - old) >= threshold * self.near_fraction:
+                return True
+        return False
+
+    def _discrete_changed(self, last, data):
+        """Cambió un estado o las alarmas respecto del sondeo anterior"""
+        return bool(last) and any(last.get(key) != data.get(key) for key in DISCRETE_KEYS)
+
+    def observe(self, device, data, pending=False):
+        """
+        Actualiza el modo del dispositivo con el resultado de un sondeo.
+
+        Args:
+            device: Device sondeado
+            data: Valores obtenidos, o None si el sondeo falló
+            pending: Si hay alertas esperando confirmación (AlertStateMachine.pending)
+
+        Returns:
+            Modo resultante ('slow', 'normal' o 'fast')
+        """
+        state = self._state(device)
+        now = time.monotonic()
+
+        if not data:
+            # Sin datos no se puede afirmar estabilidad: intervalo configurado
+            state.stable_polls = 0
+            mode = 'fast' if now < state.fast_until else 'normal'
+        else:
+            hot = (
+                pending or self._is_critical(data) or
+                self._discrete_changed(state.last, data) or
+                self._near_threshold(state.last, data)
+            )
+            if hot:
+                state.fast_until = now + self.fast_hold
+            state.last = data
+
+            if hot or now < state.fast_until:
+                mode = 'fast'
+                state.stable_polls = 0
+            elif data.get('status') in STABLE_STATUSES:
+                state.stable_polls += 1
+                mode = 'slow' if state.stable_polls >= self.stable_polls else 'normal'
+            else:
+                state.stable_polls = 0
+                mode = 'normal'
+
+        if mode != state.mode:
+            state.mode = mode
+            logger.info(f"[{device.name}] Sondeo {mode}: cada {self.interval(device):.0f}s")
+        return mode
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Reproducción de trazas de sondeo contra la lógica de alertas
+
+Pasa cada traza por dos reglas y compara cuántas alertas generan:
+
+    anterior  cada muestra contra la anterior (umbral de CHANGE_THRESHOLDS)
+    estados   UPSState.update_state con la máquina de estados de alert_state.py
+              (ALERT_CONFIRM_POLLS, ALERT_CONFIRM_WINDOW, ALERT_HOLD_SECONDS,
+              ALERT_HYSTERESIS o los valores de --confirm/--window/--hold/--hysteresis)
+
+Las trazas grabadas salen del histórico (--db, tabla samples de
+history.db); sin --db se usan trazas sintéticas con patrones conocidos:
+ruido alrededor del umbral, deriva lenta, oscilación en el umbral, un corte
+con descarga y un corte intermitente. Reporta alertas, mensajes (sondeos
+con al menos una alerta) y el retardo de las alertas críticas.
+
+Ejemplos:
+    python alert_replay.py
+    python alert_replay.py --db /app/data/history.db --json replay.json
+    python alert_replay.py --confirm 3 --window 5 --hold 300
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from alert_state import AlertStateMachine
+from config import MonitorConfig
+from ups_state import UPSState
+
+BASE = {
+    'status': '3', 'battery_status': '2', 'battery_capacity': '100', 'battery_runtime': '7747',
+    'input_voltage': '230', 'input_frequency': '50.0', 'output_voltage': '230',
+    'output_load': '60', 'output_power': '3000', 'temperature': '22.0',
+}
+
+
+def _sample(**values):
+    data = dict(BASE)
+    data.update({key: str(value) for key, value in values.items()})
+    return data
+
+
+def synthetic_traces(seed=0):
+    """
+    Returns:
+        Diccionario escenario -> lista de (epoch, datos)
+    """
+    rng = random.Random(seed)
+    traces = {}
+
+    # 6 h cada 60 s: ruido normal de la red y de la carga
+    traces['ruido'] = [(t * 60.0, _sample(
+        input_voltage=round(rng.gauss(230, 2.5)),
+        output_power=round(rng.gauss(3000, 250)),
+        temperature=round(rng.gauss(22, 0.3), 1),
+    )) for t in range(360)]
+
+    # 6 h cada 60 s: la temperatura sube 12 °C de a poco
+    traces['deriva'] = [(t * 60.0, _sample(
+        temperature=round(22 + 12 * t / 360 + rng.gauss(0, 0.2), 1),
+    )) for t in range(360)]
+
+    # 2 h cada 60 s: tensión que oscila justo por encima del umbral
+    traces['umbral'] = [(t * 60.0, _sample(
+        input_voltage=227 if t % 2 else 233,
+    )) for t in range(120)]
+
+    # Cada 5 s: 10 min en red, 10 min en batería descargando, 10 min en red
+    corte = []
+    for t in range(360):
+        if 120 <= t < 240:
+            capacity = 100 - (t - 120) * 0.5
+            corte.append((t * 5.0, _sample(
+                status=5, input_voltage=0, input_frequency='0.0',
+                battery_status=3 if capacity < 50 else 2,
+                battery_capacity=round(capacity), battery_runtime=round(7747 * capacity / 100),
+                output_power=round(rng.gauss(3000, 100)),
+            )))
+        else:
+            corte.append((t * 5.0, _sample(output_power=round(rng.gauss(3000, 100)))))
+    traces['corte'] = corte
+
+    # Cada 5 s: la red va y viene cada dos sondeos durante 3 min
+    traces['intermitente'] = [(t * 5.0, _sample(
+        status=5 if (t // 2) % 2 else 3,
+        input_voltage=0 if (t // 2) % 2 else 230,
+    )) for t in range(36)]
+    return traces
+
+
+def load_history(path):
+    """
+    Trazas grabadas en la tabla samples del histórico.
+
+    Returns:
+        Diccionario dispositivo -> lista de (epoch, datos)
+    """
+    traces = {}
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute('SELECT device, ts, metric, value FROM samples ORDER BY device, ts')
+        for device, ts, metric, value in rows:
+            trace = traces.setdefault(device, [])
+            if not trace or trace[-1][0] != ts:
+                trace.append((ts, {}))
+            trace[-1][1][metric] = f'{value:g}'
+    finally:
+        conn.close()
+    return traces
+
+
+def replay_previous(trace):
+    """Regla anterior: cada muestra contra la anterior. Retorna [(epoch, clave, crítica)]"""
+    alerts = []
+    last = {}
+    for ts, data in trace:
+        for key, value in data.items():
+            old = last.get(key)
+            last[key] = value
+            if old is None or old == value:
+                continue
+            threshold = UPSState.CHANGE_THRESHOLDS.get(UPSState.PHASE_SUFFIX.sub('', key))
+            old_number, new_number = UPSState._parse_numeric(old), UPSState._parse_numeric(value)
+            if threshold is None or old_number is None or new_number is None or \
+                    abs(new_number - old_number) >= threshold:
+                alerts.append((ts, key, _critical(key, value)))
+    return alerts
+
+
+def replay_state_machine(trace, args):
+    """Regla actual: UPSState.update_state con la máquina de estados. Retorna [(epoch, clave, crítica)]"""
+    now = [0.0]
+    state = UPSState('replay', flush_interval=float('inf'), alerts=AlertStateMachine(
+        confirm=args.confirm, window=args.window, hold=args.hold,
+        hysteresis=args.hysteresis, clock=lambda: now[0],
+    ))
+    alerts = []
+    for ts, data in trace:
+        now[0] = ts
+        for key, change in state.update_state(data).items():
+            alerts.append((ts, key, _critical(key, change['new'])))
+    return alerts
+
+
+def _critical(key, value):
+    return (key == 'status' and value in UPSState.CRITICAL_STATUSES) or \
+        (key == 'battery_status' and value in UPSState.CRITICAL_BATTERY_STATUSES)
+
+
+def _summary(alerts):
+    return {
+        'alerts': len(alerts),
+        'messages': len({ts for ts, _, _ in alerts}),
+        'critical': [ts for ts, _, critical in alerts if critical],
+    }
+
+
+def _critical_delay(previous, current):
+    """Retardo máximo (s) de las alertas críticas respecto de la regla anterior"""
+    delays = []
+    for ts in previous:
+        later = [t for t in current if t >= ts]
+        delays.append(later[0] - ts if later else float('inf'))
+    return max(delays) if delays else 0.0
+
+
+def _print_table(results):
+    header = f"{'traza':16} {'muestras':>8} {'alertas ant':>11} {'alertas act':>11} {'mensajes ant':>12} {'mensajes act':>12} {'retardo crít s':>14}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(f"{name:16} {r['samples']:>8} {r['previous']['alerts']:>11} {r['current']['alerts']:>11} "
+              f"{r['previous']['messages']:>12} {r['current']['messages']:>12} {r['critical_delay']:>14.0f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compara la lógica de alertas sobre trazas de sondeo')
+    parser.add_argument('--db', metavar='PATH', help='history.db con las trazas grabadas (sin --db: sintéticas)')
+    parser.add_argument('--confirm', type=int, default=MonitorConfig.ALERT_CONFIRM_POLLS)
+    parser.add_argument('--window', type=int, default=MonitorConfig.ALERT_CONFIRM_WINDOW)
+    parser.add_argument('--hold', type=float, default=MonitorConfig.ALERT_HOLD_SECONDS)
+    parser.add_argument('--hysteresis', type=float, default=MonitorConfig.ALERT_HYSTERESIS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='Guarda los resultados en JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    traces = load_history(args.db) if args.db else synthetic_traces(args.seed)
+
+    # El estado de la reproducción nunca se escribe en /app/data
+    MonitorConfig.DATA_DIR = tempfile.mkdtemp(prefix='ups-replay-')
+
+    results = {}
+    for name, trace in traces.items():
+        previous = _summary(replay_previous(trace))
+        current = _summary(replay_state_machine(trace, args))
+        os.remove(os.path.join(MonitorConfig.DATA_DIR, 'ups_state_replay.json'))
+        results[name] = {
+            'samples': len(trace),
+            'previous': previous,
+            'current': current,
+            'critical_delay': _critical_delay(previous['critical'], current['critical']),
+        }
+
+    _print_table(results)
+    total_previous = sum(r['previous']['messages'] for r in results.values())
+    total_current = sum(r['current']['messages'] for r in results.values())
+    if total_previous:
+        print(f"\nMensajes: {total_previous} → {total_current} "
+              f"({(total_current - total_previous) / total_previous:+.0%})")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Máquina de estados de alertas por métrica: histéresis, confirmación N de M y permanencia
+
+UPSState compara cada sondeo contra el último valor *alertado* de cada
+métrica (su referencia) y no contra la muestra anterior, por lo que una
+deriva lenta termina alertando al acumular el umbral de CHANGE_THRESHOLDS.
+Un valor fuera de la banda de la referencia genera alerta cuando:
+
+- Entra en un estado crítico (CRITICAL_STATUSES / CRITICAL_BATTERY_STATUSES): al instante
+- Es una métrica discreta, sin umbral (status, alarmas...): al instante; un
+  código no oscila dentro de una banda, así que confirmarlo solo atrasa la
+  alerta de una alarma nueva o del paso a bypass
+- Si no: estuvo fuera de la banda, en el mismo sentido, en al menos confirm de
+  los últimos window sondeos y pasaron hold segundos desde la última alerta
+  de la métrica (salvo al salir de un estado crítico)
+- Acompaña en el mismo sondeo a la entrada en un estado crítico (immediate):
+  la caída de la tensión de entrada sale en el mismo mensaje que "En batería"
+
+Histéresis: tras una alerta en un sentido, volver en el sentido contrario
+exige superar el umbral multiplicado por (1 + hysteresis); un valor que
+oscila alrededor del umbral no alerta en cada cruce.
+
+El estado de cada métrica vive en arrays indexados por la columna del índice
+compartido de UPSState.
+"""
+import logging
+import math
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+MAX_WINDOW = 16
+
+
+class AlertStateMachine:
+    """Referencias y ventanas de confirmación de las métricas de un dispositivo"""
+
+    def __init__(self, confirm=2, window=3, hold=120.0, hysteresis=0.5, clock=time.monotonic):
+        """
+        Args:
+            confirm: Sondeos fuera de la banda (N) necesarios para alertar
+            window: Últimos sondeos considerados (M, máximo 16)
+            hold: Segundos mínimos entre alertas no críticas de una misma métrica
+            hysteresis: Fracción del umbral que se suma para alertar en sentido
+                contrario al de la última alerta
+            clock: Reloj en segundos (reemplazable para reproducir trazas)
+        """
+        self.window = max(1, min(window, MAX_WINDOW))
+        self.confirm = max(1, min(confirm, self.window))
+        self.hold = hold
+        self.hysteresis = hysteresis
+        self.clock = clock
+        self._mask = (1 << self.window) - 1
+        # Por columna: referencia (string y número), sentido de la última alerta,
+        # si la referencia es un estado crítico, instante de la última alerta y
+        # sondeos recientes fuera de la banda por encima / por debajo (bits).
+        # baselines, numbers y pending (hay sondeos fuera de la banda) son
+        # públicos para que UPSState omita sin llamadas las métricas que siguen
+        # dentro de la banda de su referencia
+        self.baselines = []
+        self.numbers = array('d')
+        self.pending = array('b')
+        self._directions = array('b')
+        self._critical = array('b')
+        self._alerted_at = array('d')
+        self._above = array('H')
+        self._below = array('H')
+
+    def grow(self, column):
+        """Reserva lugar hasta la columna indicada"""
+        missing = column + 1 - len(self.baselines)
+        if missing > 0:
+            self.baselines.extend([None] * missing)
+            self.numbers.extend([NAN] * missing)
+            self._directions.extend([0] * missing)
+            self._critical.extend([0] * missing)
+            self._alerted_at.extend([-math.inf] * missing)
+            self._above.extend([0] * missing)
+            self._below.extend([0] * missing)
+            self.pending.extend([0] * missing)
+
+    def reset(self, column, value, number, critical=False):
+        """Fija la referencia de una métrica sin alertar (primer valor, estado cargado)"""
+        self.grow(column)
+        self._set_baseline(column, value, number, 0, critical)
+        self._alerted_at[column] = -math.inf
+
+    def _set_baseline(self, column, value, number, direction, critical):
+        self.baselines[column] = value
+        self.numbers[column] = number
+        self._directions[column] = direction
+        self._critical[column] = critical
+        self._above[column] = 0
+        self._below[column] = 0
+        self.pending[column] = 0
+
+    def observe(self, key, column, value, number, threshold, critical=False, immediate=False):
+        """
+        Procesa la muestra de una métrica.
+
+        Args:
+            key: Nombre de la métrica (solo para logs)
+            column: Columna de la métrica en el índice de UPSState
+            value: Valor tal como se guarda en el estado
+            number: Valor numérico (NaN si no es numérico)
+            threshold: Umbral de cambio (NaN = sin umbral: cualquier cambio alerta
+                al instante)
+            critical: Si value es un estado crítico (alerta sin confirmación)
+            immediate: Alertar sin confirmación ni permanencia si está fuera de la banda
+
+        Returns:
+            Referencia anterior si la muestra genera alerta, None si no
+        """
+        self.grow(column)
+        baseline = self.baselines[column]
+        if baseline is None:
+            self.reset(column, value, number, critical)
+            return None
+
+        direction = 1
+        discrete = math.isnan(threshold)
+        if value == baseline:
+            off = False
+        elif discrete:
+            off = True
+        else:
+            reference = self.numbers[column]
+            if math.isnan(number) or math.isnan(reference):
+                # Fallback: comparación string (no debería ocurrir en valores numéricos)
+                logger.warning(f"No se pudo parsear numéricamente '{key}': '{baseline}' → '{value}', comparando como string")
+                off = True
+            else:
+                delta = number - reference
+                direction = 1 if delta >= 0 else -1
+                band = threshold
+                if self._directions[column] == -direction:
+                    band *= 1 + self.hysteresis
+                off = abs(delta) >= band
+
+        mask = self._mask
+        above = (self._above[column] << 1) & mask
+        below = (self._below[column] << 1) & mask
+        if off:
+            if direction > 0:
+                above |= 1
+            else:
+                below |= 1
+        self._above[column] = above
+        self._below[column] = below
+        self.pending[column] = bool(above or below)
+        if not off:
+            return None
+
+        now = self.clock()
+        if not (critical or immediate or discrete):
+            if (above if direction > 0 else below).bit_count() < self.confirm:
+                return None
+            if not self._critical[column] and now - self._alerted_at[column] < self.hold:
+                return None
+
+        self._set_baseline(column, value, number, 0 if discrete else direction, critical)
+        self._alerted_at[column] = now
+        return baseline
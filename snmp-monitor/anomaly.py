@@ -0,0 +1,256 @@
+"""
+Detección de anomalías sobre ventanas de métricas (NumPy)
+
+Complementa los umbrales absolutos de UPSState.CHANGE_THRESHOLDS, que no ven
+derivas lentas (temperatura que sube de a poco) y son ruidosos en sitios con
+cargas variables. Cada dispositivo es una fila de un único bloque
+
+    valores[dispositivo, métrica, muestra]   (ring buffer de `window` muestras)
+
+Cada sondeo actualiza solo la fila de su dispositivo, con operaciones
+vectorizadas sobre las métricas de ese dispositivo (no entre dispositivos):
+media/desvío de la ventana, EWMA y regresión contra el instante de cada
+muestra. El costo por sondeo es O(métricas × window) y no depende de cuántos
+dispositivos haya. La regresión usa los timestamps y no el número de muestra:
+con sondeo adaptativo (5 a 300 s entre muestras) la pendiente sigue siendo por
+segundo. Se señalan dos tipos de anomalía:
+
+    - z-score: el EWMA se aleja más de z_threshold desvíos de la media de la ventana
+    - tendencia: la ventana sigue una recta (R² ≥ trend_r2) cuyo cambio
+      acumulado supera el umbral de cambio de la métrica
+
+Solo se alimenta con la UPS en red: las descargas no forman parte de la línea
+de base. Cada anomalía se avisa al aparecer y se rearma al normalizarse.
+"""
+import logging
+import time
+from datetime import datetime
+import numpy as np
+from ups_state import UPSState
+
+logger = logging.getLogger(__name__)
+
+# Estados en red: solo con ellos se alimenta la línea de base
+NORMAL_STATUSES = {'2', '3', '14'}
+
+# Métricas analizadas (más sus fases _lN); la batería se excluye porque su
+# recarga tras un corte es una tendencia esperada y la autonomía sigue a la carga
+METRICS = tuple(key for key in UPSState.CHANGE_THRESHOLDS
+                if key not in ('battery_capacity', 'battery_runtime'))
+
+# Desvío mínimo, como fracción del umbral de cambio de la métrica: evita
+# z-scores enormes en métricas casi constantes (valores enteros repetidos)
+MIN_STD_FRACTION = 0.1
+
+
+class Anomaly:
+    """Anomalía de una métrica en un sondeo"""
+
+    __slots__ = ('key', 'kind', 'value', 'mean', 'std', 'score', 'change', 'samples', 'seconds')
+
+    def __init__(self, key, kind, value, mean, std, score, change, samples, seconds):
+        self.key = key
+        self.kind = kind            # 'zscore' | 'trend'
+        self.value = value          # EWMA actual
+        self.mean = mean
+        self.std = std
+        self.score = score          # z-score o R²
+        self.change = change        # cambio acumulado en la ventana (tendencia)
+        self.samples = samples
+        self.seconds = seconds      # tiempo que abarca la ventana de la métrica
+
+
+class AnomalyDetector:
+    """Ventanas por dispositivo y métrica; cada sondeo evalúa su fila de forma vectorizada"""
+
+    def __init__(self, window=60, z_threshold=4.0, trend_r2=0.8, min_samples=20, alpha=0.3):
+        """
+        Args:
+            window: Muestras por métrica en la ventana
+            z_threshold: Desvíos del EWMA respecto de la media que son anomalía
+            trend_r2: Ajuste lineal mínimo para considerar una tendencia
+            min_samples: Muestras necesarias antes de evaluar una métrica
+            alpha: Factor de suavizado del EWMA
+        """
+        self.window = window
+        self.z_threshold = z_threshold
+        self.trend_r2 = trend_r2
+        self.min_samples = max(3, min(min_samples, window))
+        self.alpha = alpha
+
+        self._columns = {}          # clave de métrica -> columna
+        self._keys = []
+        self._rows = {}             # dispositivo -> fila
+        self._scale = np.zeros(0)
+        self._values = np.full((0, 0, window), np.nan)
+        self._times = np.full((0, window), np.nan)  # epoch de cada muestra por fila
+        self._pos = np.zeros(0, dtype=np.intp)
+        self._ewma = np.full((0, 0), np.nan)
+        self._flagged = np.zeros((0, 0), dtype=bool)
+        self._trending = np.zeros((0, 0), dtype=bool)
+        self._index = np.arange(window)
+
+    def _resize(self, rows, cols):
+        """Agranda los bloques (al doble) para nuevas filas o columnas"""
+        old_rows, old_cols = self._ewma.shape
+        if rows <= old_rows and cols <= old_cols:
+            return
+        rows = max(rows, old_rows * 2 if rows > old_rows else old_rows)
+        cols = max(cols, old_cols * 2 if cols > old_cols else old_cols)
+
+        values = np.full((rows, cols, self.window), np.nan)
+        values[:old_rows, :old_cols] = self._values
+        times = np.full((rows, self.window), np.nan)
+        times[:old_rows] = self._times
+        ewma = np.full((rows, cols), np.nan)
+        ewma[:old_rows, :old_cols] = self._ewma
+        flagged = np.zeros((rows, cols), dtype=bool)
+        flagged[:old_rows, :old_cols] = self._flagged
+        trending = np.zeros((rows, cols), dtype=bool)
+        trending[:old_rows, :old_cols] = self._trending
+        pos = np.zeros(rows, dtype=np.intp)
+        pos[:old_rows] = self._pos
+        scale = np.ones(cols)
+        scale[:old_cols] = self._scale
+
+        self._values, self._times, self._ewma, self._pos = values, times, ewma, pos
+        self._flagged, self._trending, self._scale = flagged, trending, scale
+
+    def _row(self, device):
+        row = self._rows.get(device)
+        if row is None:
+            row = self._rows[device] = len(self._rows)
+            self._resize(row + 1, len(self._keys))
+        return row
+
+    def _column(self, key):
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = len(self._keys)
+            self._keys.append(key)
+            self._resize(len(self._rows), column + 1)
+            self._scale[column] = UPSState.CHANGE_THRESHOLDS[UPSState.PHASE_SUFFIX.sub('', key)]
+        return column
+
+    def _sample(self, data):
+        """Vector de la muestra (NaN = métrica ausente en este sondeo)"""
+        columns, numbers = [], []
+        for key, value in data.items():
+            if UPSState.PHASE_SUFFIX.sub('', key) not in METRICS:
+                continue
+            number = UPSState._parse_numeric(value)
+            if number is not None:
+                columns.append(self._column(key))
+                numbers.append(number)
+        sample = np.full(len(self._keys), np.nan)
+        sample[columns] = numbers
+        return sample
+
+    def observe(self, device, data, skip=(), timestamp=None):
+        """
+        Agrega un sondeo a la ventana del dispositivo y evalúa sus métricas.
+
+        Args:
+            device: Nombre del dispositivo
+            data: Valores del sondeo
+            skip: Claves que no se reportan en este sondeo (ej: las que ya
+                alertó el umbral de cambio)
+            timestamp: Epoch del sondeo en segundos (por defecto ahora)
+
+        Returns:
+            Lista de Anomaly nuevas (las que siguen activas no se repiten)
+        """
+        if data.get('status') not in NORMAL_STATUSES:
+            return []
+
+        sample = self._sample(data)
+        row = self._row(device)
+        cols = len(self._keys)
+        present = ~np.isnan(sample)
+
+        # Ventana en orden cronológico tras insertar la muestra
+        pos = self._pos[row]
+        values = self._values[row, :cols]
+        values[:, pos] = sample
+        self._times[row, pos] = time.time() if timestamp is None else timestamp
+        self._pos[row] = (pos + 1) % self.window
+        order = (self._pos[row] + self._index) % self.window
+        ordered = values[:, order]
+        # Segundos respecto de la muestra nueva (valores chicos: sin pérdida de precisión)
+        times = self._times[row, order] - self._times[row, pos]
+
+        ewma = self._ewma[row, :cols]
+        smoothed = np.where(np.isnan(ewma), sample, self.alpha * sample + (1 - self.alpha) * ewma)
+        ewma[present] = smoothed[present]
+
+        valid = ~np.isnan(ordered)
+        count = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Línea de base del z-score: la ventana sin la muestra nueva
+            base_valid = valid[:, :-1]
+            base_count = base_valid.sum(axis=1)
+            mean = np.where(base_valid, ordered[:, :-1], 0.0).sum(axis=1) / base_count
+            base_dev = np.where(base_valid, ordered[:, :-1] - mean[:, None], 0.0)
+            std = np.sqrt((base_dev ** 2).sum(axis=1) / (base_count - 1))
+            z = np.abs(ewma - mean) / np.maximum(std, self._scale[:cols] * MIN_STD_FRACTION)
+
+            # Tendencia: regresión de la ventana completa contra el instante de
+            # cada muestra (pendiente por segundo)
+            level = np.where(valid, ordered, 0.0).sum(axis=1) / count
+            deviation = np.where(valid, ordered - level[:, None], 0.0)
+            time_mean = np.where(valid, times, 0.0).sum(axis=1) / count
+            time_dev = np.where(valid, times - time_mean[:, None], 0.0)
+            covariance = (time_dev * deviation).sum(axis=1)
+            time_var = (time_dev ** 2).sum(axis=1)
+            slope = covariance / time_var
+            r2 = covariance ** 2 / (time_var * (deviation ** 2).sum(axis=1))
+            # Cambio acumulado entre la primera muestra válida de cada métrica y la nueva
+            span = times[-1] - times[np.argmax(valid, axis=1)]
+            change = slope * span
+
+        ready = present & (base_count >= self.min_samples)
+        anomalous = ready & (z >= self.z_threshold)
+        trending = ready & (r2 >= self.trend_r2) & (np.abs(change) >= self._scale[:cols])
+
+        new_anomalous = anomalous & ~self._flagged[row, :cols]
+        new_trending = trending & ~self._trending[row, :cols]
+        self._flagged[row, :cols] = anomalous
+        self._trending[row, :cols] = trending
+
+        anomalies = []
+        for column in np.flatnonzero(new_anomalous | new_trending):
+            key = self._keys[column]
+            if key in skip:
+                continue
+            kind = 'zscore' if new_anomalous[column] else 'trend'
+            anomalies.append(Anomaly(
+                key, kind,
+                value=float(ewma[column]),
+                mean=float(mean[column]),
+                std=float(std[column]),
+                score=float(z[column] if kind == 'zscore' else r2[column]),
+                change=float(change[column]),
+                samples=int(count[column]),
+                seconds=float(span[column]),
+            ))
+            logger.info(f"[{device}] Anomalía ({kind}) en {key}: "
+                        f"{ewma[column]:.2f} vs media {mean[column]:.2f} ± {std[column]:.2f}")
+        return anomalies
+
+    @staticmethod
+    def format_message(anomalies):
+        """Mensaje de aviso de las anomalías de un sondeo"""
+        message = "📊 *Comportamiento inusual en la UPS*\n\n"
+        for anomaly in anomalies:
+            if anomaly.kind == 'zscore':
+                message += (
+                    f"• *{anomaly.key}:* {anomaly.value:.1f} "
+                    f"(media {anomaly.mean:.1f} ± {anomaly.std:.1f}, z={anomaly.score:.1f})\n"
+                )
+            else:
+                message += (
+                    f"📈 *{anomaly.key}:* {anomaly.change:+.1f} sostenido en los últimos "
+                    f"{anomaly.seconds / 60:.0f} min, {anomaly.samples} muestras (actual {anomaly.value:.1f})\n"
+                )
+        message += f"\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        return message
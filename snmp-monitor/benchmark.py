@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmark de sondeo SNMP contra el simulador local (sin UPS real)
+
+Levanta simulator.py en un proceso aparte con N agentes y mide, en este
+proceso, el costo del lado del monitor:
+
+    client   SNMPClient.get_all_values_async vía DevicePoller (solo SNMP)
+    monitor  UPSMonitor.check_ups completo (SNMP + estado + histórico + alertas)
+
+Para cada tamaño (--sizes 1,10,100) reporta latencia por sondeo (p50/p95/p99),
+sondeos por segundo, CPU y memoria. --json guarda los resultados para CI.
+
+Ejemplos:
+    python benchmark.py
+    python benchmark.py --sizes 1,10,100 --rounds 30 --mode monitor
+    python benchmark.py --loss 0.05 --latency 0.02 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from config import SNMPConfig, MonitorConfig
+from devices import Device
+from poller import DevicePoller
+from simulator import credentials_error
+from snmp_client import SNMPClient
+
+logger = logging.getLogger(__name__)
+
+SIMULATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simulator.py')
+
+
+def _rss_mb():
+    """Memoria residente actual del proceso (MB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _devices(count, host, port):
+    return [
+        Device(
+            name=f'sim{index + 1}',
+            host=host,
+            port=port + index,
+            user=SNMPConfig.USER,
+            auth_protocol=SNMPConfig.AUTH_PROTOCOL,
+            auth_password=SNMPConfig.AUTH_PASSWORD,
+            priv_protocol=SNMPConfig.PRIV_PROTOCOL,
+            priv_password=SNMPConfig.PRIV_PASSWORD,
+        )
+        for index in range(count)
+    ]
+
+
+class SimulatorProcess:
+    """Simulador en un proceso aparte (su CPU no se mezcla con la medición)"""
+
+    def __init__(self, count, args):
+        self.count = count
+        self.args = args
+        self.process = None
+
+    def __enter__(self):
+        error = credentials_error()
+        if error:
+            raise RuntimeError(error)
+        command = [
+            sys.executable, SIMULATOR,
+            '--host', self.args.host, '--port', str(self.args.port),
+            '--devices', str(self.count), '--scenario', self.args.scenario,
+            '--loss', str(self.args.loss), '--latency', str(self.args.latency),
+            '--jitter', str(self.args.jitter),
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout=120):
+        """Espera a que respondan el primer y el último agente"""
+        probes = _devices(self.count, self.args.host, self.args.port)
+        probes = [probes[0], probes[-1]]
+        deadline = time.monotonic() + timeout
+        # Los timeouts mientras los agentes arrancan son esperados
+        client_logger = logging.getLogger('snmp_client')
+        client_logger.disabled = True
+        try:
+            self._probe(probes, deadline)
+        finally:
+            client_logger.disabled = False
+
+    def _probe(self, probes, deadline):
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"El simulador terminó con código {self.process.returncode}")
+            clients = [SNMPClient(device) for device in probes]
+            try:
+                if all(client.test_connection() for client in clients):
+                    return
+            finally:
+                for client in clients:
+                    client.close()
+            time.sleep(0.5)
+        raise RuntimeError("El simulador no respondió a tiempo")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def _run_rounds(poller, devices, check_fn, rounds):
+    """Sondea todos los dispositivos rounds veces; retorna latencias, errores y tiempos"""
+    latencies = []
+    errors = 0
+
+    async def timed(device, client):
+        nonlocal errors
+        started = time.perf_counter()
+        ok = await check_fn(device, client)
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors += 1
+
+    # Ronda de calentamiento: descubrimiento USM y creación de transportes
+    await asyncio.gather(*(poller.poll_with(timed, device) for device in devices))
+    latencies.clear()
+    errors = 0
+
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(poller.poll_with(timed, device) for device in devices))
+    wall = time.perf_counter() - wall_start
+    cpu = _cpu_seconds() - cpu_start
+    return latencies, errors, wall, cpu
+
+
+async def bench_client(devices, args):
+    async def check(device, client):
+        data = await asyncio.wait_for(client.get_all_values_async(), device.timeout)
+        return data and any(value is not None for value in data.values())
+
+    poller = DevicePoller(devices, check, args.concurrency)
+    poller.setup()
+    try:
+        return await _run_rounds(poller, devices, check, args.rounds)
+    finally:
+        await poller.close()
+
+
+async def bench_monitor(devices, args):
+    # Estado, cola e histórico en un directorio temporal, nunca en /app/data
+    data_dir = tempfile.mkdtemp(prefix='ups-bench-')
+    MonitorConfig.DATA_DIR = data_dir
+    MonitorConfig.STATE_FILE = os.path.join(data_dir, 'ups_state.json')
+    MonitorConfig.HISTORY_DB = os.path.join(data_dir, 'history.db')
+    MonitorConfig.NOTIFY_SOCKET = os.path.join(data_dir, 'notify.sock')
+    MonitorConfig.CONTROL_SOCKET = os.path.join(data_dir, 'control.sock')
+    SNMPConfig.DEVICES_FILE = os.path.join(data_dir, 'devices.json')
+    with open(SNMPConfig.DEVICES_FILE, 'w') as f:
+        json.dump({'devices': [
+            {'name': device.name, 'host': device.host, 'port': device.port} for device in devices
+        ]}, f)
+
+    from main import UPSMonitor
+    monitor = UPSMonitor()
+
+    async def check(device, client):
+        await monitor.check_ups(device, client)
+        return monitor.states[device.name].current_state.get('status') is not None
+
+    monitor.poller.setup()
+    try:
+        return await _run_rounds(monitor.poller, monitor.devices, check, args.rounds)
+    finally:
+        await monitor.poller.close()
+        if monitor.history:
+            monitor.history.close()
+
+
+def run_size(count, args):
+    """Ejecuta el benchmark para count dispositivos"""
+    devices = _devices(count, args.host, args.port)
+    bench = bench_monitor if args.mode == 'monitor' else bench_client
+    rss_start = _rss_mb()
+    with SimulatorProcess(count, args):
+        latencies, errors, wall, cpu = asyncio.run(bench(devices, args))
+    polls = len(latencies)
+    return {
+        'mode': args.mode,
+        'devices': count,
+        'rounds': args.rounds,
+        'polls': polls,
+        'errors': errors,
+        'latency_ms': {
+            'p50': _percentile(latencies, 0.50) * 1000 if latencies else None,
+            'p95': _percentile(latencies, 0.95) * 1000 if latencies else None,
+            'p99': _percentile(latencies, 0.99) * 1000 if latencies else None,
+        },
+        'polls_per_second': polls / wall if wall else None,
+        'cpu_percent': 100 * cpu / wall if wall else None,
+        'cpu_ms_per_poll': 1000 * cpu / polls if polls else None,
+        'rss_mb': _rss_mb(),
+        'rss_delta_mb': _rss_mb() - rss_start,
+    }
+
+
+def _print_table(results):
+    header = f"{'modo':8} {'disp':>5} {'sondeos':>8} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} " \
+             f"{'p99 ms':>8} {'sond/s':>8} {'CPU %':>6} {'CPU ms/sd':>9} {'RSS MB':>7}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        lat = r['latency_ms']
+        print(f"{r['mode']:8} {r['devices']:>5} {r['polls']:>8} {r['errors']:>4} "
+              f"{lat['p50']:>8.1f} {lat['p95']:>8.1f} {lat['p99']:>8.1f} "
+              f"{r['polls_per_second']:>8.1f} {r['cpu_percent']:>6.1f} "
+              f"{r['cpu_ms_per_poll']:>9.2f} {r['rss_mb']:>7.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de sondeo SNMP con el simulador local')
+    parser.add_argument('--sizes', default='1,10,100', help='Cantidades de dispositivos, ej: 1,10,100')
+    parser.add_argument('--rounds', type=int, default=20, help='Sondeos por dispositivo')
+    parser.add_argument('--mode', choices=('client', 'monitor'), default='client')
+    parser.add_argument('--concurrency', type=int, default=MonitorConfig.POLL_CONCURRENCY)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=16161)
+    parser.add_argument('--scenario', default='normal')
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--json', metavar='PATH', help='Guarda los resultados en JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    results = [run_size(int(size), args) for size in args.sizes.split(',')]
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
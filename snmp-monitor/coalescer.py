@@ -0,0 +1,195 @@
+"""
+Agrupación y deduplicación de alertas durante tormentas de eventos
+
+Cada clave (cambios de un dispositivo, o un error concreto de un dispositivo)
+tiene una ventana de agrupación:
+
+- El primer evento se emite de inmediato y abre la ventana
+- Los eventos siguientes dentro de la ventana se acumulan: los cambios se
+  fusionan (primer valor → último valor, con la cantidad de cambios) y los
+  errores idénticos solo se cuentan
+- Al cerrar la ventana se emite un único mensaje con lo acumulado y, si hubo
+  algo, se abre otra ventana
+- Los cambios críticos se emiten siempre al instante (junto con lo acumulado)
+- Si la cola del bot ya tiene max_backlog mensajes sin enviar, los eventos no
+  críticos se siguen acumulando en lugar de encolarse
+- Un sondeo exitoso descarta los errores acumulados del dispositivo (no se
+  avisa tarde de una UPS que ya respondió) y, si se había avisado un error,
+  emite la recuperación
+- Un cambio que al cerrar la ventana volvió a su valor inicial (230 → 230) no
+  se emite, salvo que la ventana sea crítica (un nuevo corte tras volver la red)
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Window:
+    """Eventos acumulados de una clave"""
+
+    __slots__ = ('deadline', 'changes', 'count', 'critical', 'sent')
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.changes = {}
+        self.count = 0
+        self.critical = False
+        self.sent = False
+
+
+class AlertCoalescer:
+    """Agrupa alertas y errores por ventana de tiempo antes de encolarlos"""
+
+    def __init__(self, on_changes, on_error, window, max_backlog=None, backlog_fn=None,
+                 on_recovered=None):
+        """
+        Args:
+            on_changes: Callback on_changes(device, changes, critical) que encola una alerta.
+                Cada cambio es {'old', 'new', 'count'}
+            on_error: Callback on_error(device, message, repeats) que encola un error;
+                repeats son las repeticiones agrupadas desde el mensaje anterior (0 la primera vez)
+            on_recovered: Callback on_recovered(device, repeats) al primer sondeo exitoso
+                tras un error avisado; repeats son los errores descartados sin avisar
+            window: Segundos de la ventana de agrupación (0 desactiva la agrupación)
+            max_backlog: Máximo de mensajes sin enviar en la cola (None sin límite)
+            backlog_fn: Función que retorna los mensajes sin enviar en la cola
+        """
+        self.on_changes = on_changes
+        self.on_error = on_error
+        self.window = window
+        self.max_backlog = max_backlog
+        self.backlog_fn = backlog_fn
+        self.on_recovered = on_recovered
+        self._windows = {}
+        # Dispositivos con un error avisado y sin sondeo exitoso posterior
+        self._failing = set()
+
+    def _backlog_full(self):
+        if not self.max_backlog or self.backlog_fn is None:
+            return False
+        try:
+            return self.backlog_fn() >= self.max_backlog
+        except Exception as e:
+            logger.error(f"Error al consultar el tamaño de la cola: {str(e)}")
+            return False
+
+    def add_changes(self, device, changes, critical=False):
+        """
+        Registra los cambios de un sondeo.
+
+        Args:
+            device: Nombre del dispositivo
+            changes: Diccionario clave -> {'old', 'new'} (UPSState.update_state)
+            critical: Si algún cambio es crítico (se emite sin esperar la ventana)
+        """
+        if self.window <= 0:
+            self.on_changes(device, {
+                name: dict(change, count=1) for name, change in changes.items()
+            }, critical)
+            return
+
+        key = ('changes', device)
+        window = self._windows.get(key)
+        opened = window is None
+        if opened:
+            window = self._windows[key] = _Window(time.monotonic() + self.window)
+
+        for name, change in changes.items():
+            merged = window.changes.get(name)
+            if merged is None:
+                window.changes[name] = {'old': change['old'], 'new': change['new'], 'count': 1}
+            else:
+                merged['new'] = change['new']
+                merged['count'] += 1
+        window.count += 1
+        window.critical = window.critical or critical
+
+        if critical or (opened and not self._backlog_full()):
+            self._emit(key, window)
+
+    def add_error(self, device, message):
+        """
+        Registra un error. Los errores idénticos dentro de la ventana se cuentan.
+
+        Args:
+            device: Nombre del dispositivo
+            message: Texto del error (la clave de deduplicación)
+        """
+        if self.window <= 0:
+            self._failing.add(device)
+            self.on_error(device, message, 0)
+            return
+
+        key = ('error', device, message)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window(time.monotonic() + self.window)
+            window.count = 1
+            if not self._backlog_full():
+                self._emit(key, window)
+        else:
+            window.count += 1
+
+    def recover(self, device):
+        """
+        Registra un sondeo exitoso: descarta los errores acumulados del
+        dispositivo y emite la recuperación si se había avisado un error.
+
+        Args:
+            device: Nombre del dispositivo
+        """
+        dropped = 0
+        for key in [key for key in self._windows if key[0] == 'error' and key[1] == device]:
+            dropped += self._windows.pop(key).count
+        if device in self._failing:
+            self._failing.discard(device)
+            if self.on_recovered:
+                self.on_recovered(device, dropped)
+
+    def _emit(self, key, window):
+        """Emite lo acumulado en una ventana y la deja vacía"""
+        if key[0] == 'changes':
+            # Los cambios que volvieron a su valor inicial dentro de la ventana no
+            # se emiten, salvo en una ventana crítica: 3 → 5 → 3 → 5 es un
+            # segundo corte ("En batería → En batería (2 cambios)")
+            changes = window.changes if window.critical else {
+                name: change for name, change in window.changes.items()
+                if change['old'] != change['new']}
+            if changes:
+                self.on_changes(key[1], changes, window.critical)
+            window.changes = {}
+            window.critical = False
+        elif window.count:
+            repeats = window.count if window.sent else window.count - 1
+            self._failing.add(key[1])
+            self.on_error(key[1], key[2], repeats)
+        window.count = 0
+        window.sent = True
+
+    def flush_due(self):
+        """Cierra las ventanas vencidas (llamar periódicamente)"""
+        now = time.monotonic()
+        backlog_full = None
+        for key, window in list(self._windows.items()):
+            if window.deadline > now:
+                continue
+            if not window.count:
+                # Ventana sin eventos nuevos: la próxima alerta sale de inmediato
+                del self._windows[key]
+                continue
+            if backlog_full is None:
+                backlog_full = self._backlog_full()
+            if backlog_full:
+                # El bot está atrasado: se sigue acumulando
+                window.deadline = now + self.window
+                continue
+            self._emit(key, window)
+            window.deadline = now + self.window
+
+    def flush_all(self):
+        """Emite todo lo acumulado sin esperar las ventanas (al detener el monitor)"""
+        for key, window in list(self._windows.items()):
+            if window.count:
+                self._emit(key, window)
+        self._windows = {}
@@ -10,6 +10,12 @@ load_dotenv()
 class SNMPConfig:
     """Configuración SNMP v3"""
 
+    # Nombre del dispositivo cuando no se usa un registro de dispositivos
+    DEVICE_NAME = os.getenv('SNMP_DEVICE_NAME', 'ups')
+
+    # Registro de dispositivos (varias UPS/PDUs); si no existe se usa SNMP_HOST
+    DEVICES_FILE = os.getenv('UPS_DEVICES_FILE', '/app/data/devices.json')
+
     HOST = os.getenv('SNMP_HOST', '192.168.1.100')
     PORT = int(os.getenv('SNMP_PORT', '161'))
     USER = os.getenv('SNMP_USER', 'snmpuser')
@@ -25,6 +31,27 @@ class SNMPConfig:
     # Nivel de seguridad
     SECURITY_LEVEL = os.getenv('SNMP_SECURITY_LEVEL', 'authPriv')
 
+    # Transporte — timeout (s) y reintentos por PDU
+    TIMEOUT = float(os.getenv('SNMP_TIMEOUT', '5'))
+    RETRIES = int(os.getenv('SNMP_RETRIES', '3'))
+
+    # Consulta agrupada: todos los OIDs viajan en uno o pocos GET PDUs
+    # (un solo round-trip SNMPv3 por sondeo en lugar de uno por OID)
+    BATCH_GET = os.getenv('SNMP_BATCH_GET', 'true').lower() == 'true'
+    MAX_OIDS_PER_PDU = int(os.getenv('SNMP_MAX_OIDS_PER_PDU', '20'))
+
+    # Engine persistente: un único event loop, SnmpEngine, credenciales USM
+    # y transporte reutilizados entre sondeos (evita redescubrir el engine-ID
+    # y relocalizar las claves en cada consulta)
+    PERSISTENT_ENGINE = os.getenv('SNMP_PERSISTENT_ENGINE', 'true').lower() == 'true'
+
+    # Receptor de traps/informs SNMPv3 (mismas credenciales USM que el sondeo).
+    # Los traps v3 requieren el engine-ID del agente (hex); los informs no.
+    TRAP_ENABLED   = os.getenv('SNMP_TRAP_ENABLED', 'true').lower() == 'true'
+    TRAP_HOST      = os.getenv('SNMP_TRAP_HOST', '0.0.0.0')
+    TRAP_PORT      = int(os.getenv('SNMP_TRAP_PORT', '10162'))
+    TRAP_ENGINE_ID = os.getenv('SNMP_TRAP_ENGINE_ID', '')
+
     # OIDs validados contra la UPS Eaton 93E
     # Combinación de UPS-MIB estándar y OIDs privados Eaton (1.3.6.1.4.1.534)
     OIDS = {
@@ -62,6 +89,46 @@ class SNMPConfig:
         'alarms':           os.getenv('OID_UPS_ALARMS',           '1.3.6.1.4.1.534.1.7.1.0'),
     }
 
+    # Tablas UPS-MIB leídas con GETBULK (una fila por fase / por alarma activa).
+    # Cada columna genera <prefijo>_<columna> para la fase 1 y
+    # <prefijo>_<columna>_l<N> para las demás (ej: input_voltage, input_voltage_l2).
+    # Si una clave de OIDS ya apunta a una celda de la tabla, se obtiene de la
+    # tabla en lugar de un GET aparte; si apunta a otro OID, la clave de OIDS manda.
+    TABLES = {
+        'input': {                                   # upsInputTable
+            'oid': '1.3.6.1.2.1.33.1.3.3.1',
+            'columns': {2: ('frequency', 0.1), 3: ('voltage', None), 4: ('current', 0.1), 5: ('power', None)},
+        },
+        'output': {                                  # upsOutputTable
+            'oid': '1.3.6.1.2.1.33.1.4.4.1',
+            'columns': {2: ('voltage', None), 3: ('current', 0.1), 4: ('power', None), 5: ('load', None)},
+        },
+        'bypass': {                                  # upsBypassTable
+            'oid': '1.3.6.1.2.1.33.1.5.3.1',
+            'columns': {2: ('voltage', None), 3: ('current', 0.1), 4: ('power', None)},
+        },
+        'alarm': {                                   # upsAlarmTable → active_alarms
+            'oid': '1.3.6.1.2.1.33.1.6.2.1',
+            'columns': {2: ('descr', None)},
+        },
+    }
+    # Tablas a consultar (vacío desactiva la lectura de tablas)
+    TABLES_ENABLED = [t.strip() for t in os.getenv('SNMP_TABLES', 'input,output,bypass,alarm').split(',') if t.strip()]
+    # Filas pedidas por columna en cada GETBULK (fases + 1 alcanza para cerrar la tabla en un PDU)
+    BULK_MAX_REPETITIONS = int(os.getenv('SNMP_BULK_MAX_REPETITIONS', '4'))
+
+    # Alarmas conocidas de UPS-MIB (upsWellKnownAlarms, 1.3.6.1.2.1.33.1.6.3.N)
+    WELL_KNOWN_ALARMS = {
+        f'1.3.6.1.2.1.33.1.6.3.{number}': name for number, name in enumerate((
+            'batteryBad', 'onBattery', 'lowBattery', 'depletedBattery', 'temperatureBad',
+            'inputBad', 'outputBad', 'outputOverload', 'onBypass', 'bypassBad',
+            'outputOffAsRequested', 'upsOffAsRequested', 'chargerFailed', 'upsOutputOff',
+            'upsSystemOff', 'fanFailure', 'fuseFailure', 'generalFault',
+            'diagnosticTestFailed', 'communicationsLost', 'awaitingPower',
+            'shutdownPending', 'shutdownImminent', 'testInProgress',
+        ), start=1)
+    }
+
     # OIDs opcionales para información del sistema
     INFO_OIDS = {
         'model':    os.getenv('OID_UPS_MODEL'),
@@ -81,6 +148,88 @@ class MonitorConfig:
 
     CHECK_INTERVAL    = int(os.getenv('CHECK_INTERVAL_SECONDS', '60'))
     DAILY_REPORT_TIME = os.getenv('DAILY_REPORT_TIME', '09:00')
-    DATA_DIR          = '/app/data'
-    LOG_DIR           = '/app/logs'
-    STATE_FILE        = os.path.join(DATA_DIR, 'ups_state.json')
\ No newline at end of file
+    # Reporte diario: se arma con el estado y el histórico; solo se sondean los
+    # dispositivos cuyo último estado tiene más de DAILY_REPORT_MAX_AGE segundos
+    DAILY_REPORT_MAX_AGE = float(os.getenv('DAILY_REPORT_MAX_AGE_SECONDS', '900'))
+    # Volúmenes del contenedor (configurables para ejecutar fuera de Docker)
+    DATA_DIR          = os.getenv('DATA_DIR', '/app/data')
+    LOG_DIR           = os.getenv('LOG_DIR', '/app/logs')
+    STATE_FILE        = os.path.join(DATA_DIR, 'ups_state.json')
+    # Escritura diferida del estado: los cambios que alertan se escriben al
+    # instante; el resto como máximo cada STATE_FLUSH_SECONDS. Por defecto el
+    # intervalo de sondeo: /status (que lee el archivo) nunca queda más atrasado
+    # que un sondeo normal; solo se ahorran las escrituras del sondeo rápido
+    STATE_FLUSH_SECONDS = float(os.getenv('STATE_FLUSH_SECONDS', str(CHECK_INTERVAL)))
+    # Socket Unix del bot para avisar de mensajes nuevos (entrega inmediata)
+    NOTIFY_SOCKET     = os.path.join(DATA_DIR, 'notify.sock')
+    # Socket Unix de control: el bot pide sondeos en vivo (/status live)
+    CONTROL_SOCKET    = os.path.join(DATA_DIR, 'control.sock')
+    # Segundos que un sondeo en vivo se comparte con las peticiones que llegan después
+    LIVE_STATUS_WINDOW = float(os.getenv('LIVE_STATUS_WINDOW', '2'))
+
+    # Histórico de sondeos (SQLite, compartido con el bot)
+    HISTORY_ENABLED        = os.getenv('HISTORY_ENABLED', 'true').lower() == 'true'
+    HISTORY_DB             = os.path.join(DATA_DIR, 'history.db')
+    HISTORY_FLUSH_SECONDS  = float(os.getenv('HISTORY_FLUSH_SECONDS', '10'))
+    HISTORY_RETENTION_DAYS = {
+        'samples':   int(os.getenv('HISTORY_RAW_DAYS', '7')),
+        'rollup_1m': int(os.getenv('HISTORY_1M_DAYS', '90')),
+        'rollup_1h': int(os.getenv('HISTORY_1H_DAYS', '730')),
+    }
+
+    # Agrupación de alertas: ventana (s) en la que los cambios de un dispositivo
+    # se fusionan y los errores idénticos se cuentan (0 desactiva)
+    ALERT_COALESCE_SECONDS = float(os.getenv('ALERT_COALESCE_SECONDS', '60'))
+    # Mensajes sin enviar en la cola a partir de los cuales se sigue agrupando
+    QUEUE_MAX_BACKLOG = int(os.getenv('QUEUE_MAX_BACKLOG', '100'))
+
+    # Máquina de estados de alertas (alert_state.py): un cambio numérico no
+    # crítico alerta si se sostiene en N de los últimos M sondeos, con una permanencia
+    # mínima entre alertas de la misma métrica y una banda de histéresis
+    # (fracción del umbral) para volver en sentido contrario
+    ALERT_CONFIRM_POLLS  = int(os.getenv('ALERT_CONFIRM_POLLS', '2'))
+    ALERT_CONFIRM_WINDOW = int(os.getenv('ALERT_CONFIRM_WINDOW', '3'))
+    ALERT_HOLD_SECONDS   = float(os.getenv('ALERT_HOLD_SECONDS', '120'))
+    ALERT_HYSTERESIS     = float(os.getenv('ALERT_HYSTERESIS', '0.5'))
+
+    # Sondeo adaptativo: lento con la UPS Online y estable, rápido en batería,
+    # con batería baja, con métricas cerca de los umbrales de alerta, tras un
+    # cambio de estado o de alarmas y con alertas pendientes de confirmación
+    ADAPTIVE_POLLING     = os.getenv('ADAPTIVE_POLLING', 'true').lower() == 'true'
+    POLL_SLOW_INTERVAL   = float(os.getenv('POLL_SLOW_INTERVAL_SECONDS', '300'))
+    POLL_FAST_INTERVAL   = float(os.getenv('POLL_FAST_INTERVAL_SECONDS', '5'))
+    POLL_STABLE_POLLS    = int(os.getenv('POLL_STABLE_POLLS', '3'))
+    POLL_FAST_HOLD       = float(os.getenv('POLL_FAST_HOLD_SECONDS', '60'))
+
+    # Detección de anomalías: z-score del EWMA frente a la ventana de las
+    # últimas ANOMALY_WINDOW muestras y tendencias sostenidas (R² ≥ ANOMALY_TREND_R2)
+    ANOMALY_DETECTION   = os.getenv('ANOMALY_DETECTION', 'true').lower() == 'true'
+    ANOMALY_WINDOW      = int(os.getenv('ANOMALY_WINDOW', '60'))
+    ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', '20'))
+    ANOMALY_Z_THRESHOLD = float(os.getenv('ANOMALY_Z_THRESHOLD', '4'))
+    ANOMALY_TREND_R2    = float(os.getenv('ANOMALY_TREND_R2', '0.8'))
+
+    # Predicción de autonomía en batería: avisa al cruzar cada marca de
+    # RUNTIME_ALERT_MINUTES antes de llegar a RUNTIME_SHUTDOWN_CAPACITY (%)
+    RUNTIME_PREDICTION        = os.getenv('RUNTIME_PREDICTION', 'true').lower() == 'true'
+    RUNTIME_SHUTDOWN_CAPACITY = float(os.getenv('RUNTIME_SHUTDOWN_CAPACITY', '10'))
+    RUNTIME_ALERT_MINUTES     = [
+        int(m) for m in os.getenv('RUNTIME_ALERT_MINUTES', '15,10,5').split(',') if m.strip()
+    ]
+
+    # Exportador Prometheus (GET /metrics servido desde memoria)
+    METRICS_ENABLED   = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_HOST      = os.getenv('METRICS_HOST', '0.0.0.0')
+    METRICS_PORT      = int(os.getenv('METRICS_PORT', '9108'))
+
+    # Perfilado del ciclo de sondeo (también se activa en caliente con SIGUSR1)
+    PROFILING         = os.getenv('PROFILING', 'false').lower() == 'true'
+    PROFILE_MODE      = os.getenv('PROFILE_MODE', 'cprofile')   # cprofile | sample
+    PROFILE_SAMPLE_MS = float(os.getenv('PROFILE_SAMPLE_MS', '10'))
+
+    # Sondeo concurrente de dispositivos
+    POLL_CONCURRENCY  = int(os.getenv('POLL_CONCURRENCY', '50'))
+    # Tiempo máximo por sondeo de dispositivo (por defecto: todos los reintentos SNMP + 1s)
+    POLL_TIMEOUT      = float(os.getenv(
+        'POLL_TIMEOUT_SECONDS', str(SNMPConfig.TIMEOUT * (SNMPConfig.RETRIES + 1) + 1)
+    ))
\ No newline at end of file
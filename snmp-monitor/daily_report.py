@@ -0,0 +1,254 @@
+"""
+Reporte diario de todos los dispositivos, sin tráfico SNMP adicional
+
+Cada dispositivo se reporta con lo ya recolectado: su último estado
+(UPSState) y el histórico (shared/history.py) del último día:
+
+- Mínimo / promedio / máximo por métrica (rollup_1m, una consulta por
+  dispositivo; las fases de una métrica se combinan)
+- Tiempo en batería y cantidad de cortes (muestras crudas de status)
+- Alarmas nuevas (aumentos de upsAlarmsPresent)
+
+Los bloques de los dispositivos se empaquetan, en orden, en la menor cantidad
+de mensajes que permite el límite de Telegram (4096 caracteres, contados en
+UTF-16 como lo hace Telegram). Solo los dispositivos sin datos recientes se
+vuelven a sondear (UPSMonitor.generate_daily_report, en paralelo).
+"""
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from shared.rendering import format_runtime, render_state
+from ups_state import UPSState
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_LIMIT = 4096
+ON_BATTERY = 5.0  # upsOutputSource: battery(5)
+
+# Métrica -> (etiqueta, unidad) de la sección de estadísticas
+REPORT_METRICS = (
+    ('input_voltage',    'Entrada',       ' V'),
+    ('output_voltage',   'Salida',        ' V'),
+    ('output_load',      'Carga',         '%'),
+    ('battery_capacity', 'Carga Batería', '%'),
+    ('temperature',      'Temperatura',   '°C'),
+)
+
+
+def utf16_len(text):
+    """Largo de un texto como lo cuenta Telegram (unidades UTF-16: un emoji son 2)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def merge_phases(summaries, key):
+    """
+    Combina el resumen de una métrica y el de sus fases (key_l2, key_l3...).
+
+    Args:
+        summaries: Diccionario métrica -> (min, avg, max, muestras) (HistoryStore.summaries)
+
+    Returns:
+        Tupla (min, avg, max, muestras) o None si no hay datos
+    """
+    parts = [summary for metric, summary in summaries.items()
+             if metric == key or UPSState.PHASE_SUFFIX.sub('', metric) == key]
+    if not parts:
+        return None
+    count = sum(part[3] for part in parts)
+    return (
+        min(part[0] for part in parts),
+        sum(part[1] * part[3] for part in parts) / count,
+        max(part[2] for part in parts),
+        count,
+    )
+
+
+def time_at(points, value, until, max_gap):
+    """
+    Tiempo en que una métrica tuvo un valor y veces que entró en él.
+
+    Cada muestra vale hasta la siguiente, como mucho max_gap segundos (un hueco
+    mayor es el monitor detenido, no tiempo en ese valor).
+
+    Args:
+        points: Lista de (ts, value) ordenada (HistoryStore.points)
+
+    Returns:
+        Tupla (segundos, entradas)
+    """
+    seconds = 0.0
+    entries = 0
+    previous = None
+    for index, (ts, sample) in enumerate(points):
+        if sample == value:
+            end = points[index + 1][0] if index + 1 < len(points) else until
+            seconds += max(0.0, min(end, ts + max_gap, until) - ts)
+            if previous != value:
+                entries += 1
+        previous = sample
+    return seconds, entries
+
+
+def increments(points):
+    """Suma de los aumentos de una métrica (alarmas que aparecieron en el rango)"""
+    total = 0.0
+    previous = None
+    for _, sample in points:
+        if previous is not None and sample > previous:
+            total += sample - previous
+        previous = sample
+    return int(total)
+
+
+def _split_lines(block, budget):
+    """Corta por líneas un bloque que no entra en un mensaje"""
+    pieces = []
+    current = []
+    size = 0
+    for line in block.split('\n'):
+        while utf16_len(line) > budget:  # línea sola más larga que un mensaje
+            pieces.append(line[:budget // 2])
+            line = line[budget // 2:]
+        length = utf16_len(line)
+        if current and size + 1 + length > budget:
+            pieces.append('\n'.join(current))
+            current = []
+            size = 0
+        size += length + (1 if current else 0)
+        current.append(line)
+    if current:
+        pieces.append('\n'.join(current))
+    return pieces
+
+
+def pack(blocks, header, limit=TELEGRAM_LIMIT, separator='\n\n'):
+    """
+    Empaqueta bloques de texto, en orden, en la menor cantidad de mensajes.
+
+    Con el orden fijo, llenar cada mensaje antes de pasar al siguiente es
+    óptimo. Un bloque que no entra solo en un mensaje se corta por líneas.
+
+    Returns:
+        Lista de mensajes, cada uno con header (y su número si son varios)
+    """
+    separator_len = utf16_len(separator)
+    budget = limit - utf16_len(header) - len(' (99/99)') - separator_len
+
+    chunks = []
+    current = []
+    size = 0
+    for block in blocks:
+        length = utf16_len(block)
+        for piece in ([block] if length <= budget else _split_lines(block, budget)):
+            length = utf16_len(piece)
+            if current and size + separator_len + length > budget:
+                chunks.append(current)
+                current = []
+                size = 0
+            size += length + (separator_len if current else 0)
+            current.append(piece)
+    if current:
+        chunks.append(current)
+
+    if len(chunks) <= 1:
+        return [header + separator + separator.join(chunks[0] if chunks else [])]
+    total = len(chunks)
+    return [f"{header} ({number}/{total}){separator}{separator.join(chunk)}"
+            for number, chunk in enumerate(chunks, 1)]
+
+
+class DailyReport:
+    """Arma el reporte diario con el estado recolectado y el histórico"""
+
+    def __init__(self, history=None, max_age=900.0, period=86400.0, limit=TELEGRAM_LIMIT):
+        """
+        Args:
+            history: HistoryStore del monitor (None: solo el estado actual)
+            max_age: Segundos a partir de los cuales un estado ya no es reciente
+                y se vuelve a sondear; también es lo máximo que vale una
+                muestra de status al medir el tiempo en batería
+            period: Segundos que cubren las estadísticas (un día)
+            limit: Caracteres máximos por mensaje
+        """
+        self.history = history
+        self.max_age = max_age
+        self.period = period
+        self.limit = limit
+
+    def is_fresh(self, state, now=None):
+        """Si el estado tiene un last_update de hace menos de max_age segundos"""
+        last_update = state.get('last_update') if state else None
+        if not last_update:
+            return False
+        now = time.time() if now is None else now
+        try:
+            return now - datetime.fromisoformat(last_update).timestamp() <= self.max_age
+        except (TypeError, ValueError):
+            return False
+
+    def _stats(self, device_name, since, until):
+        """Sección de estadísticas del período, o None sin histórico"""
+        if self.history is None:
+            return None
+        try:
+            summaries = self.history.summaries(device_name, since, until)
+            status = self.history.points(device_name, 'status', since, until)
+            alarms = self.history.points(device_name, 'alarms', since, until)
+        except sqlite3.Error as e:
+            logger.error(f"[{device_name}] Error al leer el histórico para el reporte diario: {str(e)}")
+            return None
+
+        lines = []
+        for key, label, unit in REPORT_METRICS:
+            summary = merge_phases(summaries, key)
+            if summary is not None:
+                low, average, high, _ = summary
+                lines.append(f"   • {label}: {low:g} / {average:.1f} / {high:g}{unit}")
+        if status:
+            seconds, outages = time_at(status, ON_BATTERY, until, self.max_age)
+            lines.append(f"   • En batería: {format_runtime(seconds)} "
+                         f"({outages} {'corte' if outages == 1 else 'cortes'})")
+        if alarms:
+            lines.append(f"   • Alarmas nuevas: {increments(alarms)}")
+        if not lines:
+            return None
+        hours = self.period / 3600
+        return f"📊 *Últimas {hours:g} h* (mín / prom / máx):\n" + '\n'.join(lines)
+
+    def device_block(self, device, state, fresh=True, label=False, until=None):
+        """
+        Args:
+            device: Device reportado
+            state: Último estado del dispositivo (vacío si nunca respondió)
+            fresh: False si el estado no es reciente y el sondeo del reporte falló
+            label: Anteponer el nombre del dispositivo
+
+        Returns:
+            Bloque de texto del dispositivo
+        """
+        until = time.time() if until is None else until
+        lines = [f"🏷️ *{device.label}*"] if label else []
+        if not state:
+            lines.append("❌ Sin datos del dispositivo")
+        else:
+            if not fresh:
+                lines.append("⚠️ _Sin respuesta: último estado conocido_")
+            lines.append(render_state(state))
+        stats = self._stats(device.name, until - self.period, until)
+        if stats:
+            lines.append(f"\n{stats}")
+        return '\n'.join(lines)
+
+    def build(self, entries, until=None):
+        """
+        Args:
+            entries: Lista de (device, estado, reciente) en el orden del registro
+
+        Returns:
+            Lista de mensajes del reporte (los menos posibles)
+        """
+        until = time.time() if until is None else until
+        label = len(entries) > 1
+        blocks = [self.device_block(device, state, fresh, label, until) for device, state, fresh in entries]
+        return pack(blocks, "📅 *Reporte Diario*", self.limit)
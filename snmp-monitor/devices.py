@@ -0,0 +1,156 @@
+"""
+Registro de dispositivos SNMP monitoreados (UPS, PDUs)
+
+Los dispositivos se definen en un archivo JSON (UPS_DEVICES_FILE):
+
+    {
+        "defaults": {"user": "readuser", "auth_protocol": "MD5", "interval": 30},
+        "profiles": {"pdu": {"output_load": "1.3.6.1.4.1.534.6.6.7.1.2.1.3.0"}},
+        "devices": [
+            {"name": "ups1", "host": "10.150.0.8", "label": "UPS Sala 1"},
+            {"name": "pdu1", "host": "10.150.0.20", "profile": "pdu", "interval": 120, "tables": []}
+        ]
+    }
+
+Si el archivo no existe se usa un único dispositivo construido desde las
+variables SNMP_* de siempre, por lo que las instalaciones actuales no cambian.
+"""
+import json
+import logging
+import os
+from config import SNMPConfig, MonitorConfig
+
+logger = logging.getLogger(__name__)
+
+
+class Device:
+    """Dispositivo SNMP con su host, credenciales, perfil de OIDs e intervalo"""
+
+    def __init__(self, name, host, port=161, user='', auth_protocol='MD5',
+                 auth_password='', priv_protocol='DES', priv_password='',
+                 oids=None, interval=None, timeout=None, label=None, tables=None,
+                 trap_engine_id=''):
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.auth_protocol = auth_protocol
+        self.auth_password = auth_password
+        self.priv_protocol = priv_protocol
+        self.priv_password = priv_password
+        self.oids = oids if oids is not None else dict(SNMPConfig.OIDS)
+        self.interval = float(interval or MonitorConfig.CHECK_INTERVAL)
+        self.timeout = float(timeout or MonitorConfig.POLL_TIMEOUT)
+        self.label = label or name
+        # Tablas SNMP (SNMPConfig.TABLES) que se recorren con GETBULK en cada sondeo
+        self.tables = list(tables) if tables is not None else list(SNMPConfig.TABLES_ENABLED)
+        # Engine-ID (hex) del agente, necesario para aceptar sus traps SNMPv3
+        self.trap_engine_id = (trap_engine_id or '').replace(':', '').lower()
+
+    @classmethod
+    def from_config(cls):
+        """Dispositivo único definido por las variables SNMP_* del entorno"""
+        return cls(
+            name=SNMPConfig.DEVICE_NAME,
+            host=SNMPConfig.HOST,
+            port=SNMPConfig.PORT,
+            user=SNMPConfig.USER,
+            auth_protocol=SNMPConfig.AUTH_PROTOCOL,
+            auth_password=SNMPConfig.AUTH_PASSWORD,
+            priv_protocol=SNMPConfig.PRIV_PROTOCOL,
+            priv_password=SNMPConfig.PRIV_PASSWORD,
+            trap_engine_id=SNMPConfig.TRAP_ENGINE_ID,
+        )
+
+    @property
+    def credentials_key(self):
+        """Clave de credenciales USM (dispositivos con igual clave comparten SnmpEngine)"""
+        return (
+            self.user,
+            self.auth_protocol.upper(), self.auth_password,
+            self.priv_protocol.upper(), self.priv_password,
+        )
+
+    def __repr__(self):
+        return f"Device({self.name!r}, {self.host}:{self.port})"
+
+
+def _resolve_oids(entry, profiles):
+    """Combina el perfil de OIDs del dispositivo con sus OIDs propios"""
+    profile_name = entry.get('profile', 'default')
+    if profile_name == 'default':
+        oids = dict(SNMPConfig.OIDS)
+    elif profile_name in profiles:
+        oids = dict(profiles[profile_name])
+    else:
+        logger.warning(f"Perfil de OIDs '{profile_name}' no definido, usando el perfil por defecto")
+        oids = dict(SNMPConfig.OIDS)
+    oids.update(entry.get('oids', {}))
+    return oids
+
+
+def load_devices(path=None):
+    """
+    Carga el registro de dispositivos.
+
+    Args:
+        path: Archivo JSON de dispositivos (por defecto SNMPConfig.DEVICES_FILE)
+
+    Returns:
+        Lista de Device (nunca vacía)
+    """
+    path = path or SNMPConfig.DEVICES_FILE
+    if not os.path.exists(path):
+        return [Device.from_config()]
+
+    with open(path, 'r') as f:
+        registry = json.load(f)
+
+    base = Device.from_config()
+    defaults = {
+        'port': base.port,
+        'user': base.user,
+        'auth_protocol': base.auth_protocol,
+        'auth_password': base.auth_password,
+        'priv_protocol': base.priv_protocol,
+        'priv_password': base.priv_password,
+    }
+    defaults.update(registry.get('defaults', {}))
+    profiles = registry.get('profiles', {})
+
+    devices = []
+    names = set()
+    for entry in registry.get('devices', []):
+        merged = dict(defaults)
+        merged.update(entry)
+        name = merged.get('name')
+        if not name or not merged.get('host'):
+            logger.error(f"Dispositivo inválido en {path} (requiere 'name' y 'host'): {entry}")
+            continue
+        if name in names:
+            logger.error(f"Dispositivo duplicado en {path}: {name}")
+            continue
+        names.add(name)
+        devices.append(Device(
+            name=name,
+            host=merged['host'],
+            port=merged.get('port', 161),
+            user=merged.get('user', ''),
+            auth_protocol=merged.get('auth_protocol', 'MD5'),
+            auth_password=merged.get('auth_password', ''),
+            priv_protocol=merged.get('priv_protocol', 'DES'),
+            priv_password=merged.get('priv_password', ''),
+            oids=_resolve_oids(merged, profiles),
+            interval=merged.get('interval'),
+            timeout=merged.get('timeout'),
+            label=merged.get('label'),
+            tables=merged.get('tables'),
+            trap_engine_id=merged.get('trap_engine_id', ''),
+        ))
+
+    if not devices:
+        logger.warning(f"{path} no define dispositivos válidos, usando configuración SNMP_*")
+        return [Device.from_config()]
+
+    logger.info(f"Registro de dispositivos cargado: {len(devices)} dispositivo(s)")
+    return devices
@@ -0,0 +1,56 @@
+"""
+Sondeos en vivo bajo demanda (/status live) con coalescencia de peticiones
+
+Las peticiones para un mismo dispositivo que llegan mientras su sondeo en vivo
+está en curso, o hasta `window` segundos después de terminado, comparten ese
+único resultado: diez usuarios pidiendo /status live a la vez cuestan una sola
+consulta SNMP a la tarjeta de la UPS.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LivePoller:
+    """Sondeo bajo demanda compartido entre peticiones concurrentes"""
+
+    def __init__(self, poll_fn, window=2.0):
+        """
+        Args:
+            poll_fn: Corrutina poll_fn(device_name) que sondea y retorna los datos
+            window: Segundos que un resultado se reutiliza tras terminar el sondeo
+        """
+        self.poll_fn = poll_fn
+        self.window = window
+        self._inflight = {}
+        self._results = {}
+        self.requests = 0
+        self.polls = 0
+
+    async def _run(self, device_name):
+        self.polls += 1
+        try:
+            result = await self.poll_fn(device_name)
+            self._results[device_name] = (asyncio.get_running_loop().time(), result)
+            return result
+        finally:
+            self._inflight.pop(device_name, None)
+
+    async def get(self, device_name):
+        """
+        Datos frescos del dispositivo: sondeo nuevo, el que ya está en curso o
+        el resultado de uno terminado hace menos de window segundos.
+        """
+        self.requests += 1
+        cached = self._results.get(device_name)
+        if cached is not None and asyncio.get_running_loop().time() - cached[0] <= self.window:
+            return cached[1]
+
+        task = self._inflight.get(device_name)
+        if task is None:
+            task = self._inflight[device_name] = asyncio.ensure_future(self._run(device_name))
+        else:
+            logger.debug(f"[{device_name}] Sondeo en vivo compartido con una petición en curso")
+        # shield: si un solicitante se desconecta, el sondeo sigue para los demás
+        return await asyncio.shield(task)
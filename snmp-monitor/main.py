@@ -1,14 +1,27 @@
 """
 Servicio principal de monitoreo SNMP
 """
+import asyncio
 import logging
+import signal
 import time
 import schedule
-from datetime import datetime
-from config import SNMPConfig, MonitorConfig
-from snmp_client import SNMPClient
+from adaptive import AdaptiveInterval
+from coalescer import AlertCoalescer
+from config import MonitorConfig, SNMPConfig
+from daily_report import DailyReport
+from devices import load_devices
+from live import LivePoller
+from metrics import MetricsRegistry, MetricsServer
+from poller import DevicePoller
+from profiling import profiler
+from runtime_predictor import RuntimePredictor
 from ups_state import UPSState
-import json
+from shared.control import ControlServer
+from shared.history import HistoryStore
+from shared.message_queue import MessageQueue
+from shared.notify import Notifier
+from trap_receiver import TrapReceiver
 import os
 
 # Configurar logging
@@ -24,142 +37,448 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class UPSMonitor:
-    """Monitor principal de la UPS"""
-    
+    """Monitor principal de las UPS registradas"""
+
     def __init__(self):
-        self.snmp_client = SNMPClient()
-        self.ups_state = UPSState()
-        self.message_queue_file = os.path.join(MonitorConfig.DATA_DIR, 'message_queue.json')
-        
-    def check_ups(self):
-        """Verifica el estado actual de la UPS"""
-        logger.info("Verificando estado de la UPS...")
-        
+        self.devices = load_devices()
+        self.devices_by_name = {device.name: device for device in self.devices}
+        self.primary = self.devices[0]
+        self.notifier = Notifier(MonitorConfig.NOTIFY_SOCKET)
+        # El dispositivo principal conserva ups_state.json (leído por el bot);
+        # cada escritura de estado avisa al bot para invalidar su caché de /status
+        self.states = {
+            device.name: UPSState(
+                None if device is self.primary else device.name,
+                on_save=lambda: self.notifier.notify('state'),
+                primary_name=device.name if device is self.primary else None,
+            )
+            for device in self.devices
+        }
+        self.ups_state = self.states[self.primary.name]
+        self.adaptive = None
+        if MonitorConfig.ADAPTIVE_POLLING:
+            self.adaptive = AdaptiveInterval(
+                slow_interval=MonitorConfig.POLL_SLOW_INTERVAL,
+                fast_interval=MonitorConfig.POLL_FAST_INTERVAL,
+                stable_polls=MonitorConfig.POLL_STABLE_POLLS,
+                fast_hold=MonitorConfig.POLL_FAST_HOLD,
+            )
+        self.poller = DevicePoller(
+            self.devices, self.check_ups, MonitorConfig.POLL_CONCURRENCY,
+            interval_fn=self.adaptive.interval if self.adaptive else None,
+        )
+        self.queue = MessageQueue(MonitorConfig.DATA_DIR)
+        self.coalescer = AlertCoalescer(
+            self._queue_changes,
+            self._queue_error,
+            window=MonitorConfig.ALERT_COALESCE_SECONDS,
+            max_backlog=MonitorConfig.QUEUE_MAX_BACKLOG,
+            backlog_fn=self.queue.pending_count,
+            on_recovered=self._queue_recovered,
+        )
+        self.metrics = None
+        self.metrics_server = None
+        if MonitorConfig.METRICS_ENABLED:
+            self.metrics = MetricsRegistry(queue_depth_fn=self.queue.pending_count)
+            self.metrics_server = MetricsServer(
+                self.metrics, MonitorConfig.METRICS_HOST, MonitorConfig.METRICS_PORT
+            )
+        # Se crea en el primer sondeo: numpy no demora el arranque
+        self.anomaly = None
+        self.predictor = None
+        if MonitorConfig.RUNTIME_PREDICTION:
+            self.predictor = RuntimePredictor(
+                shutdown_capacity=MonitorConfig.RUNTIME_SHUTDOWN_CAPACITY,
+                alert_minutes=MonitorConfig.RUNTIME_ALERT_MINUTES,
+            )
+        self.live = LivePoller(self._live_poll, window=MonitorConfig.LIVE_STATUS_WINDOW)
+        self.control = ControlServer(
+            MonitorConfig.CONTROL_SOCKET,
+            {'status': self._control_status},
+            timeout=max(device.timeout for device in self.devices) + 5,
+        )
+        self.history = None
+        if MonitorConfig.HISTORY_ENABLED:
+            self.history = HistoryStore(
+                MonitorConfig.HISTORY_DB,
+                flush_interval=MonitorConfig.HISTORY_FLUSH_SECONDS,
+                retention_days=MonitorConfig.HISTORY_RETENTION_DAYS,
+            )
+        self.report = DailyReport(self.history, max_age=MonitorConfig.DAILY_REPORT_MAX_AGE)
+        self.traps = None
+        if SNMPConfig.TRAP_ENABLED:
+            self.traps = TrapReceiver(
+                self.devices, self._on_trap, SNMPConfig.TRAP_HOST, SNMPConfig.TRAP_PORT
+            )
+        # Dispositivos cuyo estado inicial aún no se envió (primer sondeo exitoso)
+        self._unannounced = {device.name for device in self.devices}
+        self.running = False
+
+    def _with_device(self, device, message):
+        """Antepone el nombre del dispositivo cuando se monitorea más de uno"""
+        if len(self.devices) == 1:
+            return message
+        return f"🏷️ *{device.label}*\n{message}"
+
+    async def _fetch(self, device, client):
+        """Sondea un dispositivo con su timeout; retorna None si no responde a tiempo"""
+        try:
+            return await asyncio.wait_for(client.get_all_values_async(), device.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"[{device.name}] Sondeo excedió el timeout de {device.timeout:.0f}s")
+            return None
+
+    async def check_ups(self, device, client):
+        """
+        Verifica el estado actual de una UPS.
+
+        Returns:
+            Valores obtenidos, o None si el sondeo falló
+        """
+        with profiler.span('monitor.check_ups'):
+            return await self._check_ups(device, client)
+
+    async def _check_ups(self, device, client):
+        logger.info(f"[{device.name}] Verificando estado de la UPS...")
+
         try:
             # Obtener todos los valores
-            data = self.snmp_client.get_all_values(SNMPConfig.OIDS)
-            
+            started = time.perf_counter()
+            data = await self._fetch(device, client)
+            if self.metrics:
+                self.metrics.record_poll(device.name, time.perf_counter() - started, data)
+
             # Verificar si hay valores
-            if all(v is None for v in data.values()):
-                logger.error("No se pudieron obtener datos de la UPS")
-                self._queue_message({
-                    'type': 'error',
-                    'message': '❌ Error: No se puede conectar con la UPS'
-                })
-                return
-            
+            if not data or all(v is None for v in data.values()):
+                if self.adaptive:
+                    self.adaptive.observe(device, None)
+                logger.error(f"[{device.name}] No se pudieron obtener datos de la UPS")
+                self.coalescer.add_error(device.name, '❌ Error: No se puede conectar con la UPS')
+                return None
+
+            # Descarta errores pendientes de avisar; avisa la recuperación si hubo error
+            self.coalescer.recover(device.name)
+
+            # Guardar muestra en el histórico
+            if self.history:
+                with profiler.span('monitor.history'):
+                    self.history.record(device.name, data)
+
             # Actualizar estado y detectar cambios
-            changes = self.ups_state.update_state(data)
-            
-            # Si hay cambios, encolar mensaje de alerta
+            ups_state = self.states[device.name]
+            with profiler.span('state.update'):
+                changes = ups_state.update_state(data)
+
+            # Ajustar el intervalo del próximo sondeo (rápido si hay alertas por confirmar)
+            if self.adaptive:
+                self.adaptive.observe(device, data, pending=any(ups_state.alerts.pending))
+
+            # Si hay cambios, pasan por el coalescer antes de encolarse
             if changes:
-                change_message = self.ups_state.format_change_message(changes)
-                if change_message:
+                logger.warning(f"[{device.name}] Cambios detectados: {changes}")
+                self.coalescer.add_changes(device.name, changes, ups_state.is_critical(changes))
+
+            # Estado inicial tras el arranque, después de las alertas del mismo sondeo
+            if device.name in self._unannounced:
+                self._unannounced.discard(device.name)
+                self._queue_report(device, data)
+
+            # Anomalías respecto de la ventana reciente (las ya alertadas por umbral se omiten)
+            if MonitorConfig.ANOMALY_DETECTION:
+                with profiler.span('monitor.anomaly'):
+                    anomalies = self._anomaly_detector().observe(device.name, data, skip=changes)
+                if anomalies:
                     self._queue_message({
                         'type': 'alert',
-                        'message': change_message
+                        'priority': 'alert',
+                        'device': device.name,
+                        'message': self._with_device(device, self.anomaly.format_message(anomalies))
                     })
-                    logger.warning(f"Cambios detectados: {changes}")
-            
+
+            # Predicción de autonomía (solo en batería); el aviso no espera al coalescer
+            if self.predictor:
+                estimate = self.predictor.observe(device.name, data)
+                if estimate is not None and estimate.alert_minutes is not None:
+                    self._queue_runtime(device, estimate)
+
+            return data
+
         except Exception as e:
-            logger.error(f"Error al verificar UPS: {str(e)}")
+            logger.error(f"[{device.name}] Error al verificar UPS: {str(e)}")
+            self.coalescer.add_error(device.name, f'❌ Error al verificar UPS: {str(e)}')
+            return None
+
+    def _anomaly_detector(self):
+        """Detector de anomalías, creado (e importado numpy) en el primer uso"""
+        if self.anomaly is None:
+            from anomaly import AnomalyDetector
+            self.anomaly = AnomalyDetector(
+                window=MonitorConfig.ANOMALY_WINDOW,
+                z_threshold=MonitorConfig.ANOMALY_Z_THRESHOLD,
+                trend_r2=MonitorConfig.ANOMALY_TREND_R2,
+                min_samples=MonitorConfig.ANOMALY_MIN_SAMPLES,
+            )
+        return self.anomaly
+
+    def _on_trap(self, device, event):
+        """
+        Aplica un trap/inform al estado y adelanta el sondeo que lo confirma.
+
+        Los valores implícitos del evento (status, battery_status, alarmas,
+        autonomía) alertan en el acto, sin la confirmación de los sondeos; el
+        sondeo posterior corrige el estado si el trap no se confirma.
+        """
+        ups_state = self.states[device.name]
+        current = ups_state.get_state()
+        values = dict(event.values)
+        if event.alarm:
+            alarms = [a for a in (current.get('active_alarms') or '').split(', ') if a]
+            if event.removed and event.alarm in alarms:
+                alarms.remove(event.alarm)
+            elif not event.removed and event.alarm not in alarms:
+                alarms.append(event.alarm)
+            values['active_alarms'] = ', '.join(alarms)
+
+        # Sin un sondeo previo no hay referencia: el sondeo inmediato alerta
+        if values and current:
+            changes = ups_state.update_state(values, immediate=True)
+            if changes:
+                logger.warning(f"[{device.name}] Cambios por trap: {changes}")
+                self.coalescer.add_changes(device.name, changes, ups_state.is_critical(changes))
+        elif not event.values and not event.alarm:
             self._queue_message({
-                'type': 'error',
-                'message': f'❌ Error al verificar UPS: {str(e)}'
+                'type': 'alert',
+                'priority': 'alert',
+                'device': device.name,
+                'message': self._with_device(device, f"📡 *Evento de la UPS:* {event.name}")
             })
-    
-    def generate_daily_report(self):
-        """Genera el reporte diario"""
-        logger.info("Generando reporte diario...")
-        
-        try:
-            # Obtener estado actual
-            data = self.snmp_client.get_all_values(SNMPConfig.OIDS)
-            
-            if all(v is None for v in data.values()):
-                logger.error("No se pudieron obtener datos para el reporte diario")
-                return
-            
-            # Generar mensaje
-            message = self.ups_state.format_state_message(data)
-            
-            # Encolar mensaje
+        self.poller.wake(device)
+
+    async def _live_poll(self, device_name):
+        """Sondeo en vivo: pasa por check_ups como cualquier sondeo (estado, alertas, histórico)"""
+        logger.info(f"[{device_name}] Sondeo en vivo solicitado")
+        return await self.poller.poll_with(self.check_ups, self.devices_by_name[device_name])
+
+    async def _control_status(self, request):
+        """
+        Petición 'status' del bot (/status live).
+
+        Args:
+            request: {'device': nombre} ('' o ausente = dispositivo principal)
+        """
+        name = request.get('device') or self.primary.name
+        if name not in self.devices_by_name:
+            raise ValueError(f"Dispositivo desconocido: {name}. "
+                             f"Disponibles: {', '.join(self.devices_by_name)}")
+        data = await self.live.get(name)
+        if not data:
+            raise ValueError('No se pudieron obtener datos de la UPS')
+        device = self.devices_by_name[name]
+        message = self._with_device(device, self.states[name].format_state_message(data))
+        return {'device': name, 'data': data, 'message': message}
+
+    def _queue_changes(self, device_name, changes, critical):
+        """Encola una alerta con los cambios (posiblemente agrupados) de un dispositivo"""
+        change_message = self.states[device_name].format_change_message(changes)
+        if change_message:
+            device = self.devices_by_name[device_name]
             self._queue_message({
-                'type': 'daily_report',
-                'message': f"📅 *Reporte Diario*\n\n{message}"
+                'type': 'alert',
+                'priority': 'critical' if critical else 'alert',
+                'device': device_name,
+                'message': self._with_device(device, change_message)
             })
-            
-            logger.info("Reporte diario generado")
-            
+
+    def _queue_runtime(self, device, estimate):
+        """Encola el aviso proactivo de autonomía restante"""
+        logger.warning(
+            f"[{device.name}] Autonomía estimada: {estimate.shutdown_seconds / 60:.1f} min "
+            f"hasta el apagado, {estimate.depletion_seconds / 60:.1f} min hasta agotarse"
+        )
+        self._queue_message({
+            'type': 'alert',
+            'priority': 'critical',
+            'device': device.name,
+            'message': self._with_device(device, self.predictor.format_alert(estimate))
+        })
+
+    def _queue_error(self, device_name, message, repeats):
+        """Encola un error; repeats indica errores idénticos agrupados desde el anterior"""
+        if repeats:
+            message += f"\n_(repetido {repeats} {'vez' if repeats == 1 else 'veces'})_"
+        self._queue_message({
+            'type': 'error',
+            'device': device_name,
+            'message': self._with_device(self.devices_by_name[device_name], message)
+        })
+
+    def _queue_recovered(self, device_name, repeats):
+        """Encola el aviso de recuperación tras un error avisado"""
+        message = '✅ Comunicación con la UPS recuperada'
+        if repeats:
+            message += f"\n_({repeats} {'error' if repeats == 1 else 'errores'} más desde el último aviso)_"
+        self._queue_message({
+            'type': 'error',
+            'device': device_name,
+            'message': self._with_device(self.devices_by_name[device_name], message)
+        })
+
+    def _queue_report(self, device, data):
+        """Encola el estado inicial de un dispositivo (con el formato del reporte diario)"""
+        message = self.states[device.name].format_state_message(data)
+        self._queue_message({
+            'type': 'daily_report',
+            'device': device.name,
+            'message': self._with_device(device, f"📅 *Reporte Diario*\n\n{message}")
+        })
+
+    async def generate_daily_report(self):
+        """
+        Genera el reporte diario de todos los dispositivos con el estado ya
+        recolectado y el histórico; solo los dispositivos sin datos recientes
+        se vuelven a sondear (en paralelo)
+        """
+        logger.info("Generando reporte diario...")
+        try:
+            now = time.time()
+            stale = [device for device in self.devices
+                     if not self.report.is_fresh(self.states[device.name].get_state(), now)]
+            failed = set()
+            if stale:
+                logger.info(f"Reporte diario: sondeando {len(stale)} dispositivo(s) sin datos recientes")
+                results = await asyncio.gather(*(
+                    self.poller.poll_with(self.check_ups, device) for device in stale
+                ))
+                for device, data in zip(stale, results):
+                    if not data or all(v is None for v in data.values()):
+                        logger.error(f"[{device.name}] No se pudieron obtener datos para el reporte diario")
+                        failed.add(device.name)
+
+            with profiler.span('monitor.daily_report'):
+                if self.history:
+                    self.history.flush()
+                messages = self.report.build([
+                    (device, self.states[device.name].get_state(), device.name not in failed)
+                    for device in self.devices
+                ])
+            for message in messages:
+                record = {'type': 'daily_report', 'message': message}
+                if len(self.devices) == 1:
+                    record['device'] = self.primary.name
+                self._queue_message(record)
+            logger.info(f"Reporte diario generado: {len(self.devices)} dispositivo(s) en {len(messages)} mensaje(s)")
+
         except Exception as e:
             logger.error(f"Error al generar reporte diario: {str(e)}")
-    
+
     def _queue_message(self, message_data):
         """
         Agrega un mensaje a la cola para ser enviado por el bot de Telegram
-        
+
         Args:
             message_data: Diccionario con el tipo y mensaje
         """
         try:
-            os.makedirs(MonitorConfig.DATA_DIR, exist_ok=True)
-            
-            # Cargar cola existente
-            queue = []
-            if os.path.exists(self.message_queue_file):
-                with open(self.message_queue_file, 'r') as f:
-                    queue = json.load(f)
-            
-            # Agregar nuevo mensaje con timestamp
-            message_data['timestamp'] = datetime.now().isoformat()
-            queue.append(message_data)
-            
-            # Guardar cola actualizada
-            with open(self.message_queue_file, 'w') as f:
-                json.dump(queue, f, indent=2)
-            
+            with profiler.span('queue.put'):
+                self.queue.put(message_data)
+            self.notifier.notify('queue')
             logger.info(f"Mensaje encolado: {message_data['type']}")
-            
+
         except Exception as e:
             logger.error(f"Error al encolar mensaje: {str(e)}")
-    
-    def start(self):
-        """Inicia el monitoreo"""
-        logger.info("Iniciando monitor de UPS...")
-        logger.info(f"Host: {SNMPConfig.HOST}:{SNMPConfig.PORT}")
-        logger.info(f"Usuario: {SNMPConfig.USER}")
-        logger.info(f"Intervalo de verificación: {MonitorConfig.CHECK_INTERVAL} segundos")
-        logger.info(f"Reporte diario: {MonitorConfig.DAILY_REPORT_TIME}")
-        
-        # Probar conexión
-        if not self.snmp_client.test_connection():
-            logger.error("No se pudo conectar a la UPS. Verificar configuración.")
-            self._queue_message({
-                'type': 'error',
-                'message': '❌ Error: No se puede conectar con la UPS al iniciar'
-            })
-        else:
-            logger.info("Conexión SNMP exitosa")
-            # Enviar estado inicial
-            self.generate_daily_report()
-        
-        # Programar tareas
-        schedule.every(MonitorConfig.CHECK_INTERVAL).seconds.do(self.check_ups)
-        schedule.every().day.at(MonitorConfig.DAILY_REPORT_TIME).do(self.generate_daily_report)
-        
-        logger.info("Monitor iniciado correctamente")
-        
-        # Loop principal
-        while True:
+
+    async def _schedule_loop(self):
+        """Ejecuta las tareas programadas (reporte diario, escritura del histórico y del estado)"""
+        while self.running:
             try:
                 schedule.run_pending()
-                time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info("Monitor detenido por el usuario")
-                break
+                self.coalescer.flush_due()
+                for state in self.states.values():
+                    state.flush_if_due()
+                if self.history:
+                    self.history.flush_if_due()
             except Exception as e:
                 logger.error(f"Error en loop principal: {str(e)}")
-                time.sleep(5)
+            await asyncio.sleep(1)
+
+    def _spawn_daily_report(self):
+        """Lanza el reporte diario sin bloquear el loop de tareas programadas"""
+        asyncio.get_running_loop().create_task(self.generate_daily_report())
+
+    def stop(self):
+        """Detiene el monitoreo"""
+        if self.running:
+            logger.info("Señal de terminación recibida")
+        self.running = False
+        self.poller.stop()
+
+    async def run(self):
+        """Loop principal asíncrono"""
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, self.stop)
+        loop.add_signal_handler(signal.SIGUSR1, profiler.toggle)
+        loop.add_signal_handler(signal.SIGUSR2, profiler.dump)
+        self.running = True
+
+        # El primer sondeo arranca ya (alertas pendientes tras un corte) y corre
+        # en paralelo con la apertura de los servidores; el estado inicial de
+        # cada dispositivo se envía con su primer sondeo exitoso. Clientes y
+        # semáforo se crean antes: /status live o el reporte pueden llegar
+        # antes de que la tarea de sondeo llegue a ejecutarse
+        self.poller.setup()
+        polling = asyncio.ensure_future(self.poller.run())
+        try:
+            if self.metrics_server:
+                await self.metrics_server.start()
+            await self.control.start()
+            if self.traps and not self.traps.start():
+                self.traps = None
+
+            # Programar tareas
+            schedule.every().day.at(MonitorConfig.DAILY_REPORT_TIME).do(self._spawn_daily_report)
+
+            logger.info("Monitor iniciado correctamente")
+            await asyncio.gather(polling, self._schedule_loop())
+        finally:
+            if not polling.done():
+                self.poller.stop()
+                await asyncio.gather(polling, return_exceptions=True)
+            if self.traps:
+                self.traps.close()
+            await self.control.close()
+            if self.metrics_server:
+                await self.metrics_server.close()
+            self.coalescer.flush_all()
+            for state in self.states.values():
+                state.flush()
+            profiler.stop()
+            if self.history:
+                self.history.close()
+            self.notifier.close()
+            logger.info("Monitor detenido")
+
+    def start(self):
+        """Inicia el monitoreo"""
+        logger.info("Iniciando monitor de UPS...")
+        profiler.configure(
+            MonitorConfig.LOG_DIR,
+            mode=MonitorConfig.PROFILE_MODE,
+            sample_interval=MonitorConfig.PROFILE_SAMPLE_MS / 1000,
+        )
+        if MonitorConfig.PROFILING:
+            profiler.start()
+        for device in self.devices:
+            logger.info(f"Dispositivo {device.name}: {device.host}:{device.port} "
+                        f"(usuario {device.user}, cada {device.interval:.0f}s)")
+        if self.adaptive:
+            logger.info(f"Sondeo adaptativo: lento cada {MonitorConfig.POLL_SLOW_INTERVAL:.0f}s, "
+                        f"rápido cada {MonitorConfig.POLL_FAST_INTERVAL:.0f}s")
+        logger.info(f"Reporte diario: {MonitorConfig.DAILY_REPORT_TIME}")
+
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logger.info("Monitor detenido por el usuario")
 
 if __name__ == "__main__":
     monitor = UPSMonitor()
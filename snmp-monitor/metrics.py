@@ -0,0 +1,242 @@
+"""
+Exportador de métricas Prometheus (formato de texto 0.0.4) para snmp-monitor
+
+GET /metrics se responde desde la última instantánea en memoria de cada
+dispositivo: un scrape nunca genera tráfico SNMP. Expone:
+
+    ups_<métrica>{device}                  Último valor de cada clave de SNMPConfig.OIDS
+    ups_up{device}                         1 si el último sondeo obtuvo datos
+    ups_poll_duration_seconds{device}      Histograma de duración de sondeos
+    ups_polls_total / ups_poll_failures_total{device}
+    ups_oid_errors_total{device,metric}    OIDs sin valor (noSuch*, timeout)
+    ups_last_success_age_seconds{device}   Antigüedad del último sondeo exitoso
+    ups_message_queue_depth                Mensajes sin enviar en la cola del bot
+"""
+import asyncio
+import logging
+import time
+from shared.history import parse_numeric
+
+logger = logging.getLogger(__name__)
+
+POLL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _DeviceMetrics:
+    __slots__ = ('values', 'up', 'polls', 'failures', 'oid_errors',
+                 'bucket_counts', 'duration_sum', 'last_success')
+
+    def __init__(self):
+        self.values = {}
+        self.up = 0
+        self.polls = 0
+        self.failures = 0
+        self.oid_errors = {}
+        self.bucket_counts = [0] * len(POLL_BUCKETS)
+        self.duration_sum = 0.0
+        self.last_success = None
+
+
+class MetricsRegistry:
+    """Instantánea en memoria de los sondeos y contadores internos"""
+
+    def __init__(self, queue_depth_fn=None):
+        """
+        Args:
+            queue_depth_fn: Función que retorna los mensajes sin enviar en la cola
+        """
+        self.queue_depth_fn = queue_depth_fn
+        self._devices = {}
+        self._version = 0
+        self._rendered = (None, b'')
+
+    def _device(self, name):
+        metrics = self._devices.get(name)
+        if metrics is None:
+            metrics = self._devices[name] = _DeviceMetrics()
+        return metrics
+
+    def record_poll(self, device, duration, data):
+        """
+        Registra un sondeo.
+
+        Args:
+            device: Nombre del dispositivo
+            duration: Segundos que tomó el sondeo
+            data: Valores obtenidos (None o vacío si el sondeo falló)
+        """
+        metrics = self._device(device)
+        metrics.polls += 1
+        metrics.duration_sum += duration
+        for index, bound in enumerate(POLL_BUCKETS):
+            if duration <= bound:
+                metrics.bucket_counts[index] += 1
+
+        if not data or all(value is None for value in data.values()):
+            metrics.failures += 1
+            metrics.up = 0
+        else:
+            metrics.up = 1
+            metrics.last_success = time.time()
+            for key, value in data.items():
+                if value is None:
+                    metrics.oid_errors[key] = metrics.oid_errors.get(key, 0) + 1
+                    continue
+                number = parse_numeric(value)
+                if number is not None:
+                    metrics.values[key] = number
+        self._version += 1
+
+    def _render_snapshot(self):
+        """Parte de la salida que solo cambia con cada sondeo (se cachea)"""
+        lines = []
+        devices = sorted(self._devices.items())
+
+        keys = sorted({key for _, metrics in devices for key in metrics.values})
+        for key in keys:
+            lines.append(f'# HELP ups_{key} Último valor SNMP de {key}')
+            lines.append(f'# TYPE ups_{key} gauge')
+            for name, metrics in devices:
+                if key in metrics.values:
+                    lines.append(f'ups_{key}{_labels(device=name)} {_number(metrics.values[key])}')
+
+        lines.append('# HELP ups_up 1 si el último sondeo obtuvo datos')
+        lines.append('# TYPE ups_up gauge')
+        for name, metrics in devices:
+            lines.append(f'ups_up{_labels(device=name)} {metrics.up}')
+
+        lines.append('# HELP ups_poll_duration_seconds Duración de los sondeos SNMP')
+        lines.append('# TYPE ups_poll_duration_seconds histogram')
+        for name, metrics in devices:
+            for bound, count in zip(POLL_BUCKETS, metrics.bucket_counts):
+                lines.append(f'ups_poll_duration_seconds_bucket{_labels(device=name, le=_number(bound))} {count}')
+            lines.append(f'ups_poll_duration_seconds_bucket{_labels(device=name, le="+Inf")} {metrics.polls}')
+            lines.append(f'ups_poll_duration_seconds_sum{_labels(device=name)} {_number(metrics.duration_sum)}')
+            lines.append(f'ups_poll_duration_seconds_count{_labels(device=name)} {metrics.polls}')
+
+        lines.append('# HELP ups_polls_total Sondeos realizados')
+        lines.append('# TYPE ups_polls_total counter')
+        for name, metrics in devices:
+            lines.append(f'ups_polls_total{_labels(device=name)} {metrics.polls}')
+
+        lines.append('# HELP ups_poll_failures_total Sondeos sin datos')
+        lines.append('# TYPE ups_poll_failures_total counter')
+        for name, metrics in devices:
+            lines.append(f'ups_poll_failures_total{_labels(device=name)} {metrics.failures}')
+
+        lines.append('# HELP ups_oid_errors_total OIDs sin valor en sondeos exitosos')
+        lines.append('# TYPE ups_oid_errors_total counter')
+        for name, metrics in devices:
+            for key, count in sorted(metrics.oid_errors.items()):
+                lines.append(f'ups_oid_errors_total{_labels(device=name, metric=key)} {count}')
+
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def render(self):
+        """Salida completa para un scrape"""
+        version, snapshot = self._rendered
+        if version != self._version:
+            snapshot = self._render_snapshot()
+            self._rendered = (self._version, snapshot)
+
+        now = time.time()
+        lines = [
+            '# HELP ups_last_success_age_seconds Segundos desde el último sondeo exitoso',
+            '# TYPE ups_last_success_age_seconds gauge',
+        ]
+        for name, metrics in sorted(self._devices.items()):
+            if metrics.last_success is not None:
+                lines.append(f'ups_last_success_age_seconds{_labels(device=name)} '
+                             f'{_number(now - metrics.last_success)}')
+
+        if self.queue_depth_fn is not None:
+            try:
+                depth = self.queue_depth_fn()
+                lines.append('# HELP ups_message_queue_depth Mensajes sin enviar en la cola del bot')
+                lines.append('# TYPE ups_message_queue_depth gauge')
+                lines.append(f'ups_message_queue_depth {depth}')
+            except Exception as e:
+                logger.error(f"Error al leer la profundidad de la cola: {str(e)}")
+
+        return snapshot + ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class MetricsServer:
+    """Servidor HTTP mínimo dentro del event loop del monitor"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, registry, host, port):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        """Abre el puerto. Retorna False si no se pudo (el monitor sigue sin métricas)"""
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            logger.info(f"Métricas Prometheus en http://{self.host}:{self.port}/metrics")
+            return True
+        except OSError as e:
+            logger.error(f"No se pudo abrir el puerto de métricas {self.port}: {str(e)}")
+            return False
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            # Descartar cabeceras
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if not line or line in (b'\r\n', b'\n'):
+                    break
+
+            parts = request.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) >= 2 else ''
+            if len(parts) >= 2 and parts[0] in ('GET', 'HEAD') and path == '/metrics':
+                body = self.registry.render()
+                status, content_type = '200 OK', self.CONTENT_TYPE
+                if parts[0] == 'HEAD':
+                    writer.write(self._headers(status, content_type, len(body)))
+                    body = b''
+            else:
+                body = b'Not Found\n'
+                status, content_type = '404 Not Found', 'text/plain; charset=utf-8'
+            if body:
+                writer.write(self._headers(status, content_type, len(body)) + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Error al atender scrape de métricas: {str(e)}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _headers(status, content_type, length):
+        return (
+            f'HTTP/1.1 {status}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {length}\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode('latin-1')
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,166 @@
+"""
+Planificador de sondeo concurrente para múltiples dispositivos
+"""
+import asyncio
+import logging
+from pysnmp.hlapi.v3arch.asyncio import SnmpEngine
+from snmp_client import SNMPClient
+
+logger = logging.getLogger(__name__)
+
+
+class DevicePoller:
+    """
+    Sondea todos los dispositivos del registro de forma concurrente.
+
+    Cada dispositivo tiene su propia tarea con plazos fijos (t0 + n·intervalo),
+    de modo que la duración de un sondeo no desplaza los siguientes. El
+    intervalo se consulta tras cada sondeo (interval_fn), lo que permite
+    sondeo adaptativo y wake() adelanta el próximo sondeo (traps). Un
+    semáforo limita los sondeos simultáneos y los dispositivos con las mismas
+    credenciales USM comparten un único SnmpEngine.
+    """
+
+    def __init__(self, devices, check_fn, concurrency, interval_fn=None):
+        """
+        Args:
+            devices: Lista de Device
+            check_fn: Corrutina check_fn(device, client) que sondea y procesa un dispositivo
+            concurrency: Máximo de sondeos simultáneos
+            interval_fn: Función interval_fn(device) con los segundos hasta el
+                próximo sondeo (por defecto device.interval)
+        """
+        self.devices = devices
+        self.check_fn = check_fn
+        self.interval_fn = interval_fn or (lambda device: device.interval)
+        self.concurrency = max(1, concurrency)
+        self.clients = {}
+        self._engines = {}
+        self._semaphore = None
+        self._tasks = []
+        self._wake = {}
+        self.running = False
+
+    def _build_clients(self):
+        """Crea los clientes SNMP agrupando engines por credenciales"""
+        for device in self.devices:
+            key = device.credentials_key
+            if key not in self._engines:
+                self._engines[key] = SnmpEngine()
+            self.clients[device.name] = SNMPClient(device, snmp_engine=self._engines[key])
+        logger.info(
+            f"{len(self.clients)} dispositivo(s), {len(self._engines)} SnmpEngine(s), "
+            f"concurrencia máxima {self.concurrency}"
+        )
+
+    def setup(self):
+        """Prepara clientes y semáforo (llamar dentro del event loop)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._build_clients()
+
+    async def poll_with(self, fn, device):
+        """
+        Ejecuta fn(device, client) respetando el límite de concurrencia.
+
+        Returns:
+            Resultado de fn, o None si lanzó una excepción
+        """
+        async with self._semaphore:
+            try:
+                return await fn(device, self.clients[device.name])
+            except Exception as e:
+                logger.error(f"[{device.name}] Error en sondeo: {str(e)}")
+                return None
+
+    async def poll(self, device):
+        """Sondea un dispositivo con la función de verificación registrada"""
+        await self.poll_with(self.check_fn, device)
+
+    def wake(self, device):
+        """Adelanta el próximo sondeo del dispositivo (llamar dentro del event loop)"""
+        event = self._wake.get(device.name)
+        if event is not None:
+            event.set()
+
+    async def _sleep_until(self, device, delay):
+        """
+        Espera delay segundos o hasta wake(device).
+
+        Returns:
+            True si se despertó antes de tiempo
+        """
+        event = self._wake[device.name]
+        try:
+            await asyncio.wait_for(event.wait(), delay)
+        except asyncio.TimeoutError:
+            return False
+        event.clear()
+        return True
+
+    async def _device_loop(self, device, offset):
+        """
+        Loop de sondeo de un dispositivo con plazos sin deriva.
+
+        El primer sondeo es inmediato (tras un reinicio las alertas no esperan
+        un intervalo completo); el segundo llega a los offset segundos para
+        escalonar los dispositivos y de ahí en más cada intervalo. Un wake()
+        sondea en el acto y reinicia los plazos desde ese momento.
+        """
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        first = True
+        while self.running:
+            delay = next_run - loop.time()
+            if delay > 0 and await self._sleep_until(device, delay):
+                next_run = loop.time()
+            await self.poll(device)
+
+            interval = self.interval_fn(device)
+            next_run += min(offset, interval) if first else interval
+            first = False
+            now = loop.time()
+            if next_run <= now:
+                # Sondeo más largo que el intervalo: se saltan los plazos perdidos
+                # en lugar de encadenar sondeos atrasados
+                missed = int((now - next_run) // interval) + 1
+                next_run += missed * interval
+                logger.warning(f"[{device.name}] Sondeo atrasado, {missed} plazo(s) omitido(s)")
+
+    async def run(self):
+        """Ejecuta los loops de todos los dispositivos hasta stop()"""
+        self.setup()
+        self.running = True
+
+        # Primera ronda inmediata (acotada por el semáforo de concurrencia); las
+        # siguientes escalonadas dentro del intervalo para evitar ráfagas
+        count = len(self.devices)
+        self._wake = {device.name: asyncio.Event() for device in self.devices}
+        self._tasks = [
+            asyncio.create_task(self._device_loop(device, (index + 1) * device.interval / count))
+            for index, device in enumerate(self.devices)
+        ]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.close()
+
+    def stop(self):
+        """Detiene todos los loops de sondeo"""
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+
+    async def close(self):
+        """Libera clientes y engines SNMP"""
+        for client in self.clients.values():
+            await client.aclose()
+        for engine in self._engines.values():
+            try:
+                engine.close_dispatcher()
+            except Exception as e:
+                logger.debug(f"Error al cerrar engine SNMP: {str(e)}")
+        self._engines = {}
+        self.clients = {}
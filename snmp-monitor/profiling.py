@@ -0,0 +1,237 @@
+"""
+Instrumentación del ciclo de sondeo
+
+Spans de tiempo alrededor de cada etapa (creación de engine y transporte, GETs
+SNMP, update_state, guardado de estado, encolado...) con percentiles
+p50/p95/p99, más un perfilador opcional:
+
+    cprofile  cProfile determinista (salida pstats y archivo .prof)
+    sample    Muestreo de la pila del hilo principal cada PROFILE_SAMPLE_MS
+              (formato "folded" para flamegraph.pl / speedscope)
+
+Activación: PROFILING=true al iniciar, o en caliente con señales:
+    SIGUSR1  Activa / desactiva (al desactivar vuelca el reporte)
+    SIGUSR2  Vuelca el reporte sin desactivar
+
+Los reportes se escriben en LOG_DIR como profile-<fecha>.txt (+ .prof / .folded).
+Con el perfilado apagado un span cuesta una comparación.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'started')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _StackSampler(threading.Thread):
+    """Perfilador por muestreo: cuenta las pilas del hilo principal"""
+
+    def __init__(self, interval):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.interval = interval
+        self.target = threading.main_thread().ident
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1)
+
+
+class Profiler:
+    """Registro de spans por etapa y control del perfilador"""
+
+    def __init__(self, window=2000):
+        """
+        Args:
+            window: Últimas duraciones que se guardan por etapa para los percentiles
+        """
+        self.window = window
+        self.enabled = False
+        self.mode = 'cprofile'
+        self.sample_interval = 0.01
+        self.log_dir = '.'
+        self._durations = {}
+        self._counts = Counter()
+        self._cprofile = None
+        self._sampler = None
+        self._started = None
+
+    def configure(self, log_dir, mode='cprofile', sample_interval=0.01):
+        self.log_dir = log_dir
+        self.mode = mode
+        self.sample_interval = sample_interval
+
+    def span(self, name):
+        """Context manager que mide una etapa (no-op con el perfilado apagado)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, duration):
+        durations = self._durations.get(name)
+        if durations is None:
+            durations = self._durations[name] = deque(maxlen=self.window)
+        durations.append(duration)
+        self._counts[name] += 1
+
+    def start(self):
+        """Activa spans y el perfilador configurado"""
+        if self.enabled:
+            return
+        self._durations = {}
+        self._counts = Counter()
+        self._started = datetime.now()
+        if self.mode == 'sample':
+            self._sampler = _StackSampler(self.sample_interval)
+            self._sampler.start()
+        elif self.mode == 'cprofile':
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self.enabled = True
+        logger.info(f"Perfilado activado (modo {self.mode})")
+
+    def stop(self):
+        """Desactiva el perfilado y vuelca el reporte"""
+        if not self.enabled:
+            return None
+        path = self.dump()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+        self.enabled = False
+        logger.info("Perfilado desactivado")
+        return path
+
+    def toggle(self):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+
+    @staticmethod
+    def _percentile(ordered, fraction):
+        index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        """
+        Returns:
+            Diccionario etapa -> {'count', 'p50', 'p95', 'p99', 'max'} en segundos
+        """
+        result = {}
+        for name, durations in self._durations.items():
+            ordered = sorted(durations)
+            result[name] = {
+                'count': self._counts[name],
+                'p50': self._percentile(ordered, 0.50),
+                'p95': self._percentile(ordered, 0.95),
+                'p99': self._percentile(ordered, 0.99),
+                'max': ordered[-1],
+            }
+        return result
+
+    def format_summary(self):
+        lines = [f"{'etapa':28} {'n':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, stats in sorted(self.summary().items()):
+            lines.append(
+                f"{name:28} {stats['count']:>8} {stats['p50'] * 1000:>9.2f} "
+                f"{stats['p95'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f} {stats['max'] * 1000:>9.2f}"
+            )
+        return '\n'.join(lines)
+
+    def dump(self):
+        """
+        Escribe el reporte en log_dir sin detener el perfilado.
+
+        Returns:
+            Ruta del reporte, o None si el perfilado no está activo
+        """
+        if not self.enabled:
+            return None
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(self.log_dir, f'profile-{stamp}')
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(base + '.txt', 'w') as f:
+                f.write(f"Perfilado desde {self._started:%Y-%m-%d %H:%M:%S} (modo {self.mode})\n\n")
+                f.write("Spans por etapa (tiempo de reloj, incluye esperas de red)\n")
+                f.write(self.format_summary() + '\n')
+
+                if self._cprofile is not None:
+                    # create_stats() detiene el perfilador: se reanuda tras volcar
+                    self._cprofile.create_stats()
+                    self._cprofile.dump_stats(base + '.prof')
+                    self._cprofile.enable()
+                    out = io.StringIO()
+                    pstats.Stats(base + '.prof', stream=out).sort_stats('cumulative').print_stats(40)
+                    f.write('\ncProfile (40 funciones por tiempo acumulado)\n' + out.getvalue())
+
+                if self._sampler is not None:
+                    stacks = list(self._sampler.stacks.items())
+                    with open(base + '.folded', 'w') as folded:
+                        for stack, count in stacks:
+                            folded.write(f"{stack} {count}\n")
+                    f.write(f"\nMuestreo: {self._sampler.samples} muestras en {base}.folded\n")
+            logger.info(f"Reporte de perfilado escrito en {base}.txt")
+            return base + '.txt'
+        except OSError as e:
+            logger.error(f"No se pudo escribir el reporte de perfilado: {str(e)}")
+            return None
+
+
+# Instancia única compartida por todos los módulos del monitor
+profiler = Profiler()
@@ -0,0 +1,180 @@
+"""
+Predicción de autonomía durante una descarga (UPS en batería)
+
+Mientras status es '5' (On Battery) cada sondeo alimenta una regresión lineal
+por mínimos cuadrados con olvido exponencial, actualizada en O(1) sin releer
+el histórico:
+
+    capacidad (%) = a + b · energía
+
+donde energía = ∫ carga/100 dt (segundos equivalentes a plena carga). Así la
+pendiente b es el consumo de batería por unidad de carga y la estimación se
+ajusta sola cuando la carga sube o baja:
+
+    segundos restantes = (capacidad ajustada - objetivo) / (-b · carga actual / 100)
+
+Se estima el tiempo hasta agotar la batería (0 %) y hasta el umbral de apagado
+(shutdown_capacity), y se avisa una vez por descarga al cruzar cada marca de
+alert_minutes ("~6 min restantes a la carga actual").
+"""
+import logging
+import time
+from ups_state import UPSState
+
+logger = logging.getLogger(__name__)
+
+ON_BATTERY = '5'
+
+
+class Estimate:
+    """Resultado de la predicción para un sondeo"""
+
+    __slots__ = ('capacity', 'load', 'depletion_seconds', 'shutdown_seconds',
+                 'reported_runtime', 'alert_minutes')
+
+    def __init__(self, capacity, load, depletion_seconds, shutdown_seconds,
+                 reported_runtime, alert_minutes=None):
+        self.capacity = capacity
+        self.load = load
+        self.depletion_seconds = depletion_seconds
+        self.shutdown_seconds = shutdown_seconds
+        self.reported_runtime = reported_runtime
+        # Marca de alert_minutes cruzada en este sondeo (None si ninguna)
+        self.alert_minutes = alert_minutes
+
+
+class _Discharge:
+    """Sumas ponderadas de la regresión de una descarga en curso"""
+
+    __slots__ = ('last_time', 'energy', 'load', 'sw', 'sx', 'sy', 'sxx', 'sxy',
+                 'samples', 'alerted')
+
+    def __init__(self, now, load):
+        self.last_time = now
+        self.energy = 0.0
+        self.load = load
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.samples = 0
+        self.alerted = set()
+
+    def add(self, x, y, forgetting):
+        self.sw = forgetting * self.sw + 1.0
+        self.sx = forgetting * self.sx + x
+        self.sy = forgetting * self.sy + y
+        self.sxx = forgetting * self.sxx + x * x
+        self.sxy = forgetting * self.sxy + x * y
+        self.samples += 1
+
+    def fit(self):
+        """(a, b) de capacidad = a + b · energía, o None si no se puede ajustar"""
+        denominator = self.sw * self.sxx - self.sx * self.sx
+        if denominator <= 1e-12:
+            return None
+        slope = (self.sw * self.sxy - self.sx * self.sy) / denominator
+        return (self.sy - slope * self.sx) / self.sw, slope
+
+
+class RuntimePredictor:
+    """Estimación de autonomía por dispositivo mientras está en batería"""
+
+    def __init__(self, shutdown_capacity=10.0, alert_minutes=(15, 10, 5),
+                 forgetting=0.95, min_samples=3):
+        """
+        Args:
+            shutdown_capacity: % de batería al que los equipos se apagan
+            alert_minutes: Marcas (minutos hasta el apagado) que generan aviso
+            forgetting: Factor de olvido por muestra (0.95 ≈ últimas 20 muestras)
+            min_samples: Muestras en batería necesarias antes de estimar
+        """
+        self.shutdown_capacity = shutdown_capacity
+        self.alert_minutes = sorted(alert_minutes, reverse=True)
+        self.forgetting = forgetting
+        self.min_samples = max(2, min_samples)
+        self._discharges = {}
+
+    @staticmethod
+    def _load(data):
+        """Carga de salida en % (promedio de fases si hay tabla); 100 si no se conoce"""
+        values = [UPSState._parse_numeric(value) for key, value in data.items()
+                  if UPSState.PHASE_SUFFIX.sub('', key) == 'output_load']
+        values = [value for value in values if value is not None and value > 0]
+        return sum(values) / len(values) if values else 100.0
+
+    def observe(self, device, data, now=None):
+        """
+        Agrega un sondeo a la descarga del dispositivo.
+
+        Args:
+            device: Nombre del dispositivo
+            data: Valores del sondeo
+            now: Instante monotónico (por defecto time.monotonic())
+
+        Returns:
+            Estimate, o None si la UPS no está en batería o aún no hay
+            suficientes muestras con la capacidad bajando
+        """
+        if data.get('status') != ON_BATTERY:
+            if self._discharges.pop(device, None) is not None:
+                logger.info(f"[{device}] Fin de la descarga, predicción de autonomía reiniciada")
+            return None
+
+        capacity = UPSState._parse_numeric(data.get('battery_capacity'))
+        if capacity is None:
+            return None
+        now = time.monotonic() if now is None else now
+        load = self._load(data)
+
+        discharge = self._discharges.get(device)
+        if discharge is None:
+            discharge = self._discharges[device] = _Discharge(now, load)
+            logger.info(f"[{device}] Descarga iniciada: capacidad {capacity:.0f}%, carga {load:.0f}%")
+        else:
+            # Energía entregada desde el sondeo anterior (carga media del tramo)
+            discharge.energy += (now - discharge.last_time) * (discharge.load + load) / 200
+            discharge.last_time = now
+            discharge.load = load
+        discharge.add(discharge.energy, capacity, self.forgetting)
+
+        fit = discharge.fit() if discharge.samples >= self.min_samples else None
+        if fit is None or fit[1] >= 0:
+            return None
+        intercept, slope = fit
+        fitted = intercept + slope * discharge.energy
+        rate = -slope * load / 100          # % de batería por segundo a la carga actual
+        depletion = max(0.0, fitted / rate)
+        shutdown = max(0.0, (fitted - self.shutdown_capacity) / rate)
+
+        alert = None
+        for minutes in self.alert_minutes:
+            if shutdown <= minutes * 60 and minutes not in discharge.alerted:
+                # Se marcan también las marcas mayores: un solo aviso por sondeo
+                discharge.alerted.update(mark for mark in self.alert_minutes if mark >= minutes)
+                alert = minutes
+        return Estimate(
+            capacity=fitted,
+            load=load,
+            depletion_seconds=depletion,
+            shutdown_seconds=shutdown,
+            reported_runtime=UPSState._parse_numeric(data.get('battery_runtime')),
+            alert_minutes=alert,
+        )
+
+    def format_alert(self, estimate):
+        """Mensaje de aviso proactivo de autonomía"""
+        message = (
+            f"🪫 *Autonomía estimada:* ~{self._minutes(estimate.shutdown_seconds)} "
+            f"hasta el apagado ({self.shutdown_capacity:.0f}%) a la carga actual "
+            f"({estimate.load:.0f}%)\n"
+            f"   • Batería agotada en ~{self._minutes(estimate.depletion_seconds)}\n"
+            f"   • Capacidad ajustada: {estimate.capacity:.0f}%"
+        )
+        if estimate.reported_runtime is not None:
+            message += f"\n   • La UPS informa: {self._minutes(estimate.reported_runtime)}"
+        return message
+
+    @staticmethod
+    def _minutes(seconds):
+        minutes = int(round(seconds / 60))
+        if minutes >= 60:
+            return f"{minutes // 60}h {minutes % 60}min"
+        return f"{minutes} min"
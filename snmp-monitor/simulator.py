@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Simulador local de agentes SNMPv3 (Eaton 93E) para pruebas y benchmarks
+
+Levanta uno o varios agentes SNMPv3 en puertos consecutivos que responden los
+OIDs de SNMPConfig.OIDS con las credenciales SNMP_* del entorno, por lo que el
+monitor se puede apuntar al simulador sin cambiar nada más.
+
+Escenarios (--scenario):
+    normal         UPS Online con ruido leve en las mediciones
+    power_fail     Online durante --after segundos y luego en batería hasta agotarse
+    battery_drain  En batería desde el inicio con descarga rápida
+    flapping       Alterna Online / En batería cada --period segundos
+
+También responde las tablas UPS-MIB (entrada, salida y bypass con --phases
+fases, y la tabla de alarmas según el escenario) para probar el recorrido con
+GETBULK. Además se puede inyectar pérdida de paquetes (--loss) y latencia
+(--latency, --jitter) en cada agente. Con --trap-target cada agente envía
+informs UPS-MIB (upsTrapOnBattery al pasar a batería, upsTrapAlarmEntryRemoved
+de onBattery al volver la red) para probar el receptor de traps del monitor.
+
+Ejemplos:
+    python simulator.py --port 16161
+    python simulator.py --devices 10 --scenario flapping --period 5 --loss 0.05
+    python simulator.py --devices 100 --write-devices /tmp/devices.json
+    python simulator.py --scenario power_fail --trap-target 127.0.0.1:10162
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import random
+import sys
+import time
+from pysnmp.entity import engine, config
+from pysnmp.entity.rfc3413 import cmdrsp, context
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.smi import instrum
+from pysnmp.proto import rfc1902, rfc1905
+from pysnmp.proto.api import v2c
+from pysnmp.hlapi.v3arch import asyncio as hlapi
+from config import SNMPConfig
+from snmp_client import SNMPClient
+
+logger = logging.getLogger(__name__)
+
+# USM (RFC 3414): las claves de autenticación y privacidad tienen al menos 8 caracteres
+MIN_PASSPHRASE = 8
+
+SCENARIOS = ('normal', 'power_fail', 'battery_drain', 'flapping')
+
+# Valores de una Eaton 93E en operación normal (frecuencias en 0.1 Hz)
+BASELINE = {
+    'status':           3,
+    'battery_status':   2,
+    'battery_capacity': 100,
+    'battery_runtime':  7747,
+    'input_voltage':    230,
+    'input_frequency':  500,
+    'output_voltage':   230,
+    'output_frequency': 500,
+    'output_load':      35,
+    'output_current':   40,
+    'output_power':     9000,
+    'temperature':      19,
+    'bypass_voltage':   230,
+    'alarms':           0,
+}
+
+# Métricas de estado (enteros con signo); el resto son Gauge32
+STATUS_KEYS = {'status', 'battery_status', 'alarms'}
+
+# Contadores de filas de las tablas UPS-MIB (upsInputNumLines, upsOutputNumLines...)
+NUM_LINES_OIDS = {
+    'input':  '1.3.6.1.2.1.33.1.3.2.0',
+    'output': '1.3.6.1.2.1.33.1.4.3.0',
+    'bypass': '1.3.6.1.2.1.33.1.5.2.0',
+}
+ALARMS_PRESENT_OID = '1.3.6.1.2.1.33.1.6.1.0'
+
+
+class SimulatedUPS:
+    """Estado de una UPS simulada según su escenario (calculado al leer)"""
+
+    def __init__(self, name, scenario='normal', after=10.0, period=5.0, drain_rate=0.5,
+                 phases=3, seed=None):
+        """
+        Args:
+            name: Nombre del dispositivo
+            scenario: Uno de SCENARIOS
+            after: Segundos antes del corte en power_fail
+            period: Segundos de cada fase en flapping
+            drain_rate: % de carga de batería que se pierde por segundo en batería
+            phases: Filas de las tablas de entrada, salida y bypass
+        """
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Escenario desconocido: {scenario}")
+        self.name = name
+        self.scenario = scenario
+        self.after = after
+        self.period = period
+        self.drain_rate = drain_rate
+        self.phases = phases
+        self.started = time.monotonic()
+        self.random = random.Random(seed)
+
+    def _on_battery_seconds(self, elapsed):
+        """Segundos acumulados en batería según el escenario (0 si está en red)"""
+        if self.scenario == 'power_fail':
+            return max(0.0, elapsed - self.after)
+        if self.scenario == 'battery_drain':
+            return elapsed * 4
+        if self.scenario == 'flapping':
+            phase = int(elapsed // self.period)
+            return self.period if phase % 2 else 0.0
+        return 0.0
+
+    def values(self):
+        """Valores actuales por nombre de métrica"""
+        elapsed = time.monotonic() - self.started
+        noise = self.random.uniform
+        data = dict(BASELINE)
+        data['input_voltage'] += round(noise(-1, 1))
+        data['output_load'] += round(noise(-1, 1))
+        data['output_power'] += round(noise(-100, 100))
+
+        on_battery = self._on_battery_seconds(elapsed)
+        if on_battery:
+            capacity = max(0, round(100 - on_battery * self.drain_rate))
+            data['status'] = 5
+            data['input_voltage'] = 0
+            data['input_frequency'] = 0
+            data['bypass_voltage'] = 0
+            data['battery_capacity'] = capacity
+            data['battery_runtime'] = int(BASELINE['battery_runtime'] * capacity / 100)
+            data['alarms'] = 1
+            if capacity == 0:
+                data['battery_status'] = 4
+            elif capacity < 25:
+                data['battery_status'] = 3
+        return data
+
+    def table_cells(self, data):
+        """
+        Celdas de las tablas UPS-MIB derivadas de values().
+
+        La fila 1 coincide con los valores escalares (los OIDs por defecto de
+        SNMPConfig.OIDS apuntan a esas celdas); las demás fases varían levemente.
+
+        Returns:
+            Diccionario OID (tupla) -> valor SNMP
+        """
+        def cell(table, column, row):
+            return _oid(SNMPConfig.TABLES[table]['oid']) + (column, row)
+
+        cells = {}
+        for table in NUM_LINES_OIDS:
+            cells[_oid(NUM_LINES_OIDS[table])] = rfc1902.Integer(self.phases)
+        for row in range(1, self.phases + 1):
+            offset = row - 1
+            shift = offset if data['input_voltage'] else 0
+            cells[cell('input', 2, row)] = rfc1902.Integer(data['input_frequency'])
+            cells[cell('input', 3, row)] = rfc1902.Integer(data['input_voltage'] + shift)
+            cells[cell('input', 4, row)] = rfc1902.Integer(0 if not data['input_voltage'] else 400 + 10 * offset)
+            cells[cell('input', 5, row)] = rfc1902.Integer(0 if not data['input_voltage'] else 3100 + 50 * offset)
+            cells[cell('output', 2, row)] = rfc1902.Integer(data['output_voltage'] + offset)
+            cells[cell('output', 3, row)] = rfc1902.Integer(data['output_current'] * 10 + 5 * offset)
+            cells[cell('output', 4, row)] = rfc1902.Integer(data['output_power'] // self.phases + 20 * offset)
+            cells[cell('output', 5, row)] = rfc1902.Integer(data['output_load'] + offset)
+            bypass = data['bypass_voltage']
+            cells[cell('bypass', 2, row)] = rfc1902.Integer(bypass + shift)
+            cells[cell('bypass', 3, row)] = rfc1902.Integer(0)
+            cells[cell('bypass', 4, row)] = rfc1902.Integer(0)
+
+        # Alarmas activas: upsAlarmDescr apunta a upsWellKnownAlarms
+        active = []
+        if data['status'] == 5:
+            active += [2, 6]                # onBattery, inputBad
+        if data['battery_status'] in (3, 4):
+            active.append(data['battery_status'])   # lowBattery (3), depletedBattery (4)
+        cells[_oid(ALARMS_PRESENT_OID)] = rfc1902.Gauge32(len(active))
+        for row, alarm in enumerate(active, start=1):
+            cells[cell('alarm', 2, row)] = rfc1902.ObjectName(f'1.3.6.1.2.1.33.1.6.3.{alarm}')
+            cells[cell('alarm', 3, row)] = rfc1902.TimeTicks(0)
+        return cells
+
+
+def _oid(oid):
+    return tuple(int(part) for part in oid.split('.'))
+
+
+class _Controller(instrum.AbstractMibInstrumController):
+    """Instrumentación MIB mínima: GET y GETNEXT/GETBULK sobre los OIDs configurados y las tablas"""
+
+    def __init__(self, ups, oids):
+        self.ups = ups
+        self.by_oid = {_oid(oid): name for name, oid in oids.items()}
+
+    def _value(self, values, name):
+        value = values.get(name, 0)
+        if name in STATUS_KEYS:
+            return rfc1902.Integer(value)
+        return rfc1902.Gauge32(max(0, value))
+
+    def _snapshot(self):
+        """Vista MIB del momento: OID (tupla) -> valor, y sus OIDs ordenados"""
+        values = self.ups.values()
+        mib = {oid: self._value(values, name) for oid, name in self.by_oid.items()}
+        # Las celdas de tabla reemplazan a los escalares que apuntan a ellas (mismo valor en fila 1)
+        mib.update(self.ups.table_cells(values))
+        return mib, sorted(mib)
+
+    def read_variables(self, *var_binds, **context):
+        mib, _ = self._snapshot()
+        return [(oid, mib.get(tuple(oid), rfc1905.noSuchInstance)) for oid, _ in var_binds]
+
+    def read_next_variables(self, *var_binds, **context):
+        mib, ordered = self._snapshot()
+        result = []
+        for oid, _ in var_binds:
+            index = bisect.bisect_right(ordered, tuple(oid))
+            if index >= len(ordered):
+                result.append((oid, rfc1905.endOfMibView))
+                continue
+            next_oid = ordered[index]
+            result.append((rfc1902.ObjectName(next_oid), mib[next_oid]))
+        return result
+
+
+class _ImpairedTransport(udp.UdpAsyncioTransport):
+    """Transporte UDP que descarta o demora las peticiones recibidas"""
+
+    def __init__(self, loss=0.0, latency=0.0, jitter=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+
+    def datagram_received(self, datagram, transportAddress):
+        if self.loss and random.random() < self.loss:
+            return
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            self.loop.call_later(delay, self._callback_function, self, transportAddress, datagram)
+        else:
+            super().datagram_received(datagram, transportAddress)
+
+
+def start_agent(ups, host, port, oids=None, loss=0.0, latency=0.0, jitter=0.0):
+    """
+    Inicia un agente SNMPv3 para una UPS simulada (llamar dentro del event loop).
+
+    Returns:
+        SnmpEngine del agente
+    """
+    snmp_engine = engine.SnmpEngine()
+    transport = _ImpairedTransport(loss=loss, latency=latency, jitter=jitter,
+                                   loop=asyncio.get_running_loop())
+    config.add_transport(snmp_engine, udp.DOMAIN_NAME, transport.open_server_mode((host, port)))
+
+    auth_protocol = SNMPClient._get_auth_protocol(SNMPConfig.AUTH_PROTOCOL)
+    if SNMPConfig.SECURITY_LEVEL == 'authNoPriv':
+        config.add_v3_user(snmp_engine, SNMPConfig.USER, auth_protocol, SNMPConfig.AUTH_PASSWORD)
+    else:
+        config.add_v3_user(
+            snmp_engine, SNMPConfig.USER,
+            auth_protocol, SNMPConfig.AUTH_PASSWORD,
+            SNMPClient._get_priv_protocol(SNMPConfig.PRIV_PROTOCOL), SNMPConfig.PRIV_PASSWORD,
+        )
+    config.add_vacm_user(snmp_engine, 3, SNMPConfig.USER, SNMPConfig.SECURITY_LEVEL, (1, 3, 6), (1, 3, 6))
+
+    snmp_context = context.SnmpContext(snmp_engine)
+    snmp_context.unregister_context_name(v2c.OctetString(''))
+    oids = {name: oid for name, oid in (oids or SNMPConfig.OIDS).items() if oid}
+    snmp_context.register_context_name(v2c.OctetString(''), _Controller(ups, oids))
+    cmdrsp.GetCommandResponder(snmp_engine, snmp_context)
+    cmdrsp.NextCommandResponder(snmp_engine, snmp_context)
+    cmdrsp.BulkCommandResponder(snmp_engine, snmp_context)
+    snmp_engine.transport_dispatcher.job_started(1)
+    return snmp_engine
+
+
+async def send_traps(ups, target, poll=0.2):
+    """
+    Envía informs UPS-MIB en cada transición red/batería de la UPS simulada.
+
+    Args:
+        target: (host, puerto) del receptor de traps
+    """
+    snmp_engine = hlapi.SnmpEngine()
+    auth_protocol = SNMPClient._get_auth_protocol(SNMPConfig.AUTH_PROTOCOL)
+    if SNMPConfig.SECURITY_LEVEL == 'authNoPriv':
+        auth = hlapi.UsmUserData(SNMPConfig.USER, SNMPConfig.AUTH_PASSWORD, authProtocol=auth_protocol)
+    else:
+        auth = hlapi.UsmUserData(
+            SNMPConfig.USER, SNMPConfig.AUTH_PASSWORD, SNMPConfig.PRIV_PASSWORD,
+            authProtocol=auth_protocol,
+            privProtocol=SNMPClient._get_priv_protocol(SNMPConfig.PRIV_PROTOCOL),
+        )
+    transport = await hlapi.UdpTransportTarget.create(target, timeout=1, retries=2)
+    on_battery = False
+    try:
+        while True:
+            data = ups.values()
+            if (data['status'] == 5) != on_battery:
+                on_battery = not on_battery
+                if on_battery:
+                    notification = hlapi.NotificationType(hlapi.ObjectIdentity('1.3.6.1.2.1.33.2.1')).add_varbinds(
+                        ('1.3.6.1.2.1.33.1.2.3.0', rfc1902.Integer(data['battery_runtime'] // 60)),
+                    )
+                else:
+                    notification = hlapi.NotificationType(hlapi.ObjectIdentity('1.3.6.1.2.1.33.2.4')).add_varbinds(
+                        ('1.3.6.1.2.1.33.1.6.2.1.2.1', rfc1902.ObjectIdentifier('1.3.6.1.2.1.33.1.6.3.2')),
+                    )
+                error, _, _, _ = await hlapi.send_notification(
+                    snmp_engine, auth, transport, hlapi.ContextData(), 'inform', notification,
+                )
+                if error:
+                    logger.warning(f"[{ups.name}] Inform no confirmado: {error}")
+                else:
+                    logger.info(f"[{ups.name}] Inform enviado: {'en batería' if on_battery else 'red restablecida'}")
+            await asyncio.sleep(poll)
+    finally:
+        snmp_engine.close_dispatcher()
+
+
+def write_devices_file(path, count, host, port):
+    """Escribe un registro de dispositivos (UPS_DEVICES_FILE) apuntando al simulador"""
+    registry = {
+        'defaults': {
+            'user': SNMPConfig.USER,
+            'auth_protocol': SNMPConfig.AUTH_PROTOCOL,
+            'auth_password': SNMPConfig.AUTH_PASSWORD,
+            'priv_protocol': SNMPConfig.PRIV_PROTOCOL,
+            'priv_password': SNMPConfig.PRIV_PASSWORD,
+        },
+        'devices': [
+            {'name': f'sim{index + 1}', 'host': host, 'port': port + index}
+            for index in range(count)
+        ],
+    }
+    with open(path, 'w') as f:
+        json.dump(registry, f, indent=2)
+
+
+async def serve(args):
+    agents = []
+    senders = []
+    for index in range(args.devices):
+        ups = SimulatedUPS(
+            f'sim{index + 1}', args.scenario, after=args.after, period=args.period,
+            drain_rate=args.drain_rate, phases=args.phases, seed=index,
+        )
+        agents.append(start_agent(
+            ups, args.host, args.port + index,
+            loss=args.loss, latency=args.latency, jitter=args.jitter,
+        ))
+        if args.trap_target:
+            host, _, port = args.trap_target.rpartition(':')
+            senders.append(asyncio.create_task(send_traps(ups, (host, int(port)))))
+    logger.info(
+        f"{len(agents)} agente(s) SNMPv3 en {args.host}:{args.port}-{args.port + len(agents) - 1} "
+        f"(escenario {args.scenario}, pérdida {args.loss:.0%}, latencia {args.latency * 1000:.0f}ms)"
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for sender in senders:
+            sender.cancel()
+        for agent in agents:
+            agent.transport_dispatcher.close_dispatcher()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Simulador de agentes SNMPv3 Eaton 93E')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=16161, help='Puerto del primer agente')
+    parser.add_argument('--devices', type=int, default=1, help='Cantidad de agentes')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='normal')
+    parser.add_argument('--after', type=float, default=10.0, help='power_fail: segundos antes del corte')
+    parser.add_argument('--period', type=float, default=5.0, help='flapping: segundos por fase')
+    parser.add_argument('--drain-rate', type=float, default=0.5, help='%% de batería por segundo en batería')
+    parser.add_argument('--phases', type=int, default=3, help='Fases de las tablas de entrada/salida/bypass')
+    parser.add_argument('--loss', type=float, default=0.0, help='Fracción de peticiones descartadas')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latencia agregada (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Latencia aleatoria adicional (s)')
+    parser.add_argument('--trap-target', metavar='HOST:PUERTO', help='Envía informs UPS-MIB a este receptor')
+    parser.add_argument('--write-devices', metavar='PATH', help='Escribe un devices.json para el monitor')
+    return parser.parse_args(argv)
+
+
+def credentials_error():
+    """Motivo por el que las credenciales SNMP_* no sirven para levantar los agentes, o None"""
+    required = {'SNMP_AUTH_PASSWORD': SNMPConfig.AUTH_PASSWORD}
+    if SNMPConfig.SECURITY_LEVEL != 'authNoPriv':
+        required['SNMP_PRIV_PASSWORD'] = SNMPConfig.PRIV_PASSWORD
+    short = [name for name, value in required.items() if len(value or '') < MIN_PASSPHRASE]
+    if not short:
+        return None
+    return (f"{' y '.join(short)} sin definir o con menos de {MIN_PASSPHRASE} caracteres. "
+            f"Los agentes simulados usan las mismas credenciales SNMP_* que el monitor, "
+            f"ej: SNMP_AUTH_PASSWORD=authpass123 SNMP_PRIV_PASSWORD=privpass123 make simulate")
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    error = credentials_error()
+    if error:
+        logger.error(error)
+        sys.exit(2)
+    if args.write_devices:
+        write_devices_file(args.write_devices, args.devices, args.host, args.port)
+        logger.info(f"Registro de dispositivos escrito en {args.write_devices}")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,7 @@ from pysnmp.hlapi.v3arch.asyncio import (
     ObjectType,
     ObjectIdentity,
     get_cmd,
+    bulk_cmd,
     usmHMACMD5AuthProtocol,
     usmHMACSHAAuthProtocol,
     usmHMAC128SHA224AuthProtocol,
@@ -24,119 +25,472 @@ from pysnmp.hlapi.v3arch.asyncio import (
     usmAesCfb256Protocol,
     usm3DESEDEPrivProtocol,
 )
+from pysnmp.proto.rfc1902 import ObjectName
+from pysnmp.proto.rfc1905 import NoSuchObject, NoSuchInstance, EndOfMibView
 from config import SNMPConfig
+from devices import Device
+from profiling import profiler
 
 logger = logging.getLogger(__name__)
 
+# Protocolos USM por nombre de configuración (compartidos con el receptor de traps y el simulador)
+AUTH_PROTOCOLS = {
+    'MD5':    usmHMACMD5AuthProtocol,
+    'SHA':    usmHMACSHAAuthProtocol,
+    'SHA224': usmHMAC128SHA224AuthProtocol,
+    'SHA256': usmHMAC192SHA256AuthProtocol,
+    'SHA384': usmHMAC256SHA384AuthProtocol,
+    'SHA512': usmHMAC384SHA512AuthProtocol,
+}
+PRIV_PROTOCOLS = {
+    'DES':    usmDESPrivProtocol,
+    'AES':    usmAesCfb128Protocol,
+    'AES128': usmAesCfb128Protocol,
+    'AES192': usmAesCfb192Protocol,
+    'AES256': usmAesCfb256Protocol,
+    '3DES':   usm3DESEDEPrivProtocol,
+}
+
+
+def _oid_tuple(oid):
+    return tuple(int(part) for part in oid.strip('.').split('.'))
+
 
 class SNMPClient:
     """Cliente para realizar consultas SNMP v3"""
 
-    def __init__(self):
-        self.host = SNMPConfig.HOST
-        self.port = SNMPConfig.PORT
-        self.user = SNMPConfig.USER
-        self.auth_protocol = self._get_auth_protocol()
-        self.auth_password = SNMPConfig.AUTH_PASSWORD
-        self.priv_protocol = self._get_priv_protocol()
-        self.priv_password = SNMPConfig.PRIV_PASSWORD
-
-    def _get_auth_protocol(self):
-        protocols = {
-            'MD5':    usmHMACMD5AuthProtocol,
-            'SHA':    usmHMACSHAAuthProtocol,
-            'SHA224': usmHMAC128SHA224AuthProtocol,
-            'SHA256': usmHMAC192SHA256AuthProtocol,
-            'SHA384': usmHMAC256SHA384AuthProtocol,
-            'SHA512': usmHMAC384SHA512AuthProtocol,
-        }
-        name = SNMPConfig.AUTH_PROTOCOL.upper()
-        if name not in protocols:
+    # Tope de GETBULK por sondeo al recorrer tablas (evita bucles con agentes defectuosos)
+    MAX_WALK_PDUS = 8
+
+    def __init__(self, device=None, snmp_engine=None):
+        """
+        Args:
+            device: Dispositivo a consultar (por defecto el definido por SNMP_*)
+            snmp_engine: SnmpEngine compartido con otros clientes de iguales
+                credenciales; si se indica, el cliente no lo cierra
+        """
+        self.device = device or Device.from_config()
+        self.host = self.device.host
+        self.port = self.device.port
+        self.user = self.device.user
+        self.auth_protocol = self._get_auth_protocol(self.device.auth_protocol)
+        self.auth_password = self.device.auth_password
+        self.priv_protocol = self._get_priv_protocol(self.device.priv_protocol)
+        self.priv_password = self.device.priv_password
+
+        # Recursos del modo persistente (se crean bajo demanda)
+        self.persistent = SNMPConfig.PERSISTENT_ENGINE or snmp_engine is not None
+        self._loop = None
+        self._engine = snmp_engine
+        self._shared_engine = snmp_engine is not None
+        self._auth_data = None
+        self._transport = None
+        self._table_plan = None
+
+    @staticmethod
+    def _get_auth_protocol(name):
+        name = name.upper()
+        if name not in AUTH_PROTOCOLS:
             logger.warning(f"Protocolo de auth '{name}' no reconocido, usando MD5")
-            return usmHMACMD5AuthProtocol
-        return protocols[name]
-
-    def _get_priv_protocol(self):
-        protocols = {
-            'DES':    usmDESPrivProtocol,
-            'AES':    usmAesCfb128Protocol,
-            'AES128': usmAesCfb128Protocol,
-            'AES192': usmAesCfb192Protocol,
-            'AES256': usmAesCfb256Protocol,
-            '3DES':   usm3DESEDEPrivProtocol,
-        }
-        name = SNMPConfig.PRIV_PROTOCOL.upper()
-        if name not in protocols:
+            name = 'MD5'
+        return AUTH_PROTOCOLS[name]
+
+    @staticmethod
+    def _get_priv_protocol(name):
+        name = name.upper()
+        if name not in PRIV_PROTOCOLS:
             logger.warning(f"Protocolo de privacidad '{name}' no reconocido, usando DES")
-            return usmDESPrivProtocol
-        return protocols[name]
+            name = 'DES'
+        return PRIV_PROTOCOLS[name]
 
-    async def _get_value_async(self, snmp_engine, oid):
-        """Obtiene el valor de un OID de forma asíncrona"""
-        try:
+    def _build_auth_data(self):
+        """Construye las credenciales USM del usuario SNMP v3"""
+        if self.persistent and self._auth_data is not None:
+            return self._auth_data
+        auth_data = UsmUserData(
+            self.user,
+            self.auth_password,
+            self.priv_password,
+            authProtocol=self.auth_protocol,
+            privProtocol=self.priv_protocol,
+        )
+        if self.persistent:
+            self._auth_data = auth_data
+        return auth_data
+
+    async def _get_transport(self):
+        """Retorna el transporte UDP hacia la UPS (reutilizado en modo persistente)"""
+        if self.persistent and self._transport is not None:
+            return self._transport
+        with profiler.span('snmp.transport'):
             transport = await UdpTransportTarget.create(
-                (self.host, self.port), timeout=5.0, retries=3
-            )
-            error_indication, error_status, error_index, var_binds = await get_cmd(
-                snmp_engine,
-                UsmUserData(
-                    self.user,
-                    self.auth_password,
-                    self.priv_password,
-                    authProtocol=self.auth_protocol,
-                    privProtocol=self.priv_protocol,
-                ),
-                transport,
-                ContextData(),
-                ObjectType(ObjectIdentity(oid)),
+                (self.host, self.port), timeout=SNMPConfig.TIMEOUT, retries=SNMPConfig.RETRIES
             )
+        if self.persistent:
+            self._transport = transport
+        return transport
+
+    def _get_engine(self):
+        """Retorna el SnmpEngine a usar en la consulta actual"""
+        if not self.persistent:
+            with profiler.span('snmp.engine'):
+                return SnmpEngine()
+        if self._engine is None:
+            with profiler.span('snmp.engine'):
+                self._engine = SnmpEngine()
+        return self._engine
+
+    def _reset_engine(self):
+        """
+        Descarta el engine persistente para forzar un nuevo descubrimiento USM
+        en el próximo sondeo (ej: la tarjeta de red de la UPS se reinició).
+        Un engine compartido no se cierra: solo se descarta el transporte.
+        """
+        self._transport = None
+        if self._shared_engine:
+            return
+        if self._engine is not None:
+            try:
+                self._engine.close_dispatcher()
+            except Exception as e:
+                logger.debug(f"Error al cerrar engine SNMP: {str(e)}")
+        self._engine = None
+
+    @staticmethod
+    def _extract_value(name, oid, var_bind):
+        """
+        Convierte un varbind de respuesta a string.
+        Retorna None si el agente responde noSuchObject/noSuchInstance/endOfMibView.
+        """
+        value = var_bind[1]
+        if isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView)):
+            logger.warning(f"OID no disponible [{name} = {oid}]: {value.prettyPrint()}")
+            return None
+        return value.prettyPrint()
+
+    @staticmethod
+    def _scale(value, factor):
+        if value is not None and factor:
+            try:
+                value = str(round(float(value) * factor, 1))
+            except (ValueError, TypeError):
+                pass
+        return value
+
+    @classmethod
+    def _apply_scale(cls, name, value):
+        """Aplica el factor de escala configurado (ej: 0.1 Hz → Hz)"""
+        return cls._scale(value, SNMPConfig.SCALE_FACTORS.get(name))
+
+    async def _get_value_async(self, snmp_engine, name, oid):
+        """Obtiene el valor de un OID de forma asíncrona"""
+        try:
+            transport = await self._get_transport()
+            with profiler.span('snmp.get'):
+                error_indication, error_status, error_index, var_binds = await get_cmd(
+                    snmp_engine,
+                    self._build_auth_data(),
+                    transport,
+                    ContextData(),
+                    ObjectType(ObjectIdentity(oid)),
+                )
 
             if error_indication:
-                logger.error(f"Error SNMP [{oid}]: {error_indication}")
+                logger.error(f"[{self.device.name}] Error SNMP [{oid}]: {error_indication}")
                 return None
             if error_status:
-                logger.error(f"Error SNMP status [{oid}]: {error_status.prettyPrint()}")
+                logger.error(f"[{self.device.name}] Error SNMP status [{oid}]: {error_status.prettyPrint()}")
                 return None
 
             for var_bind in var_binds:
-                return var_bind[1].prettyPrint()
+                return self._extract_value(name, oid, var_bind)
 
         except Exception as e:
-            logger.error(f"Excepción al obtener OID {oid}: {str(e)}")
+            logger.error(f"[{self.device.name}] Excepción al obtener OID {oid}: {str(e)}")
             return None
 
-    async def _get_all_async(self, oids_dict):
-        """Consulta todos los OIDs compartiendo un único SnmpEngine"""
-        snmp_engine = SnmpEngine()
-        results = {}
+    async def _get_batch_async(self, snmp_engine, batch):
+        """
+        Obtiene varios OIDs en un único GET PDU.
+
+        Args:
+            batch: Lista de tuplas (nombre, oid)
+
+        Returns:
+            Diccionario nombre -> valor (None si el OID no está disponible)
+        """
         try:
-            for name, oid in oids_dict.items():
-                if oid is None:
+            transport = await self._get_transport()
+            with profiler.span('snmp.get_batch'):
+                error_indication, error_status, error_index, var_binds = await get_cmd(
+                    snmp_engine,
+                    self._build_auth_data(),
+                    transport,
+                    ContextData(),
+                    *[ObjectType(ObjectIdentity(oid)) for _, oid in batch],
+                )
+        except Exception as e:
+            logger.error(f"[{self.device.name}] Excepción al obtener lote de {len(batch)} OIDs: {str(e)}")
+            return {name: None for name, _ in batch}
+
+        if error_indication:
+            logger.error(f"[{self.device.name}] Error SNMP [lote de {len(batch)} OIDs]: {error_indication}")
+            return {name: None for name, _ in batch}
+
+        if error_status:
+            # tooBig o un OID rechazado invalida todo el PDU: se divide el lote
+            # hasta aislar el OID problemático
+            if len(batch) > 1:
+                logger.warning(
+                    f"[{self.device.name}] Error SNMP status en lote de {len(batch)} OIDs "
+                    f"({error_status.prettyPrint()}), dividiendo consulta"
+                )
+                middle = len(batch) // 2
+                results = await self._get_batch_async(snmp_engine, batch[:middle])
+                results.update(await self._get_batch_async(snmp_engine, batch[middle:]))
+                return results
+            name, oid = batch[0]
+            logger.error(f"[{self.device.name}] Error SNMP status [{oid}]: {error_status.prettyPrint()}")
+            return {name: None}
+
+        results = {name: None for name, _ in batch}
+        for (name, oid), var_bind in zip(batch, var_binds):
+            results[name] = self._extract_value(name, oid, var_bind)
+        return results
+
+    def _get_table_plan(self):
+        """
+        Columnas de las tablas habilitadas en el dispositivo y los OIDs escalares
+        que caen dentro de ellas (se leen del recorrido en lugar de un GET aparte).
+
+        Returns:
+            (columnas, cubiertos): columnas, prefijo OID -> (tabla, columna, escala);
+            cubiertos, nombre -> OID de la celda
+        """
+        if self._table_plan is None:
+            columns = {}
+            for table in self.device.tables:
+                spec = SNMPConfig.TABLES.get(table)
+                if spec is None:
+                    logger.warning(f"[{self.device.name}] Tabla SNMP '{table}' no definida, se ignora")
                     continue
-                value = await self._get_value_async(snmp_engine, oid)
+                prefix = _oid_tuple(spec['oid'])
+                for number, (column, scale) in spec['columns'].items():
+                    columns[prefix + (number,)] = (table, column, scale)
+            covered = {}
+            for name, oid in self.device.oids.items():
+                if oid and _oid_tuple(oid)[:-1] in columns:
+                    covered[name] = _oid_tuple(oid)
+            self._table_plan = (columns, covered)
+        return self._table_plan
+
+    async def _walk_tables_async(self, snmp_engine, columns):
+        """
+        Recorre columnas de tablas con GETBULK: un varbind por columna y
+        max-repetitions filas por PDU. Solo las columnas que no salieron de su
+        subárbol continúan en el PDU siguiente; si el agente responde tooBig se
+        reduce max-repetitions a la mitad.
+
+        Args:
+            columns: Prefijos OID (tuplas) de las columnas a recorrer
 
-                if value is not None and name in SNMPConfig.SCALE_FACTORS:
-                    try:
-                        scaled = float(value) * SNMPConfig.SCALE_FACTORS[name]
-                        value = str(round(scaled, 1))
-                    except (ValueError, TypeError):
-                        pass
+        Returns:
+            Diccionario OID (tupla) -> valor SNMP, o None si no se obtuvo nada
+        """
+        cursors = {column: column for column in columns}
+        cells = {}
+        repetitions = max(1, SNMPConfig.BULK_MAX_REPETITIONS)
+        for _ in range(self.MAX_WALK_PDUS):
+            pending = list(cursors.items())
+            if not pending:
+                break
+            try:
+                transport = await self._get_transport()
+                with profiler.span('snmp.bulk'):
+                    error_indication, error_status, error_index, var_binds = await bulk_cmd(
+                        snmp_engine,
+                        self._build_auth_data(),
+                        transport,
+                        ContextData(),
+                        0, repetitions,
+                        *[ObjectType(ObjectIdentity(ObjectName(cursor))) for _, cursor in pending],
+                        # Sin resolver cada varbind contra la MIB: solo se comparan OIDs
+                        lookupMib=False,
+                    )
+            except Exception as e:
+                logger.error(f"[{self.device.name}] Excepción en GETBULK de tablas: {str(e)}")
+                return cells or None
+
+            if error_indication:
+                logger.error(f"[{self.device.name}] Error SNMP [GETBULK de tablas]: {error_indication}")
+                return cells or None
+            if error_status:
+                if error_status.prettyPrint() == 'tooBig' and repetitions > 1:
+                    repetitions //= 2
+                    logger.warning(
+                        f"[{self.device.name}] GETBULK demasiado grande, reintentando con "
+                        f"max-repetitions={repetitions}"
+                    )
+                    continue
+                logger.error(f"[{self.device.name}] Error SNMP status [GETBULK de tablas]: "
+                             f"{error_status.prettyPrint()}")
+                return cells or None
+
+            # La respuesta viene por filas: varbind i corresponde a la columna i % ancho
+            width = len(pending)
+            for index, var_bind in enumerate(var_binds):
+                column = pending[index % width][0]
+                cursor = cursors.get(column)
+                if cursor is None:
+                    continue
+                oid, value = tuple(var_bind[0]), var_bind[1]
+                if isinstance(value, EndOfMibView) or oid[:len(column)] != column or oid <= cursor:
+                    del cursors[column]
+                    continue
+                cells[oid] = value
+                cursors[column] = oid
+        else:
+            if cursors:
+                logger.warning(f"[{self.device.name}] Recorrido de tablas truncado tras "
+                               f"{self.MAX_WALK_PDUS} GETBULK")
+        return cells
+
+    @staticmethod
+    def _table_values(cells, columns):
+        """
+        Convierte las celdas recorridas en claves por fase y alarmas activas.
+
+        Fila 1 → <tabla>_<columna>, fila N → <tabla>_<columna>_l<N>;
+        la tabla de alarmas se resume en 'active_alarms' (nombres separados por coma).
+        """
+        values = {}
+        alarms = []
+        for oid, value in cells.items():
+            spec = columns.get(oid[:-1])
+            if spec is None:
+                # Índice de más de un nivel: no es una tabla por fase
+                continue
+            table, column, scale = spec
+            if table == 'alarm':
+                descr = value.prettyPrint()
+                alarms.append(SNMPConfig.WELL_KNOWN_ALARMS.get(descr, descr))
+                continue
+            row = oid[-1]
+            key = f'{table}_{column}' if row == 1 else f'{table}_{column}_l{row}'
+            values[key] = SNMPClient._scale(value.prettyPrint(), scale)
+        if any(table == 'alarm' for table, _, _ in columns.values()):
+            values['active_alarms'] = ', '.join(alarms)
+        return values
+
+    async def _get_all_async(self, oids_dict, walk_tables=False):
+        """Consulta todos los OIDs compartiendo un único SnmpEngine"""
+        with profiler.span('snmp.poll'):
+            return await self._get_all_timed(oids_dict, walk_tables)
 
-                results[name] = value
-                logger.debug(f"{name}: {value}")
+    async def _get_all_timed(self, oids_dict, walk_tables=False):
+        snmp_engine = self._get_engine()
+        items = [(name, oid) for name, oid in oids_dict.items() if oid is not None]
+        columns, covered = self._get_table_plan() if walk_tables else ({}, {})
+        get_items = [(name, oid) for name, oid in items if name not in covered]
+        raw = {}
+        cells = None
+        try:
+            requests = []
+            if columns:
+                requests.append(self._walk_tables_async(snmp_engine, list(columns)))
+            if SNMPConfig.BATCH_GET:
+                size = max(1, SNMPConfig.MAX_OIDS_PER_PDU)
+                batches = [get_items[i:i + size] for i in range(0, len(get_items), size)]
+                requests.extend(self._get_batch_async(snmp_engine, batch) for batch in batches)
+                responses = await asyncio.gather(*requests)
+            else:
+                responses = [await request for request in requests]
+                for name, oid in get_items:
+                    raw[name] = await self._get_value_async(snmp_engine, name, oid)
+            if columns:
+                cells, responses = responses[0], responses[1:]
+            for partial in responses:
+                raw.update(partial)
         finally:
-            snmp_engine.close_dispatcher()
+            if not self.persistent:
+                snmp_engine.close_dispatcher()
+
+        for name, oid in covered.items():
+            value = (cells or {}).get(oid)
+            raw[name] = None if value is None else value.prettyPrint()
+
+        if self.persistent and items and not cells and all(raw.get(name) is None for name, _ in items):
+            self._reset_engine()
+
+        results = {}
+        for name, _ in items:
+            value = self._apply_scale(name, raw.get(name))
+            results[name] = value
+            logger.debug(f"{name}: {value}")
+
+        if cells is not None:
+            # Las claves de OIDS tienen prioridad (ej: output_power Eaton sobre UPS-MIB)
+            for key, value in self._table_values(cells, columns).items():
+                results.setdefault(key, value)
 
         return results
 
+    async def get_all_values_async(self, oids_dict=None):
+        """
+        Interfaz asíncrona para usar desde un event loop externo (sondeo concurrente).
+
+        Args:
+            oids_dict: OIDs a consultar (por defecto los del dispositivo, más
+                sus tablas SNMP recorridas con GETBULK)
+        """
+        if oids_dict is None:
+            return await self._get_all_async(self.device.oids, walk_tables=True)
+        return await self._get_all_async(oids_dict)
+
+    async def test_connection_async(self):
+        """Versión asíncrona de test_connection"""
+        try:
+            status_oid = self.device.oids.get('status') or SNMPConfig.OIDS['status']
+            values = await self._get_all_async({'status': status_oid})
+            return values.get('status') is not None
+        except Exception as e:
+            logger.error(f"Error al probar conexión con {self.device.name}: {str(e)}")
+            return False
+
+    async def aclose(self):
+        """Libera el engine propio desde el event loop externo"""
+        self._reset_engine()
+        self._auth_data = None
+
     def get_all_values(self, oids_dict):
         """Interfaz síncrona que internamente usa asyncio"""
-        return asyncio.run(self._get_all_async(oids_dict))
+        if not self.persistent:
+            return asyncio.run(self._get_all_async(oids_dict))
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self._get_all_async(oids_dict))
+
+    async def _close_async(self):
+        """Cierra el dispatcher dentro del loop que lo creó"""
+        self._reset_engine()
+
+    def close(self):
+        """Libera el engine, el transporte y el event loop del modo persistente"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.run_until_complete(self._close_async())
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+        else:
+            self._reset_engine()
+        self._loop = None
+        self._auth_data = None
+        logger.info("Cliente SNMP cerrado")
 
     def test_connection(self):
         """Prueba la conexión SNMP obteniendo el OID de estado"""
         try:
-            value = self.get_all_values({'status': SNMPConfig.OIDS['status']}).get('status')
+            status_oid = self.device.oids.get('status') or SNMPConfig.OIDS['status']
+            value = self.get_all_values({'status': status_oid}).get('status')
             return value is not None
         except Exception as e:
             logger.error(f"Error al probar conexión: {str(e)}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque de ambos servicios (sin UPS ni Telegram reales)
+
+Lanza cada servicio como un proceso nuevo, igual que al reiniciar el
+contenedor tras un corte, y mide desde el lanzamiento:
+
+    snmp-monitor  primer sondeo (ups_state.json escrito) y primer mensaje encolado
+    telegram-bot  primer getUpdates y entrega del mensaje que esperaba en la cola
+
+El monitor consulta simulator.py; el bot habla con una Bot API mínima local
+(TELEGRAM_API_URL) que registra cuándo llega cada llamada. Cada arranque usa
+un DATA_DIR temporal. Reporta mediana y mínimo de --runs arranques.
+
+Ejemplos:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 10 --json startup.json
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmark import SimulatorProcess
+from shared.message_queue import MessageQueue
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BOT_DIR = os.path.join(ROOT, 'telegram-bot')
+BOT_TOKEN = '123456:benchmark'
+
+
+def _wait_for(conditions, started, timeout):
+    """
+    Args:
+        conditions: Diccionario métrica -> función sin argumentos
+
+    Returns:
+        Diccionario métrica -> segundos desde started hasta que su condición
+        se cumplió (None si no llegó dentro de timeout)
+    """
+    times = dict.fromkeys(conditions)
+    deadline = started + timeout
+    while None in times.values() and time.monotonic() < deadline:
+        now = time.monotonic()
+        for key, condition in conditions.items():
+            if times[key] is None and condition():
+                times[key] = now - started
+        time.sleep(0.002)
+    return times
+
+
+def _stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _base_env(data_dir):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': ROOT,
+        'DATA_DIR': data_dir,
+        'LOG_DIR': data_dir,
+    })
+    return env
+
+
+def run_monitor(args):
+    """Un arranque de snmp-monitor contra el simulador"""
+    with tempfile.TemporaryDirectory(prefix='ups-startup-') as data_dir:
+        env = _base_env(data_dir)
+        env.update({
+            'SNMP_HOST': args.host,
+            'SNMP_PORT': str(args.port),
+            'UPS_DEVICES_FILE': os.path.join(data_dir, 'devices.json'),
+            'METRICS_ENABLED': 'false',
+        })
+        state_file = os.path.join(data_dir, 'ups_state.json')
+        queue_file = os.path.join(data_dir, 'message_queue.log')
+
+        started = time.monotonic()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, 'main.py')],
+            cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            return _wait_for({
+                'first_poll': lambda: os.path.exists(state_file),
+                'first_message': lambda: os.path.exists(queue_file) and os.path.getsize(queue_file) > 0,
+            }, started, args.timeout)
+        finally:
+            _stop(process)
+
+
+class FakeBotAPI(ThreadingHTTPServer):
+    """Bot API mínima: responde lo justo y registra el primer instante de cada método"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _BotAPIHandler)
+        self.first = {}
+
+    def record(self, method):
+        self.first.setdefault(method, time.monotonic())
+
+    def handle_error(self, request, client_address):
+        pass  # el bot se detiene con peticiones de long polling abiertas
+
+
+class _BotAPIHandler(BaseHTTPRequestHandler):
+
+    RESULTS = {
+        'getMe': {'id': 123456, 'is_bot': True, 'first_name': 'UPS', 'username': 'ups_bench_bot'},
+        'deleteWebhook': True,
+        'getUpdates': [],
+        'sendMessage': {'message_id': 1, 'date': 0, 'chat': {'id': 5, 'type': 'private'}},
+    }
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        method = self.path.rsplit('/', 1)[-1]
+        self.server.record(method)
+        if method == 'getUpdates':
+            time.sleep(0.2)  # long polling breve
+        body = json.dumps({'ok': True, 'result': self.RESULTS.get(method, True)}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_bot(args):
+    """Un arranque de telegram-bot con un mensaje esperando en la cola"""
+    api = FakeBotAPI()
+    thread = threading.Thread(target=api.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='ups-startup-') as data_dir:
+            MessageQueue(data_dir).put({
+                'type': 'alert', 'priority': 'critical', 'message': 'benchmark de arranque',
+            })
+            env = _base_env(data_dir)
+            env.update({
+                'PYTHONPATH': os.pathsep.join((ROOT, BOT_DIR)),
+                'TELEGRAM_API_URL': f'http://127.0.0.1:{api.server_address[1]}/bot',
+                'TELEGRAM_BOT_TOKEN': BOT_TOKEN,
+                'TELEGRAM_CHAT_ID': '5',
+            })
+
+            started = time.monotonic()
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(BOT_DIR, 'bot.py')],
+                cwd=BOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_for({
+                    'first_poll': lambda: 'getUpdates' in api.first,
+                    'first_message': lambda: 'sendMessage' in api.first,
+                }, started, args.timeout)
+            finally:
+                _stop(process)
+    finally:
+        api.shutdown()
+        api.server_close()
+
+    # Instantes registrados por el servidor (más precisos que el sondeo de _wait_for)
+    return {
+        key: api.first[method] - started if method in api.first else None
+        for key, method in (('first_poll', 'getUpdates'), ('first_message', 'sendMessage'))
+    }
+
+
+def _summary(runs, key):
+    values = [run[key] for run in runs if run[key] is not None]
+    if not values:
+        return {'median_ms': None, 'min_ms': None, 'failed': len(runs)}
+    return {
+        'median_ms': statistics.median(values) * 1000,
+        'min_ms': min(values) * 1000,
+        'failed': len(runs) - len(values),
+    }
+
+
+def _print_table(results):
+    header = f"{'servicio':14} {'métrica':14} {'mediana ms':>11} {'mín ms':>8} {'fallos':>7}"
+    print(header)
+    print('-' * len(header))
+    for service, metrics in results.items():
+        for key, label in (('first_poll', 'primer sondeo'), ('first_message', 'primer mensaje')):
+            m = metrics[key]
+            median = f"{m['median_ms']:.0f}" if m['median_ms'] is not None else '-'
+            low = f"{m['min_ms']:.0f}" if m['min_ms'] is not None else '-'
+            print(f"{service:14} {label:14} {median:>11} {low:>8} {m['failed']:>7}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de arranque de snmp-monitor y telegram-bot')
+    parser.add_argument('--runs', type=int, default=5, help='Arranques por servicio')
+    parser.add_argument('--services', default='monitor,bot', help='monitor, bot o ambos')
+    parser.add_argument('--timeout', type=float, default=90.0, help='Segundos máximos por arranque')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=16161)
+    parser.add_argument('--json', metavar='PATH', help='Guarda los resultados en JSON')
+    args = parser.parse_args(argv)
+    # Atributos que espera SimulatorProcess
+    args.scenario, args.loss, args.latency, args.jitter = 'normal', 0.0, 0.0, 0.0
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    services = [s.strip() for s in args.services.split(',') if s.strip()]
+    results = {}
+
+    if 'monitor' in services:
+        with SimulatorProcess(1, args):
+            runs = [run_monitor(args) for _ in range(args.runs)]
+        results['snmp-monitor'] = {key: _summary(runs, key) for key in ('first_poll', 'first_message')}
+    if 'bot' in services:
+        runs = [run_bot(args) for _ in range(args.runs)]
+        results['telegram-bot'] = {key: _summary(runs, key) for key in ('first_poll', 'first_message')}
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Receptor de traps/informs SNMPv3 para detectar eventos sin esperar al sondeo
+
+Escucha en TRAP_PORT con las mismas credenciales USM de los dispositivos y
+decodifica las notificaciones de UPS-MIB (upsTraps) y Eaton XUPS-MIB:
+
+    upsTrapOnBattery / xupsOnBattery          → status 5 (On Battery)
+    xupsLowBattery                            → battery_status 3 (Low)
+    upsTrapAlarmEntryAdded / Removed          → alta/baja en active_alarms
+                                                (onBattery, lowBattery y
+                                                depletedBattery también fijan
+                                                status / battery_status)
+
+El monitor aplica el evento al estado (alerta inmediata) y adelanta un sondeo
+que lo confirma. Los informs funcionan sin configuración adicional (el
+receptor es el engine autoritativo); para traps SNMPv3 hace falta el engine-ID
+del agente (trap_engine_id en devices.json o SNMP_TRAP_ENGINE_ID).
+"""
+import logging
+import socket
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.entity import config as engine_config
+from pysnmp.entity.engine import SnmpEngine
+from pysnmp.entity.rfc3413 import ntfrcv
+from pysnmp.proto.rfc1902 import OctetString
+from config import SNMPConfig
+from snmp_client import SNMPClient
+
+logger = logging.getLogger(__name__)
+
+SNMP_TRAP_OID = '1.3.6.1.6.3.1.1.4.1.0'
+
+# UPS-MIB upsTraps (1.3.6.1.2.1.33.2)
+UPS_TRAPS = {
+    '1.3.6.1.2.1.33.2.1': 'onBattery',
+    '1.3.6.1.2.1.33.2.2': 'testCompleted',
+    '1.3.6.1.2.1.33.2.3': 'alarmEntryAdded',
+    '1.3.6.1.2.1.33.2.4': 'alarmEntryRemoved',
+}
+# Columnas de upsAlarmTable que viajan en alarmEntryAdded/Removed
+UPS_ALARM_DESCR = '1.3.6.1.2.1.33.1.6.2.1.2.'
+# upsEstimatedMinutesRemaining (viaja en upsTrapOnBattery)
+UPS_MINUTES_REMAINING = '1.3.6.1.2.1.33.1.2.3.0'
+
+# Eaton XUPS-MIB: xupsTrapBasic, xupsTrapDefined y xupsTrapPortN (bajo
+# 1.3.6.1.4.1.534.1.11) comparten el número específico de cada trap
+XUPS_TRAP_PREFIX = '1.3.6.1.4.1.534.1.11.'
+XUPS_TRAPS = {
+    1: 'controlOff', 2: 'controlOn', 3: 'onBattery', 4: 'lowBattery',
+    5: 'utilityPowerRestored', 6: 'returnFromLowBattery', 7: 'outputOverload',
+    8: 'internalFailure', 9: 'batteryDischarged', 10: 'inverterFailure',
+    11: 'onBypass', 12: 'bypassNotAvailable', 13: 'outputOff', 14: 'inputFailure',
+    15: 'buildingAlarm', 16: 'shutdownImminent', 17: 'onInverter',
+}
+
+# Valores de estado que implica cada evento o alarma
+EVENT_VALUES = {
+    'onBattery':       {'status': '5'},
+    'lowBattery':      {'battery_status': '3'},
+    'depletedBattery': {'battery_status': '4'},
+}
+
+
+class TrapEvent:
+    """Notificación decodificada de un dispositivo"""
+
+    __slots__ = ('name', 'alarm', 'removed', 'values')
+
+    def __init__(self, name, alarm=None, removed=False, values=None):
+        self.name = name            # onBattery, alarmEntryAdded, xups12...
+        self.alarm = alarm          # alarma de upsAlarmTable (alarmEntryAdded/Removed)
+        self.removed = removed      # True si la alarma se dio de baja
+        self.values = values or {}  # valores de estado que implica el evento
+
+    def __repr__(self):
+        alarm = f" {'-' if self.removed else '+'}{self.alarm}" if self.alarm else ''
+        return f"TrapEvent({self.name}{alarm})"
+
+
+def decode(var_binds):
+    """
+    Decodifica los varbinds de una notificación.
+
+    Args:
+        var_binds: Lista de (oid, valor) como strings
+
+    Returns:
+        TrapEvent, o None si no es una notificación de UPS conocida
+    """
+    values = dict(var_binds)
+    trap_oid = values.get(SNMP_TRAP_OID, '')
+
+    if trap_oid in UPS_TRAPS:
+        name = UPS_TRAPS[trap_oid]
+    elif trap_oid.startswith(XUPS_TRAP_PREFIX):
+        number = int(trap_oid.rsplit('.', 1)[-1])
+        name = XUPS_TRAPS.get(number, f'xups{number}')
+    else:
+        return None
+
+    if name in ('alarmEntryAdded', 'alarmEntryRemoved'):
+        descr = next((value for oid, value in var_binds if oid.startswith(UPS_ALARM_DESCR)), None)
+        alarm = SNMPConfig.WELL_KNOWN_ALARMS.get(descr, descr)
+        removed = name == 'alarmEntryRemoved'
+        event_values = {} if removed else dict(EVENT_VALUES.get(alarm, {}))
+        return TrapEvent(name, alarm=alarm, removed=removed, values=event_values)
+
+    event_values = dict(EVENT_VALUES.get(name, {}))
+    minutes = values.get(UPS_MINUTES_REMAINING)
+    if name == 'onBattery' and minutes and minutes.isdigit():
+        event_values['battery_runtime'] = str(int(minutes) * 60)
+    return TrapEvent(name, values=event_values)
+
+
+class TrapReceiver:
+    """Listener SNMPv3 de traps/informs dentro del event loop del monitor"""
+
+    def __init__(self, devices, handler, host='0.0.0.0', port=10162):
+        """
+        Args:
+            devices: Lista de Device (se identifican por la IP de origen)
+            handler: Función handler(device, event) llamada por cada TrapEvent
+            host: Interfaz de escucha
+            port: Puerto UDP (162 requiere privilegios; se publica 162→10162)
+        """
+        self.devices = devices
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.received = 0
+        self._engine = None
+        self._receiver = None
+        self._by_address = {}
+
+    def _register_users(self):
+        """Da de alta un usuario USM por cada juego de credenciales"""
+        registered = {}
+        for device in self.devices:
+            engine_ids = [None]
+            if device.trap_engine_id:
+                engine_ids.append(OctetString(hexValue=device.trap_engine_id))
+            for engine_id in engine_ids:
+                key = (device.user, None if engine_id is None else bytes(engine_id))
+                if key in registered:
+                    if registered[key] != device.credentials_key:
+                        logger.warning(f"[{device.name}] Usuario SNMP '{device.user}' ya registrado "
+                                       f"para traps con otras claves; se usan las del primer dispositivo")
+                    continue
+                registered[key] = device.credentials_key
+                engine_config.add_v3_user(
+                    self._engine, device.user,
+                    SNMPClient._get_auth_protocol(device.auth_protocol), device.auth_password,
+                    SNMPClient._get_priv_protocol(device.priv_protocol), device.priv_password,
+                    securityEngineId=engine_id,
+                )
+
+    def _resolve_devices(self):
+        for device in self.devices:
+            try:
+                address = socket.gethostbyname(device.host)
+            except OSError as e:
+                logger.warning(f"[{device.name}] No se pudo resolver {device.host} para traps: {str(e)}")
+                continue
+            self._by_address.setdefault(address, device)
+
+    def start(self):
+        """Abre el puerto de traps. Retorna False si no se pudo (el monitor sigue solo con sondeo)"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.host, self.port))
+        except OSError as e:
+            logger.warning(f"No se pudo abrir el puerto de traps {self.host}:{self.port}: {str(e)}")
+            return False
+
+        self._resolve_devices()
+        self._engine = SnmpEngine()
+        engine_config.add_transport(
+            self._engine, udp.DOMAIN_NAME, udp.UdpTransport().open_server_mode(sock=sock)
+        )
+        self._register_users()
+        self._receiver = ntfrcv.NotificationReceiver(self._engine, self._on_notification)
+        logger.info(f"Receptor de traps SNMPv3 en {self.host}:{self.port}")
+        return True
+
+    def _on_notification(self, snmp_engine, state_reference, context_engine_id,
+                         context_name, var_binds, cb_ctx):
+        try:
+            _, (address, _) = snmp_engine.message_dispatcher.get_transport_info(state_reference)
+            device = self._by_address.get(address)
+            if device is None:
+                logger.warning(f"Trap de origen desconocido {address} ignorado")
+                return
+            self.received += 1
+            event = decode([(str(oid), value.prettyPrint()) for oid, value in var_binds])
+            if event is None:
+                logger.info(f"[{device.name}] Trap no reconocido: {var_binds[1][1].prettyPrint() if len(var_binds) > 1 else ''}")
+                return
+            logger.warning(f"[{device.name}] Trap recibido: {event!r}")
+            self.handler(device, event)
+        except Exception as e:
+            logger.error(f"Error al procesar trap: {str(e)}")
+
+    def close(self):
+        if self._receiver is not None:
+            self._receiver.close(self._engine)
+            self._receiver = None
+        if self._engine is not None:
+            self._engine.close_dispatcher()
+            self._engine = None
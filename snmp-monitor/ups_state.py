@@ -3,46 +3,30 @@ Módulo para gestionar el estado de la UPS
 """
 import json
 import os
+import re
+import time
+from array import array
 from datetime import datetime
+from alert_state import AlertStateMachine
 from config import MonitorConfig
+from profiling import profiler
+from shared import rendering
+from shared.fsutil import atomic_write, json_checksum, quarantine
 import logging
 
 logger = logging.getLogger(__name__)
 
-class UPSState:
-    """Gestión del estado de la UPS"""
+NAN = float('nan')
 
-    # Mapeo validado contra Eaton 93E real
-    # OID: 1.3.6.1.2.1.33.1.4.1.0
-    # Valor confirmado: 3=Online (UPS en red normal)
-    STATUS_MAP = {
-        '1':  'Unknown',
-        '2':  'Online (Normal)',
-        '3':  'Online',                # Confirmado: valor normal en Eaton 93E
-        '4':  'On Boost',
-        '5':  'On Battery',            # CRÍTICO: UPS en batería
-        '6':  'Off',
-        '7':  'Rebooting',
-        '8':  'On Bypass',
-        '9':  'Hardware Failure',
-        '10': 'Software Failure',
-        '11': 'In Test',
-        '12': 'Emergency Static Bypass',
-        '14': 'Power Saving (ECOnversion)',
-    }
 
-    # OID: 1.3.6.1.2.1.33.1.2.1.0
-    BATTERY_STATUS_MAP = {
-        '1': 'Unknown',
-        '2': 'Battery Normal',
-        '3': 'Battery Low',       # CRÍTICO
-        '4': 'Battery Depleted',  # CRÍTICO
-        '8': 'Charging',
-    }
+class UPSState:
+    """Gestión del estado de la UPS"""
 
-    # Estados que requieren alerta inmediata
-    CRITICAL_STATUSES = {'5', '9', '10', '12'}         # On Battery, failures
-    CRITICAL_BATTERY_STATUSES = {'3', '4'}              # Low, Depleted
+    # Mapeos y estados críticos compartidos con telegram-bot (shared/rendering.py)
+    STATUS_MAP = rendering.STATUS_MAP
+    BATTERY_STATUS_MAP = rendering.BATTERY_STATUS_MAP
+    CRITICAL_STATUSES = rendering.CRITICAL_STATUSES
+    CRITICAL_BATTERY_STATUSES = rendering.CRITICAL_BATTERY_STATUSES
 
     # Umbrales mínimos de cambio para generar alerta (evitar ruido)
     CHANGE_THRESHOLDS = {
@@ -57,35 +41,124 @@ class UPSState:
         'output_frequency': 1.0,    # Hz
         'input_frequency':  1.0,    # Hz
         'temperature':      3.0,    # °C
+        # Métricas por fase de las tablas UPS-MIB (input_current_l2 usa el umbral de input_current)
+        'input_current':    30.0,   # A
+        'input_power':      500.0,  # W
+        'bypass_current':   30.0,   # A
+        'bypass_power':     500.0,  # W
     }
 
+    # Sufijo de fase de las métricas de tabla (input_voltage_l2 → input_voltage)
+    PHASE_SUFFIX = re.compile(r'_l\d+$')
+
     # Claves que nunca deben generar alertas por cambio numérico
     # (solo se alertan si cambian como string exacto, ej: códigos de estado)
     NO_ALERT_KEYS = {'last_update'}
 
-    def __init__(self):
-        self.state_file = MonitorConfig.STATE_FILE
+    # Índice de métricas compartido por todos los dispositivos: cada clave
+    # tiene una columna fija y su umbral (NaN = sin umbral, alerta todo
+    # cambio) queda resuelto una sola vez, fases incluidas
+    _COLUMNS = {}
+    _THRESHOLDS = array('d')
+
+    def __init__(self, device_name=None, flush_interval=None, on_save=None, alerts=None,
+                 primary_name=None):
+        """
+        Args:
+            device_name: Dispositivo al que pertenece el estado. El dispositivo
+                principal (None) conserva ups_state.json; el resto usa
+                ups_state_<nombre>.json
+            flush_interval: Segundos máximos que un estado modificado (sin
+                alertas) espera en memoria antes de escribirse
+                (por defecto MonitorConfig.STATE_FLUSH_SECONDS)
+            on_save: Función llamada tras cada escritura (aviso al bot)
+            alerts: AlertStateMachine del dispositivo (por defecto según MonitorConfig.ALERT_*)
+            primary_name: Nombre del dispositivo principal; se guarda como
+                _device en ups_state.json para que el bot lo identifique
+        """
+        self.device_name = device_name
+        self.primary_name = primary_name
+        if device_name is None:
+            self.state_file = MonitorConfig.STATE_FILE
+        else:
+            self.state_file = os.path.join(MonitorConfig.DATA_DIR, f'ups_state_{device_name}.json')
+        self.flush_interval = MonitorConfig.STATE_FLUSH_SECONDS if flush_interval is None else flush_interval
+        self.on_save = on_save
         self.current_state = self._load_state()
+        self.alerts = alerts or AlertStateMachine(
+            confirm=MonitorConfig.ALERT_CONFIRM_POLLS,
+            window=MonitorConfig.ALERT_CONFIRM_WINDOW,
+            hold=MonitorConfig.ALERT_HOLD_SECONDS,
+            hysteresis=MonitorConfig.ALERT_HYSTERESIS,
+        )
+        # Valores numéricos del estado por columna (NaN si falta o no es numérico),
+        # parseados al ingresar para no reparsear el valor anterior en cada sondeo.
+        # Tras un reinicio la referencia de alertas es el último estado guardado
+        self._numeric = array('d')
+        for key, value in self.current_state.items():
+            if key in self.NO_ALERT_KEYS or value is None:
+                continue
+            column = self._column(key)
+            self._store_numeric(column, value)
+            self.alerts.reset(column, value, self._numeric[column], self._is_critical_value(key, value))
+        self._dirty = False
+        self._last_flush = time.monotonic()
 
     def _load_state(self):
-        """Carga el estado previo desde el archivo"""
+        """
+        Carga el estado previo desde el archivo.
+
+        Si el archivo no se puede leer o su _checksum no coincide se mueve a
+        cuarentena (<archivo>.corrupt-<epoch>) y se arranca sin estado previo.
+        Los archivos sin checksum (versiones anteriores) se aceptan.
+        """
         try:
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r') as f:
-                    return json.load(f)
+            if not os.path.exists(self.state_file):
+                return {}
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            if not isinstance(state, dict):
+                raise ValueError("no es un objeto JSON")
+            checksum = state.pop('_checksum', None)
+            state.pop('_device', None)
+            if checksum is not None and checksum != json_checksum(state):
+                raise ValueError("checksum no coincide")
+            return state
+        except ValueError as e:
+            moved = quarantine(self.state_file)
+            logger.error(f"Estado dañado en {self.state_file} ({str(e)}), movido a {moved}")
             return {}
         except Exception as e:
             logger.error(f"Error al cargar estado: {str(e)}")
             return {}
 
     def _save_state(self):
-        """Guarda el estado actual en el archivo"""
+        """Guarda el estado actual de forma atómica junto con su checksum"""
         try:
             os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-            with open(self.state_file, 'w') as f:
-                json.dump(self.current_state, f, indent=2)
+            state = dict(self.current_state)
+            state['_checksum'] = json_checksum(self.current_state)
+            if self.primary_name:
+                state['_device'] = self.primary_name
+            with profiler.span('state.save'):
+                atomic_write(self.state_file, json.dumps(state, indent=2))
+            self._dirty = False
+            self._last_flush = time.monotonic()
         except Exception as e:
             logger.error(f"Error al guardar estado: {str(e)}")
+            return
+        if self.on_save:
+            self.on_save()
+
+    def flush(self):
+        """Escribe el estado si tiene modificaciones pendientes"""
+        if self._dirty:
+            self._save_state()
+
+    def flush_if_due(self):
+        """Escribe el estado si lleva más de flush_interval modificado en memoria"""
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self._save_state()
 
     @staticmethod
     def _parse_numeric(value):
@@ -96,58 +169,137 @@ class UPSState:
         """
         if value is None:
             return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
         try:
             # Tomar solo la primera parte antes de cualquier espacio
             return float(str(value).split()[0])
         except (ValueError, IndexError):
             return None
 
-    def _exceeds_threshold(self, key, old_val, new_val):
-        """
-        Determina si un cambio numérico supera el umbral mínimo para alertar.
-        - Si la clave no tiene umbral definido: alerta siempre (cambios de estado, alarmas).
-        - Si tiene umbral: parsea ambos valores como número y compara.
-          Si no son numéricos, compara como string.
-        """
-        if key not in self.CHANGE_THRESHOLDS:
-            return True
+    @classmethod
+    def _column(cls, key):
+        """Columna de una clave en el índice compartido (se agrega la primera vez)"""
+        column = cls._COLUMNS.get(key)
+        if column is None:
+            column = cls._COLUMNS[key] = len(cls._THRESHOLDS)
+            threshold = cls.CHANGE_THRESHOLDS.get(cls.PHASE_SUFFIX.sub('', key))
+            cls._THRESHOLDS.append(NAN if threshold is None else threshold)
+        return column
+
+    def _store_numeric(self, column, value):
+        """Guarda el valor numérico de una columna (NaN si no es numérico)"""
+        numeric = self._numeric
+        if column >= len(numeric):
+            numeric.extend([NAN] * (column + 1 - len(numeric)))
+        number = self._parse_numeric(value)
+        numeric[column] = NAN if number is None else number
+
+    def _is_critical_value(self, key, value):
+        """Si el valor de una métrica es un estado crítico (alerta sin confirmación)"""
+        if key == 'status':
+            return value in self.CRITICAL_STATUSES
+        if key == 'battery_status':
+            return value in self.CRITICAL_BATTERY_STATUSES
+        return False
+
+    def _entering_critical(self, new_data):
+        """Si el sondeo lleva status o battery_status a un estado crítico distinto de su referencia"""
+        baselines = self.alerts.baselines
+        for key in ('status', 'battery_status'):
+            value = new_data.get(key)
+            if value is None or not self._is_critical_value(key, value):
+                continue
+            column = self._COLUMNS.get(key)
+            if column is None or column >= len(baselines) or baselines[column] != value:
+                return True
+        return False
 
-        old_num = self._parse_numeric(old_val)
-        new_num = self._parse_numeric(new_val)
+    def update_state(self, new_data, immediate=False):
+        """
+        Actualiza el estado con nuevos datos.
 
-        if old_num is not None and new_num is not None:
-            return abs(new_num - old_num) >= self.CHANGE_THRESHOLDS[key]
+        Cada métrica se compara contra su último valor alertado y pasa por la
+        máquina de estados de alertas (alert_state.py): histéresis,
+        confirmación en N de M sondeos y permanencia mínima entre alertas
+        para las métricas numéricas; los códigos sin umbral (estados,
+        alarmas) alertan al instante.
 
-        # Fallback: comparación string (no debería ocurrir en valores numéricos)
-        logger.warning(f"No se pudo parsear numéricamente '{key}': '{old_val}' → '{new_val}', comparando como string")
-        return old_val != new_val
+        El estado vive en memoria: se escribe en disco enseguida si hubo
+        cambios que alertan (la referencia de la próxima alerta no se pierde
+        ante un corte) o es el primer sondeo; si no, como máximo cada
+        flush_interval, aunque nada haya cambiado: last_update (la "Última
+        actualización" del /status del bot) no queda atrás con la UPS estable.
 
-    def update_state(self, new_data):
-        """
-        Actualiza el estado con nuevos datos.
+        Args:
+            new_data: Valores del sondeo (o los implícitos de un trap)
+            immediate: Alertar todo lo que esté fuera de la banda sin
+                confirmación ni permanencia (valores informados por un trap)
 
         Returns:
-            Diccionario con los cambios que superan el umbral.
+            Diccionario con los cambios que generan alerta ('old' es el último
+            valor alertado de la métrica).
         """
         changes = {}
+        state = self.current_state
+        first = not state
         timestamp = datetime.now().isoformat()
+        columns = self._COLUMNS
+        thresholds = self._THRESHOLDS
+        alerts = self.alerts
+        baselines = alerts.baselines
+        numbers = alerts.numbers
+        pending = alerts.pending
+        numeric = self._numeric
+
+        # Sin confirmaciones pendientes, un valor igual al del sondeo anterior
+        # ya se evaluó y no alertó: se omite sin buscar su columna
+        has_pending = any(pending)
+        # La entrada en un estado crítico arrastra al mismo mensaje al resto
+        # de las métricas fuera de su banda, sin esperar confirmación
+        immediate = immediate or self._entering_critical(new_data)
 
         for key, new_value in new_data.items():
-            if key in self.NO_ALERT_KEYS:
-                continue
-
-            old_value = self.current_state.get(key)
-
-            if old_value is None or old_value == new_value:
-                continue
-
-            if self._exceeds_threshold(key, old_value, new_value):
+            if state.get(key) == new_value:
+                if not has_pending:
+                    continue
+                column = columns.get(key)
+                if column is None or column >= len(pending) or not pending[column]:
+                    continue
+            else:
+                if key in self.NO_ALERT_KEYS:
+                    continue
+                if new_value is None:
+                    continue
+                column = columns.get(key)
+                if column is None:
+                    column = self._column(key)
+                # Solo se parsea el valor nuevo; el anterior ya está en _numeric
+                self._store_numeric(column, new_value)
+                if column < len(baselines) and not pending[column] and (
+                    baselines[column] == new_value or abs(numeric[column] - numbers[column]) < thresholds[column]
+                ):
+                    # Dentro de la banda de su referencia
+                    continue
+
+            old_value = alerts.observe(
+                key, column, new_value, numeric[column], thresholds[column],
+                self._is_critical_value(key, new_value), immediate,
+            )
+            if old_value is not None:
                 changes[key] = {'old': old_value, 'new': new_value}
                 logger.info(f"Cambio detectado en {key}: {old_value} -> {new_value}")
 
         self.current_state.update(new_data)
         self.current_state['last_update'] = timestamp
-        self._save_state()
+
+        if changes or first:
+            self._save_state()
+        else:
+            self._dirty = True
+            self.flush_if_due()
 
         return changes
 
@@ -156,74 +308,22 @@ class UPSState:
         return self.current_state
 
     def format_state_message(self, data):
-        """Formatea los datos de estado en un mensaje legible"""
-        status_code = data.get('status', '1')
-        status_text = self.STATUS_MAP.get(status_code, f'Desconocido ({status_code})')
-
-        battery_status_code = data.get('battery_status', '1')
-        battery_status_text = self.BATTERY_STATUS_MAP.get(
-            battery_status_code,
-            f'Desconocido ({battery_status_code})'
-        )
+        """Formatea los datos de estado en un mensaje legible (plantilla compartida con el bot)"""
+        return rendering.render_state(data)
 
-        # Icono de estado
-        status_icon = '🔴' if status_code in self.CRITICAL_STATUSES else '🟢'
-        battery_icon = '🔴' if battery_status_code in self.CRITICAL_BATTERY_STATUSES else '🔋'
-
-        message = (
-            f"🔋 *Estado de la UPS*\n\n"
-            f"{status_icon} *Estado General:* {status_text}\n"
-            f"{battery_icon} *Batería:* {battery_status_text}\n"
-            f"⚡ *Carga Batería:* {data.get('battery_capacity', 'N/A')}%\n"
-            f"⏱️ *Autonomía:* {self._format_runtime(data.get('battery_runtime'))}\n\n"
-            f"📥 *Entrada:*\n"
-            f"   • Voltaje: {data.get('input_voltage', 'N/A')} V"
+    def is_critical(self, changes):
+        """Determina si algún cambio es crítico (UPS en batería, fallas, batería baja)"""
+        return (
+            ('status' in changes and changes['status']['new'] in self.CRITICAL_STATUSES) or
+            ('battery_status' in changes and changes['battery_status']['new'] in self.CRITICAL_BATTERY_STATUSES)
         )
 
-        if data.get('input_frequency'):
-            message += f"\n   • Frecuencia: {data.get('input_frequency')} Hz"
-
-        message += f"\n\n📤 *Salida:*\n   • Voltaje: {data.get('output_voltage', 'N/A')} V"
-
-        if data.get('output_frequency'):
-            message += f"\n   • Frecuencia: {data.get('output_frequency')} Hz"
-
-        message += f"\n   • Carga: {data.get('output_load', 'N/A')}%"
-
-        if data.get('output_current'):
-            message += f"\n   • Corriente: {data.get('output_current')} A"
-
-        if data.get('output_power'):
-            try:
-                power_kw = float(data.get('output_power', 0)) / 1000
-                message += f"\n   • Potencia: {power_kw:.1f} kW"
-            except (ValueError, TypeError):
-                message += f"\n   • Potencia: {data.get('output_power')} W"
-
-        if data.get('bypass_voltage'):
-            message += f"\n\n🔄 *Bypass:* {data.get('bypass_voltage')} V"
-
-        message += f"\n\n🌡️ *Temperatura:* {data.get('temperature', 'N/A')}°C"
-
-        if data.get('alarms') and data.get('alarms') != '0':
-            message += f"\n⚠️ *Alarmas Activas:* {data.get('alarms')}"
-
-        message += f"\n\n🕐 *Última actualización:* {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-
-        return message
-
     def format_change_message(self, changes):
         """Formatea un mensaje de alerta por cambios detectados"""
         if not changes:
             return None
 
-        # Determinar si algún cambio es crítico
-        is_critical = (
-            ('status' in changes and changes['status']['new'] in self.CRITICAL_STATUSES) or
-            ('battery_status' in changes and changes['battery_status']['new'] in self.CRITICAL_BATTERY_STATUSES)
-        )
-
-        header = "🚨 *ALERTA CRÍTICA UPS*\n\n" if is_critical else "⚠️ *Cambio en el estado de la UPS*\n\n"
+        header = "🚨 *ALERTA CRÍTICA UPS*\n\n" if self.is_critical(changes) else "⚠️ *Cambio en el estado de la UPS*\n\n"
         message = header
 
         for key, change in changes.items():
@@ -234,40 +334,29 @@ class UPSState:
                 old_text = self.STATUS_MAP.get(old_val, old_val)
                 new_text = self.STATUS_MAP.get(new_val, new_val)
                 icon = '🚨' if new_val in self.CRITICAL_STATUSES else '🔄'
-                message += f"{icon} *Estado:* {old_text} → {new_text}\n"
+                line = f"{icon} *Estado:* {old_text} → {new_text}"
             elif key == 'battery_status':
                 old_text = self.BATTERY_STATUS_MAP.get(old_val, old_val)
                 new_text = self.BATTERY_STATUS_MAP.get(new_val, new_val)
                 icon = '🚨' if new_val in self.CRITICAL_BATTERY_STATUSES else '🔋'
-                message += f"{icon} *Estado Batería:* {old_text} → {new_text}\n"
+                line = f"{icon} *Estado Batería:* {old_text} → {new_text}"
             elif key == 'battery_capacity':
-                message += f"⚡ *Carga Batería:* {old_val}% → {new_val}%\n"
-            elif key in ('input_voltage', 'output_voltage', 'bypass_voltage'):
+                line = f"⚡ *Carga Batería:* {old_val}% → {new_val}%"
+            elif self.PHASE_SUFFIX.sub('', key) in ('input_voltage', 'output_voltage', 'bypass_voltage'):
                 label = key.replace('_', ' ').title()
-                message += f"📊 *{label}:* {old_val}V → {new_val}V\n"
+                line = f"📊 *{label}:* {old_val}V → {new_val}V"
+            elif key == 'active_alarms':
+                line = f"🚨 *Alarmas UPS:* {old_val or 'ninguna'} → {new_val or 'ninguna'}"
             elif key == 'temperature':
-                message += f"🌡️ *Temperatura:* {old_val}°C → {new_val}°C\n"
+                line = f"🌡️ *Temperatura:* {old_val}°C → {new_val}°C"
             else:
-                message += f"• *{key}:* {old_val} → {new_val}\n"
+                line = f"• *{key}:* {old_val} → {new_val}"
+
+            # Cambios agrupados por el coalescer: primer valor → último valor
+            count = change.get('count', 1)
+            if count > 1:
+                line += f" _({count} cambios)_"
+            message += line + "\n"
 
         message += f"\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         return message
-
-    def _format_runtime(self, runtime):
-        """
-        Formatea el tiempo de autonomía.
-        OID Eaton privado 1.3.6.1.4.1.534.1.2.1.0 devuelve SEGUNDOS.
-        Validado: 7747s = 2h 9min (coincide con interfaz web Eaton).
-        """
-        if runtime is None or runtime == 'N/A':
-            return 'N/A'
-        try:
-            total_seconds = int(runtime)
-            hours = total_seconds // 3600
-            mins = (total_seconds % 3600) // 60
-            if hours > 0:
-                return f"{hours}h {mins}min"
-            else:
-                return f"{mins} min"
-        except (ValueError, TypeError):
-            return str(runtime)
\ No newline at end of file
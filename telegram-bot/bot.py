@@ -3,13 +3,21 @@ Bot de Telegram para notificaciones de UPS
 """
 import logging
 import asyncio
-import json
 import os
-from datetime import datetime
+import sqlite3
+from collections import deque
 from telegram import Bot, Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 from telegram.constants import ParseMode
 from config import BotConfig
+import history_view
+from sender import MessageSender
+from state_cache import StateCache
+from shared.control import ControlError, request as control_request
+from shared.history import HistoryStore
+from shared.message_queue import MessageQueue
+from shared.notify import NotificationListener
+from shared.rendering import render_state
 
 # Configurar logging
 logging.basicConfig(
@@ -28,9 +36,31 @@ class UPSTelegramBot:
     
     def __init__(self):
         self.token = BotConfig.TOKEN
-        self.chat_id = BotConfig.CHAT_ID
+        self.chat_ids = BotConfig.CHAT_IDS
+        self.chat_id = self.chat_ids[0] if self.chat_ids else ''
         self.bot = None
         self.application = None
+        self.queue = MessageQueue(BotConfig.DATA_DIR)
+        self.listener = NotificationListener(BotConfig.NOTIFY_SOCKET)
+        self.history = HistoryStore(BotConfig.HISTORY_DB, readonly=True)
+        self.state_cache = StateCache(
+            BotConfig.DATA_DIR,
+            render_state,
+            max_age=BotConfig.STATE_CACHE_SECONDS,
+            primary_name=BotConfig.DEFAULT_DEVICE,
+        )
+        self.sender = MessageSender(
+            self.send_message,
+            self.chat_ids,
+            per_chat_rate=BotConfig.SEND_RATE_PER_CHAT,
+            group_rate=BotConfig.SEND_RATE_PER_GROUP,
+            global_rate=BotConfig.SEND_RATE_GLOBAL,
+        )
+        # Registros entregados al sender, en orden de la cola
+        self._inflight = deque()
+        self._done = set()
+        self._submitted = (None, 0)  # (inodo, fin del último registro entregado)
+        self._queue_task = None
         
         if not self.token or not self.chat_id:
             raise ValueError("TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID son requeridos")
@@ -41,31 +71,54 @@ class UPSTelegramBot:
             '🔋 *Bot de Monitoreo UPS*\n\n'
             'Comandos disponibles:\n'
             '/start - Muestra este mensaje\n'
-            '/status - Obtiene el estado actual de la UPS\n'
+            '/status [dispositivo] - Obtiene el estado actual de la UPS\n'
+            '/status live [dispositivo] - Consulta la UPS en este momento\n'
+            '/history <métrica> [rango] - Mínimo, promedio y máximo\n'
+            '/graph <métrica> [rango] - Gráfico del período\n'
             '/help - Ayuda y información',
             parse_mode=ParseMode.MARKDOWN
         )
     
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Maneja el comando /status"""
+        """
+        Maneja el comando /status [live] [dispositivo]. Sin 'live' responde desde
+        la caché de estado; con 'live' pide al monitor un sondeo en el momento.
+        """
         try:
-            state_file = os.path.join(BotConfig.DATA_DIR, 'ups_state.json')
+            args = list(context.args or [])
+            live = bool(args) and args[0].lower() == 'live'
+            if live:
+                args.pop(0)
+            device = args[0] if args else ''
             
-            if not os.path.exists(state_file):
-                await update.message.reply_text(
-                    '⚠️ No hay datos de estado disponibles aún.',
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
+            if live:
+                try:
+                    response = await control_request(
+                        BotConfig.CONTROL_SOCKET,
+                        {'cmd': 'status', 'device': device},
+                        timeout=BotConfig.LIVE_STATUS_TIMEOUT,
+                    )
+                    await update.message.reply_text(response['message'], parse_mode=ParseMode.MARKDOWN)
+                    return
+                except ControlError as e:
+                    logger.warning(f"/status live falló: {str(e)}")
+                    await update.message.reply_text(
+                        f'⚠️ No se pudo consultar en vivo ({str(e)}). Último estado guardado:'
+                    )
             
-            with open(state_file, 'r') as f:
-                state = json.load(f)
+            snapshot = self.state_cache.get(device)
             
-            from ups_state import UPSState
-            ups_state = UPSState()
-            message = ups_state.format_state_message(state)
+            if snapshot is None:
+                others = self.state_cache.devices()
+                if device and others:
+                    message = (f"⚠️ Dispositivo desconocido: {device}\n"
+                               f"Disponibles: {', '.join(others)}")
+                else:
+                    message = '⚠️ No hay datos de estado disponibles aún.'
+                await update.message.reply_text(message)
+                return
             
-            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+            await update.message.reply_text(snapshot.message, parse_mode=ParseMode.MARKDOWN)
             
         except Exception as e:
             logger.error(f"Error al obtener estado: {str(e)}")
@@ -74,6 +127,75 @@ class UPSTelegramBot:
                 parse_mode=ParseMode.MARKDOWN
             )
     
+    def _history_args(self, args):
+        """
+        Interpreta los argumentos de /history y /graph: <métrica> [rango] [dispositivo]
+
+        Returns:
+            (dispositivo, métrica, título, unidad, rango en texto, segundos)
+
+        Raises:
+            ValueError: Argumentos inválidos o sin datos en el histórico
+        """
+        if not args:
+            raise ValueError(
+                f"Uso: <métrica> [rango] [dispositivo], ej: bateria 30d\n"
+                f"Métricas: {', '.join(history_view.METRICS)}"
+            )
+        metric, title, unit = history_view.resolve_metric(args[0])
+        range_text = args[1] if len(args) > 1 else history_view.DEFAULT_RANGE
+        seconds = history_view.parse_range(range_text)
+
+        devices = self.history.devices()
+        if len(args) > 2:
+            device = args[2]
+        elif BotConfig.DEFAULT_DEVICE in devices or not devices:
+            device = BotConfig.DEFAULT_DEVICE
+        else:
+            device = devices[0]
+        if device not in devices:
+            raise ValueError(f"Sin histórico para {device}. Disponibles: {', '.join(devices) or 'ninguno'}")
+        return device, metric, title, unit, range_text, seconds
+
+    async def _history_reply(self, update: Update, context: ContextTypes.DEFAULT_TYPE, graph):
+        """Responde /history (resumen) o /graph (resumen + PNG) desde los rollups"""
+        try:
+            device, metric, title, unit, range_text, seconds = self._history_args(context.args or [])
+            summary, series = history_view.query(self.history, device, metric, seconds)
+        except ValueError as e:
+            await update.message.reply_text(f"⚠️ {str(e)}")
+            return
+        except sqlite3.Error as e:
+            logger.error(f"Error al leer el histórico: {str(e)}")
+            await update.message.reply_text('⚠️ El histórico no está disponible aún.')
+            return
+
+        if summary is None:
+            await update.message.reply_text(f"⚠️ Sin datos de {title} en los últimos {range_text}.")
+            return
+
+        message = history_view.format_summary(
+            device, metric, title, unit, range_text, seconds, summary, series
+        )
+        if not graph:
+            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+            return
+        try:
+            # El render es CPU puro: fuera del event loop para no frenar la cola de envíos
+            png = await asyncio.to_thread(history_view.render_png, series, metric, title, unit, device)
+            await update.message.reply_photo(photo=png, caption=message, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            logger.error(f"Error al generar gráfico: {str(e)}")
+            await update.message.reply_text(f'❌ Error al generar gráfico: {str(e)}')
+
+    async def history_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Maneja el comando /history <métrica> [rango] [dispositivo]"""
+        await self._history_reply(update, context, graph=False)
+
+    async def graph_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Maneja el comando /graph <métrica> [rango] [dispositivo]"""
+        await self._history_reply(update, context, graph=True)
+
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Maneja el comando /help"""
         help_text = """
@@ -90,6 +212,10 @@ Este bot monitorea el estado de una UPS mediante SNMP v3 y envía notificaciones
 *Comandos:*
 /start - Iniciar el bot
 /status - Ver estado actual de la UPS
+/status <dispositivo> - Estado de otra UPS o PDU
+/status live - Consulta la UPS en este momento (no el último sondeo)
+/history <métrica> [rango] - Mínimo, promedio, máximo y tendencia
+/graph <métrica> [rango] - Gráfico del período (ej: /graph bateria 30d)
 /help - Mostrar esta ayuda
 
 *Alertas automáticas:*
@@ -106,103 +232,140 @@ Para soporte o configuración, consulta la documentación del proyecto.
         """
         await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
     
-    async def send_message(self, message: str):
+    async def send_message(self, message: str, chat_id=None):
         """
-        Envía un mensaje al chat configurado
+        Envía un mensaje a un chat
         
         Args:
             message: Texto del mensaje a enviar
+            chat_id: Chat destino (por defecto el primero configurado)
         """
+        chat_id = chat_id or self.chat_id
         try:
             if not self.bot:
-                self.bot = Bot(token=self.token)
+                # Bot ya inicializado de la aplicación: el primer envío reutiliza
+                # su conexión en lugar de abrir otra (TLS incluido)
+                self.bot = self.application.bot if self.application else Bot(
+                    token=self.token, base_url=BotConfig.API_URL
+                )
             
             await self.bot.send_message(
-                chat_id=self.chat_id,
+                chat_id=chat_id,
                 text=message,
                 parse_mode=ParseMode.MARKDOWN
             )
-            logger.info("Mensaje enviado correctamente")
+            logger.info(f"Mensaje enviado correctamente a {chat_id}")
             
         except Exception as e:
-            logger.error(f"Error al enviar mensaje: {str(e)}")
+            logger.error(f"Error al enviar mensaje a {chat_id}: {str(e)}")
             raise
     
     async def process_message_queue(self):
-        """Procesa la cola de mensajes pendientes"""
-        queue_file = BotConfig.MESSAGE_QUEUE_FILE
-        
-        if not os.path.exists(queue_file):
-            return
-        
+        """
+        Entrega al sender los registros nuevos de la cola. El envío es asíncrono:
+        cada registro se confirma en _on_sent cuando todos sus chats terminan.
+        """
         try:
-            with open(queue_file, 'r') as f:
-                queue = json.load(f)
-            
-            if not queue:
-                return
-            
-            sent = 0
-            failed = []
-            for message_data in queue:
-                try:
-                    await self.send_message(message_data['message'])
-                    sent += 1
-                    await asyncio.sleep(1)  # Evitar rate limiting
-                except Exception as e:
-                    logger.error(f"Error al enviar mensaje de la cola: {str(e)}")
-                    failed.append(message_data)
-
-            with open(queue_file, 'w') as f:
-                json.dump(failed, f, indent=2)
-            
-            if sent:
-                logger.info(f"Procesados {sent} mensajes de la cola")
-            
-            if failed:
-                logger.warning(f"{len(failed)} mensajes quedaron en cola por error")
-                
+            records = self.queue.read_pending()
+            inode, submitted_end = self._submitted
+            new = 0
+            for record in records:
+                if record.inode == inode and record.offset < submitted_end:
+                    continue  # ya está en el sender
+                self._inflight.append(record)
+                self.sender.submit(record, self._on_sent, record.data.get('chat_ids'))
+                inode, submitted_end = record.inode, record.end
+                new += 1
+            self._submitted = (inode, submitted_end)
+
+            if new:
+                logger.info(f"{new} mensajes de la cola entregados al sender "
+                            f"({self.sender.backlog()} en espera)")
+
         except Exception as e:
             logger.error(f"Error al procesar cola de mensajes: {str(e)}")
-    
-    async def queue_checker(self, context: ContextTypes.DEFAULT_TYPE):
-        """Tarea periódica para verificar la cola de mensajes (JobQueue)"""
-        await self.process_message_queue()
+
+    def _on_sent(self, record, failed_chats):
+        """
+        Envío de un registro terminado. Los chats fallidos se re-encolan (hasta
+        SEND_MAX_ATTEMPTS intentos; después el mensaje se registra en el log y
+        se descarta) y se confirma el tramo contiguo de registros terminados:
+        un reinicio no reenvía lo ya enviado ni pierde lo que sigue pendiente.
+        """
+        try:
+            if failed_chats:
+                attempts = record.data.get('attempts', 0) + 1
+                if attempts >= BotConfig.SEND_MAX_ATTEMPTS:
+                    logger.error(f"Mensaje descartado tras {attempts} intentos para "
+                                 f"{len(failed_chats)} chat(s): {record.data.get('message', '')[:200]!r}")
+                else:
+                    logger.warning(f"Mensaje re-encolado para {len(failed_chats)} chat(s) por error "
+                                   f"(intento {attempts} de {BotConfig.SEND_MAX_ATTEMPTS})")
+                    self.queue.requeue(dict(record.data, chat_ids=failed_chats))
+
+            self._done.add(record.offset)
+            last = None
+            while self._inflight and self._inflight[0].offset in self._done:
+                last = self._inflight.popleft()
+                self._done.discard(last.offset)
+            if last is not None:
+                self.queue.commit(last)
+
+            if not self._inflight:
+                self.queue.maybe_compact()
+                self._submitted = (None, 0)
+        except Exception as e:
+            logger.error(f"Error al confirmar mensaje de la cola: {str(e)}")
 
     async def _queue_loop(self):
-        """Loop asyncio de respaldo cuando JobQueue no está disponible"""
-        logger.info("Loop de cola asyncio iniciado (fallback)")
+        """
+        Entrega de la cola disparada por avisos del monitor (socket Unix).
+        La verificación periódica queda como respaldo por si se pierde un aviso
+        o el socket no está disponible.
+        """
+        listening = await self.listener.start()
+        interval = BotConfig.QUEUE_FALLBACK_INTERVAL if listening else BotConfig.QUEUE_CHECK_INTERVAL
+        logger.info(f"Loop de cola iniciado (respaldo cada {interval}s)")
         while True:
             try:
-                await self.process_message_queue()
+                # Solo un stat() si no hay nada nuevo
+                if self.queue.has_pending():
+                    await self.process_message_queue()
             except Exception as e:
-                logger.error(f"Error en loop de cola asyncio: {str(e)}")
-            await asyncio.sleep(BotConfig.QUEUE_CHECK_INTERVAL)
+                logger.error(f"Error en loop de cola: {str(e)}")
+            events = await self.listener.wait(interval)
+            if 'state' in events:
+                self.state_cache.invalidate()
+
+    async def _post_init(self, application):
+        """Arranca el loop de entrega de la cola junto con la aplicación"""
+        self.sender.start()
+        self._queue_task = asyncio.create_task(self._queue_loop())
+
+    async def _post_shutdown(self, application):
+        """Detiene el loop de la cola y libera el socket de avisos"""
+        if self._queue_task:
+            self._queue_task.cancel()
+        await self.sender.stop()
+        self.listener.close()
+        self.history.close()
 
     def start_bot(self):
         """Inicia el bot"""
         logger.info("Iniciando bot de Telegram...")
         
-        self.application = Application.builder().token(self.token).build()
+        self.application = Application.builder().token(self.token).base_url(BotConfig.API_URL).build()
         
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("status", self.status_command))
+        self.application.add_handler(CommandHandler("history", self.history_command))
+        self.application.add_handler(CommandHandler("graph", self.graph_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         
-        if self.application.job_queue:
-            self.application.job_queue.run_repeating(
-                self.queue_checker,
-                interval=BotConfig.QUEUE_CHECK_INTERVAL,
-                first=5
-            )
-            logger.info("Verificador de cola programado via JobQueue")
-        else:
-            logger.warning("JobQueue no disponible - usando loop asyncio como fallback")
-            async def post_init(app):
-                asyncio.create_task(self._queue_loop())
-            self.application.post_init = post_init
+        self.application.post_init = self._post_init
+        self.application.post_shutdown = self._post_shutdown
         
-        logger.info(f"Chat ID: {self.chat_id}")
+        logger.info(f"Chat IDs: {', '.join(self.chat_ids)}")
         logger.info("Iniciando polling...")
         
         self.application.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -11,10 +11,40 @@ class BotConfig:
     
     TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
     CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+    # Varios chats separados por coma: las notificaciones se envían a todos
+    CHAT_IDS = [chat.strip() for chat in CHAT_ID.split(',') if chat.strip()]
+
+    # Límites de envío de Telegram (mensajes por segundo)
+    SEND_RATE_PER_CHAT = float(os.getenv('TELEGRAM_RATE_PER_CHAT', '1'))
+    SEND_RATE_PER_GROUP = float(os.getenv('TELEGRAM_RATE_PER_GROUP', str(20 / 60)))
+    SEND_RATE_GLOBAL = float(os.getenv('TELEGRAM_RATE_GLOBAL', '30'))
+    # Intentos de envío de un mensaje (con espera creciente entre re-encolados)
+    # antes de descartarlo; los errores permanentes (BadRequest, Forbidden) no se reintentan
+    SEND_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_SEND_MAX_ATTEMPTS', '10'))
     
-    DATA_DIR = '/app/data'
-    LOG_DIR = '/app/logs'
-    MESSAGE_QUEUE_FILE = os.path.join(DATA_DIR, 'message_queue.json')
+    # Servidor de la Bot API (ej: un telegram-bot-api local)
+    API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+
+    # Volúmenes del contenedor (configurables para ejecutar fuera de Docker)
+    DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+    LOG_DIR = os.getenv('LOG_DIR', '/app/logs')
     
-    # Intervalo para verificar mensajes en cola (segundos)
+    # Socket Unix por el que snmp-monitor avisa de mensajes nuevos
+    NOTIFY_SOCKET = os.path.join(DATA_DIR, 'notify.sock')
+    # Histórico de sondeos escrito por snmp-monitor (solo lectura)
+    HISTORY_DB = os.path.join(DATA_DIR, 'history.db')
+    # Dispositivo por defecto de /history y /graph
+    DEFAULT_DEVICE = os.getenv('SNMP_DEVICE_NAME', 'ups')
+
+    # Socket Unix de control del monitor (sondeo en vivo para /status live)
+    CONTROL_SOCKET = os.path.join(DATA_DIR, 'control.sock')
+    LIVE_STATUS_TIMEOUT = float(os.getenv('LIVE_STATUS_TIMEOUT', '30'))
+
+    # Intervalo para verificar mensajes en cola (segundos) si no hay socket de avisos
     QUEUE_CHECK_INTERVAL = 5
+    # Verificación de respaldo cuando se reciben avisos por socket (segundos)
+    QUEUE_FALLBACK_INTERVAL = int(os.getenv('QUEUE_FALLBACK_INTERVAL', '30'))
+
+    # Segundos máximos que /status responde desde memoria sin revisar los
+    # archivos de estado (el aviso 'state' del monitor invalida antes)
+    STATE_CACHE_SECONDS = float(os.getenv('STATE_CACHE_SECONDS', '10'))
@@ -0,0 +1,164 @@
+"""
+Consultas del histórico para /history y /graph
+
+Lee los rollups de data/history.db (escritos por snmp-monitor) en solo
+lectura, nunca las muestras crudas: rangos de hasta 2 días usan los
+agregados por minuto y los más largos los agregados por hora, por lo que un
+gráfico de 30 días son ~720 filas. matplotlib se importa recién en el primer
+/graph (backend Agg, sin pyplot).
+"""
+import io
+import re
+import time
+from datetime import datetime
+
+# Alias de métricas -> (clave en el histórico, título, unidad)
+METRICS = {
+    'bateria':     ('battery_capacity', 'Carga de batería', '%'),
+    'autonomia':   ('battery_runtime', 'Autonomía', 'min'),
+    'carga':       ('output_load', 'Carga de salida', '%'),
+    'entrada':     ('input_voltage', 'Voltaje de entrada', 'V'),
+    'salida':      ('output_voltage', 'Voltaje de salida', 'V'),
+    'bypass':      ('bypass_voltage', 'Voltaje de bypass', 'V'),
+    'potencia':    ('output_power', 'Potencia de salida', 'W'),
+    'corriente':   ('output_current', 'Corriente de salida', 'A'),
+    'temperatura': ('temperature', 'Temperatura', '°C'),
+}
+
+RANGE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+DEFAULT_RANGE = '24h'
+MAX_RANGE = 730 * 86400
+
+# Hasta este rango se usan los rollups por minuto (2880 puntos como máximo)
+MINUTE_ROLLUP_MAX = 2 * 86400
+# Rango mínimo para mostrar la tendencia diaria (ej: degradación de batería)
+TREND_MIN_RANGE = 86400
+
+
+def resolve_metric(name):
+    """
+    Args:
+        name: Alias (bateria, carga...) o clave del histórico (battery_capacity...)
+
+    Returns:
+        (clave, título, unidad)
+    """
+    name = name.lower()
+    if name in METRICS:
+        return METRICS[name]
+    return name, name, ''
+
+
+def parse_range(text):
+    """
+    Convierte '30m', '12h', '7d', '4w' a segundos.
+
+    Raises:
+        ValueError: Formato inválido o rango fuera de límites
+    """
+    match = re.fullmatch(r'(\d+)([mhdw])', text.lower())
+    if not match:
+        raise ValueError(f"Rango inválido: {text} (usar ej: 12h, 7d, 4w)")
+    seconds = int(match.group(1)) * RANGE_UNITS[match.group(2)]
+    if not 0 < seconds <= MAX_RANGE:
+        raise ValueError(f"Rango fuera de límites: {text}")
+    return seconds
+
+
+def rollup_table(seconds):
+    return 'rollup_1m' if seconds <= MINUTE_ROLLUP_MAX else 'rollup_1h'
+
+
+def _scale(metric, value):
+    """battery_runtime se guarda en segundos y se muestra en minutos"""
+    return value / 60 if metric == 'battery_runtime' else value
+
+
+def trend_per_day(series):
+    """
+    Pendiente (unidades por día) por mínimos cuadrados sobre los promedios.
+
+    Args:
+        series: Lista de (bucket, min, avg, max)
+
+    Returns:
+        Pendiente, o None con menos de dos puntos
+    """
+    if len(series) < 2:
+        return None
+    n = len(series)
+    mean_x = sum(row[0] for row in series) / n
+    mean_y = sum(row[2] for row in series) / n
+    var_x = sum((row[0] - mean_x) ** 2 for row in series)
+    if var_x == 0:
+        return None
+    cov = sum((row[0] - mean_x) * (row[2] - mean_y) for row in series)
+    return cov / var_x * 86400
+
+
+def query(store, device, metric, seconds):
+    """
+    Resumen y serie de una métrica desde los rollups.
+
+    Returns:
+        (resumen, serie) con resumen = (min, avg, max, muestras) o None
+    """
+    since = time.time() - seconds
+    table = rollup_table(seconds)
+    return (
+        store.summary(device, metric, since, table=table),
+        store.series(device, metric, since, table=table),
+    )
+
+
+def format_summary(device, metric, title, unit, range_text, seconds, summary, series):
+    """Mensaje de /history"""
+    low, avg, high = (_scale(metric, value) for value in summary[:3])
+    count = summary[3]
+    message = (
+        f"📈 *{title}* — últimos {range_text} ({device})\n\n"
+        f"   • Mínimo: {low:.1f} {unit}\n"
+        f"   • Promedio: {avg:.1f} {unit}\n"
+        f"   • Máximo: {high:.1f} {unit}\n"
+        f"   • Muestras: {count}"
+    )
+    slope = trend_per_day(series) if seconds >= TREND_MIN_RANGE else None
+    if slope is not None:
+        message += f"\n   • Tendencia: {_scale(metric, slope):+.2f} {unit}/día"
+    return message
+
+
+def render_png(series, metric, title, unit, device):
+    """
+    Gráfico PNG del promedio con la banda mínimo-máximo.
+
+    Returns:
+        bytes del PNG
+    """
+    # Import diferido: matplotlib tarda en cargar y solo lo necesita /graph
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+
+    times = [datetime.fromtimestamp(row[0]) for row in series]
+    lows = [_scale(metric, row[1]) for row in series]
+    avgs = [_scale(metric, row[2]) for row in series]
+    highs = [_scale(metric, row[3]) for row in series]
+
+    figure = Figure(figsize=(8, 4), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(1, 1, 1)
+    axes.fill_between(times, lows, highs, alpha=0.25, linewidth=0, label='mín-máx')
+    axes.plot(times, avgs, linewidth=1.2, label='promedio')
+    axes.set_title(f"{title} ({device})")
+    axes.set_ylabel(unit)
+    axes.grid(True, alpha=0.3)
+    axes.legend(loc='best', fontsize='small')
+    locator = mdates.AutoDateLocator()
+    axes.xaxis.set_major_locator(locator)
+    axes.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
@@ -0,0 +1,219 @@
+"""
+Envío de mensajes a Telegram con límite de tasa y prioridades
+
+- Un token bucket por chat (límites de Telegram: ~1 msg/s por chat privado,
+  20 msg/min por grupo) y uno global (~30 msg/s por bot)
+- Una cola de prioridad por chat: alerta crítica > alerta > error > reporte diario
+- Los chats se atienden en paralelo; dentro de un chat el orden se respeta
+- RetryAfter (HTTP 429) pausa el bucket del chat el tiempo indicado y reintenta
+- Los errores permanentes (BadRequest: Markdown inválido o mensaje demasiado
+  largo; Forbidden: bot bloqueado o fuera del chat) no se reintentan: el
+  mensaje se registra en el log y se da por terminado para ese chat
+- Un registro re-encolado (attempts > 0) entra a las colas de sus chats tras
+  una espera que crece con cada intento; mientras tanto el chat sigue
+  enviando lo demás (una alerta crítica nueva no espera al reintento)
+"""
+import asyncio
+import itertools
+import logging
+import time
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Menor número = mayor prioridad
+PRIORITIES = {
+    'critical':     0,
+    'alert':        1,
+    'error':        2,
+    'daily_report': 3,
+}
+DEFAULT_PRIORITY = 2
+
+# Errores que no se resuelven reintentando el mismo mensaje en el mismo chat
+PERMANENT_ERRORS = (BadRequest, Forbidden)
+
+
+def message_priority(message_data):
+    """Prioridad de un mensaje de la cola ('priority' explícita o según 'type')"""
+    key = message_data.get('priority') or message_data.get('type')
+    return PRIORITIES.get(key, DEFAULT_PRIORITY)
+
+
+class TokenBucket:
+    """Token bucket asíncrono: rate tokens/s con ráfagas de hasta capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Bloquea el bucket (RetryAfter) y descarta los tokens acumulados"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        """Espera hasta obtener un token"""
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Delivery:
+    """Mensaje pendiente de entrega a uno o varios chats"""
+
+    def __init__(self, record, chat_ids, on_done):
+        self.record = record
+        self.pending = set(chat_ids)
+        self.failed = []
+        self.on_done = on_done
+
+    def finish(self, chat_id, ok):
+        self.pending.discard(chat_id)
+        if not ok:
+            self.failed.append(chat_id)
+        if not self.pending:
+            self.on_done(self.record, self.failed)
+
+
+class MessageSender:
+    """Distribuye mensajes a todos los chats respetando límites y prioridades"""
+
+    def __init__(self, send_fn, chat_ids, per_chat_rate, group_rate, global_rate, max_retries=3,
+                 max_backoff=300.0):
+        """
+        Args:
+            send_fn: Corrutina send_fn(message, chat_id)
+            chat_ids: Chats destino
+            per_chat_rate: Mensajes/s por chat privado
+            group_rate: Mensajes/s por grupo (chat_id negativo)
+            global_rate: Mensajes/s totales del bot
+            max_retries: Reintentos por RetryAfter antes de dar el envío por fallido
+            max_backoff: Espera máxima (s) antes de encolar un registro re-encolado
+                (2 ** attempts segundos hasta este tope)
+        """
+        self.send_fn = send_fn
+        self.chat_ids = list(chat_ids)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.buckets = {}
+        self.queues = {}
+        self._workers = []
+        self._delayed = {}  # _Delivery -> TimerHandle de los reintentos en espera
+        self._sequence = itertools.count()
+        for chat_id in self.chat_ids:
+            is_group = str(chat_id).startswith('-')
+            rate = group_rate if is_group else per_chat_rate
+            # Ráfaga corta permitida; el bucket la repone a la tasa del chat
+            self.buckets[chat_id] = TokenBucket(rate, 3)
+            self.queues[chat_id] = asyncio.PriorityQueue()
+
+    def start(self):
+        """Lanza un worker por chat (llamar dentro del event loop)"""
+        self._workers = [
+            asyncio.create_task(self._worker(chat_id)) for chat_id in self.chat_ids
+        ]
+
+    async def stop(self):
+        for handle in self._delayed.values():
+            handle.cancel()
+        self._delayed.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, record, on_done, chat_ids=None):
+        """
+        Encola un registro para todos sus chats.
+
+        Args:
+            record: QueueRecord de la cola de mensajes
+            on_done: Callback on_done(record, chats_fallidos) al terminar todos los chats;
+                los chats con error permanente no cuentan como fallidos (no se reintentan)
+            chat_ids: Chats destino (por defecto todos los configurados)
+        """
+        targets = [c for c in (chat_ids or self.chat_ids) if c in self.queues]
+        if not targets:
+            on_done(record, [])
+            return
+        delivery = _Delivery(record, targets, on_done)
+        attempts = record.data.get('attempts', 0)
+        if not attempts:
+            self._enqueue(delivery, targets)
+            return
+        # Reintento: espera fuera de las colas, sin frenar al resto del chat
+        self._delayed[delivery] = asyncio.get_running_loop().call_later(
+            min(2 ** attempts, self.max_backoff), self._enqueue_delayed, delivery, targets,
+        )
+
+    def _enqueue(self, delivery, targets):
+        priority = message_priority(delivery.record.data)
+        sequence = next(self._sequence)
+        for chat_id in targets:
+            self.queues[chat_id].put_nowait((priority, sequence, delivery))
+
+    def _enqueue_delayed(self, delivery, targets):
+        self._delayed.pop(delivery, None)
+        self._enqueue(delivery, targets)
+
+    def backlog(self):
+        """Mensajes esperando envío (suma de todos los chats, reintentos en espera incluidos)"""
+        return sum(queue.qsize() for queue in self.queues.values()) + len(self._delayed)
+
+    async def _deliver(self, chat_id, message):
+        """
+        Envía un mensaje a un chat respetando buckets y RetryAfter.
+
+        Returns:
+            True si el envío terminó (enviado o descartado por error
+            permanente), False si falló y debe reintentarse
+        """
+        bucket = self.buckets[chat_id]
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.send_fn(message, chat_id)
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if hasattr(retry_after, 'total_seconds'):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Telegram pidió esperar {retry_after}s (chat {chat_id})")
+                bucket.pause(float(retry_after))
+            except PERMANENT_ERRORS as e:
+                logger.error(f"Mensaje descartado para {chat_id} (error permanente: {str(e)}): {message[:200]!r}")
+                return True
+            except Exception as e:
+                logger.error(f"Error al enviar mensaje a {chat_id}: {str(e)}")
+                return False
+        return False
+
+    async def _worker(self, chat_id):
+        queue = self.queues[chat_id]
+        while True:
+            _, _, delivery = await queue.get()
+            try:
+                ok = await self._deliver(chat_id, delivery.record.data['message'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en envío a {chat_id}: {str(e)}")
+                ok = False
+            delivery.finish(chat_id, ok)
@@ -0,0 +1,130 @@
+"""
+Instantánea en memoria de los archivos de estado del monitor para /status
+
+snmp-monitor escribe data/ups_state.json (dispositivo principal, con su
+nombre en _device) y data/ups_state_<nombre>.json (resto). El bot los mantiene
+cargados junto con el mensaje de estado ya formateado de cada dispositivo:
+
+    - el monitor avisa 'state' por el socket de avisos al escribir un estado
+      y la instantánea se invalida al instante;
+    - como respaldo, se revisan mtime/tamaño como máximo cada max_age segundos
+      y solo se releen los archivos que cambiaron.
+
+Un /status repetido responde desde memoria, sin leer disco ni reformatear.
+"""
+import json
+import logging
+import os
+import time
+from shared.fsutil import json_checksum
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_FILE = 'ups_state.json'
+DEVICE_PREFIX = 'ups_state_'
+
+
+class StateSnapshot:
+    """Estado de un dispositivo y su mensaje de /status pre-formateado"""
+
+    __slots__ = ('device', 'state', 'message', 'signature')
+
+    def __init__(self, device, state, message, signature):
+        self.device = device
+        self.state = state
+        self.message = message
+        self.signature = signature
+
+
+class StateCache:
+    """Caché de solo lectura de los estados por dispositivo"""
+
+    def __init__(self, data_dir, formatter, max_age=10.0, primary_name='ups'):
+        """
+        Args:
+            data_dir: Directorio compartido con el monitor
+            formatter: Función estado -> mensaje (shared.rendering.render_state)
+            max_age: Segundos máximos sin revisar los archivos si no llegan avisos
+            primary_name: Nombre del dispositivo principal si ups_state.json no
+                trae _device (archivos de versiones anteriores)
+        """
+        self.data_dir = data_dir
+        self.formatter = formatter
+        self.max_age = max_age
+        self.primary_name = primary_name
+        self._snapshots = {}
+        self._checked = None
+
+    def invalidate(self):
+        """Fuerza a revisar los archivos en la próxima consulta (aviso 'state')"""
+        self._checked = None
+
+    @staticmethod
+    def _file_key(filename):
+        """Clave de un archivo de estado ('' = principal), o None si no lo es"""
+        if filename == PRIMARY_FILE:
+            return ''
+        if filename.startswith(DEVICE_PREFIX) and filename.endswith('.json'):
+            return filename[len(DEVICE_PREFIX):-len('.json')]
+        return None
+
+    def _load(self, key, path, signature):
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+            checksum = state.pop('_checksum', None)
+            device = state.pop('_device', None) or key or self.primary_name
+            if checksum is not None and checksum != json_checksum(state):
+                raise ValueError("checksum no coincide")
+        except (OSError, ValueError) as e:
+            # Se conserva la instantánea anterior; el monitor escribe de forma atómica
+            logger.warning(f"No se pudo leer {path}: {str(e)}")
+            return self._snapshots.get(key)
+        return StateSnapshot(device, state, self.formatter(state), signature)
+
+    def refresh(self):
+        """Relee los archivos de estado que cambiaron desde la última revisión"""
+        snapshots = {}
+        try:
+            with os.scandir(self.data_dir) as entries:
+                for entry in entries:
+                    key = self._file_key(entry.name)
+                    if key is None:
+                        continue
+                    stat = entry.stat()
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                    current = self._snapshots.get(key)
+                    if current is not None and current.signature == signature:
+                        snapshots[key] = current
+                        continue
+                    snapshot = self._load(key, entry.path, signature)
+                    if snapshot is not None:
+                        snapshots[key] = snapshot
+        except OSError as e:
+            logger.error(f"Error al revisar estados en {self.data_dir}: {str(e)}")
+            return
+        self._snapshots = snapshots
+        self._checked = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._checked is None or time.monotonic() - self._checked >= self.max_age:
+            self.refresh()
+
+    def get(self, device=''):
+        """
+        Args:
+            device: Nombre del dispositivo ('' = principal)
+
+        Returns:
+            StateSnapshot, o None si no hay estado para ese dispositivo
+        """
+        self._ensure_fresh()
+        primary = self._snapshots.get('')
+        if device == '' or (primary is not None and device == primary.device):
+            return primary
+        return self._snapshots.get(device)
+
+    def devices(self):
+        """Nombres de los dispositivos con estado (el principal con su nombre)"""
+        self._ensure_fresh()
+        return sorted(snapshot.device for snapshot in self._snapshots.values())
@@ -0,0 +1,45 @@
+"""
+Configuración común de las pruebas unitarias
+
+Los módulos de cada servicio se importan como en su contenedor (planos, con
+shared/ como paquete): se agregan la raíz y snmp-monitor/ al path, y
+telegram-bot/ al final (config es el del monitor; del bot solo se prueban
+módulos que no lo importan).
+"""
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'snmp-monitor')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+if os.path.join(ROOT, 'telegram-bot') not in sys.path:
+    sys.path.append(os.path.join(ROOT, 'telegram-bot'))
+
+
+class FakeClock:
+    """Reloj manual en segundos (reemplaza time.monotonic en las pruebas)"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Directorio de datos temporal para UPSState y la cola"""
+    from config import MonitorConfig
+    monkeypatch.setattr(MonitorConfig, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(MonitorConfig, 'STATE_FILE', str(tmp_path / 'ups_state.json'))
+    return tmp_path
@@ -0,0 +1,79 @@
+"""
+Intervalo de sondeo adaptativo (snmp-monitor/adaptive.py)
+"""
+import pytest
+import adaptive
+from adaptive import AdaptiveInterval
+
+STABLE = {'status': '3', 'battery_status': '2', 'input_voltage': '230', 'alarms': '0', 'active_alarms': ''}
+
+
+class Device:
+    name = 'ups'
+    interval = 60.0
+
+
+@pytest.fixture
+def device():
+    return Device()
+
+
+@pytest.fixture
+def poll(clock, monkeypatch):
+    monkeypatch.setattr(adaptive, 'time', type('Time', (), {'monotonic': staticmethod(clock)}))
+    return AdaptiveInterval(slow_interval=300, fast_interval=5, stable_polls=3, fast_hold=60)
+
+
+def _settle(poll, device, clock, polls=3):
+    for _ in range(polls):
+        clock.advance(60)
+        poll.observe(device, dict(STABLE))
+
+
+def test_stable_device_slows_down(poll, device, clock):
+    _settle(poll, device, clock, polls=2)
+    assert poll.mode(device) == 'normal'
+    _settle(poll, device, clock, polls=1)
+    assert poll.mode(device) == 'slow'
+    assert poll.interval(device) == 300
+
+
+def test_critical_status_is_fast(poll, device, clock):
+    _settle(poll, device, clock)
+    assert poll.observe(device, dict(STABLE, status='5')) == 'fast'
+    assert poll.interval(device) == 5
+
+
+def test_near_threshold_delta_is_fast(poll, device, clock):
+    _settle(poll, device, clock)
+    assert poll.observe(device, dict(STABLE, input_voltage='227')) == 'fast'  # 3 V ≥ 0.5 × 5 V
+
+
+def test_pending_confirmation_is_fast(poll, device, clock):
+    _settle(poll, device, clock)
+    assert poll.observe(device, dict(STABLE), pending=True) == 'fast'
+
+
+@pytest.mark.parametrize('change', [
+    {'status': '8'}, {'battery_status': '1'}, {'alarms': '1'}, {'active_alarms': 'outputOverload'},
+])
+def test_discrete_change_is_fast(poll, device, clock, change):
+    _settle(poll, device, clock)
+    assert poll.observe(device, dict(STABLE, **change)) == 'fast'
+
+
+def test_fast_is_held_then_normal_before_slow(poll, device, clock):
+    _settle(poll, device, clock)
+    poll.observe(device, dict(STABLE, status='5'))
+    clock.advance(5)
+    poll.observe(device, dict(STABLE))  # vuelve la red: cambio de estado
+    clock.advance(30)
+    assert poll.observe(device, dict(STABLE)) == 'fast'
+    clock.advance(60)
+    assert poll.observe(device, dict(STABLE)) == 'normal'
+
+
+def test_failed_poll_uses_configured_interval(poll, device, clock):
+    _settle(poll, device, clock)
+    assert poll.observe(device, None) == 'normal'
+    assert poll.interval(device) == 60
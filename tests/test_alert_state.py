@@ -0,0 +1,200 @@
+"""
+Transiciones de la máquina de estados de alertas (alert_state.py) y su uso
+desde UPSState.update_state
+"""
+import math
+import pytest
+from alert_state import AlertStateMachine
+from ups_state import UPSState
+
+NAN = math.nan
+VOLTAGE = 0  # columna de las pruebas directas sobre la máquina
+THRESHOLD = 5.0
+
+NORMAL = {
+    'status': '3', 'battery_status': '2', 'battery_capacity': '100',
+    'input_voltage': '230', 'output_voltage': '230', 'temperature': '22',
+    'alarms': '0', 'active_alarms': '',
+}
+
+
+def _observe(machine, value, **kwargs):
+    return machine.observe('input_voltage', VOLTAGE, str(value), float(value), THRESHOLD, **kwargs)
+
+
+@pytest.fixture
+def machine(clock):
+    machine = AlertStateMachine(confirm=2, window=3, hold=120, hysteresis=0.5, clock=clock)
+    assert _observe(machine, 230) is None  # primer valor: solo fija la referencia
+    return machine
+
+
+def test_first_value_sets_baseline_without_alert(machine):
+    assert machine.baselines[VOLTAGE] == '230'
+    assert not machine.pending[VOLTAGE]
+
+
+def test_within_band_never_alerts(machine, clock):
+    for value in (232, 228, 234, 226):
+        clock.advance(60)
+        assert _observe(machine, value) is None
+    assert machine.baselines[VOLTAGE] == '230'
+
+
+def test_off_band_alerts_on_second_of_three_polls(machine, clock):
+    clock.advance(200)
+    assert _observe(machine, 220) is None
+    assert machine.pending[VOLTAGE]
+    clock.advance(60)
+    assert _observe(machine, 221) == '230'  # devuelve la referencia anterior
+    assert machine.baselines[VOLTAGE] == '221'
+    assert not machine.pending[VOLTAGE]
+
+
+def test_isolated_spikes_do_not_confirm(machine, clock):
+    # Fuera, dentro, dentro, fuera: nunca 2 de los últimos 3 sondeos
+    for value in (220, 230, 230, 220, 230, 230):
+        clock.advance(200)
+        assert _observe(machine, value) is None
+
+
+def test_opposite_directions_do_not_confirm_each_other(machine, clock):
+    clock.advance(200)
+    assert _observe(machine, 240) is None
+    clock.advance(60)
+    assert _observe(machine, 220) is None
+
+
+def test_hold_time_delays_next_non_critical_alert(machine, clock):
+    clock.advance(200)
+    _observe(machine, 220)
+    clock.advance(10)
+    assert _observe(machine, 220) == '230'
+
+    # Vuelve a moverse antes de hold: se confirma pero no alerta
+    clock.advance(10)
+    assert _observe(machine, 210) is None
+    clock.advance(10)
+    assert _observe(machine, 210) is None
+    # Cumplido hold, el siguiente sondeo fuera de la banda alerta
+    clock.advance(120)
+    assert _observe(machine, 210) == '220'
+
+
+def test_hysteresis_widens_band_in_opposite_direction(machine, clock):
+    clock.advance(200)
+    _observe(machine, 236)
+    assert _observe(machine, 236) == '230'
+
+    # Volver 5 V (el umbral) no alcanza: en sentido contrario la banda es 7.5 V
+    for _ in range(3):
+        clock.advance(200)
+        assert _observe(machine, 231) is None
+    clock.advance(200)
+    assert _observe(machine, 228) is None
+    clock.advance(60)
+    assert _observe(machine, 228) == '236'
+
+
+def test_discrete_change_skips_confirmation_and_hold(clock):
+    machine = AlertStateMachine(confirm=2, window=3, hold=120, clock=clock)
+    machine.observe('alarms', 2, '0', 0.0, NAN)
+    clock.advance(1)
+    assert machine.observe('alarms', 2, '1', 1.0, NAN) == '0'
+    clock.advance(1)
+    assert machine.observe('alarms', 2, '2', 2.0, NAN) == '1'
+
+
+def test_critical_value_alerts_immediately(clock):
+    machine = AlertStateMachine(confirm=2, window=3, hold=120, clock=clock)
+    machine.observe('status', 1, '3', 3.0, NAN)
+    clock.advance(1)
+    assert machine.observe('status', 1, '5', 5.0, NAN, critical=True) == '3'
+
+
+def test_immediate_skips_confirmation_and_hold(machine, clock):
+    clock.advance(1)
+    assert _observe(machine, 0, immediate=True) == '230'
+
+
+def test_window_is_capped():
+    machine = AlertStateMachine(confirm=40, window=40)
+    assert machine.window == 16
+    assert machine.confirm == 16
+
+
+class TestUPSState:
+    """Las mismas reglas aplicadas por UPSState.update_state, incluido el camino de los traps"""
+
+    @pytest.fixture
+    def state(self, data_dir, clock):
+        state = UPSState('prueba', flush_interval=float('inf'), alerts=AlertStateMachine(
+            confirm=2, window=3, hold=120, hysteresis=0.5, clock=clock,
+        ))
+        assert state.update_state(dict(NORMAL)) == {}
+        return state
+
+    def test_power_fail_alerts_with_input_voltage_in_same_poll(self, state, clock):
+        clock.advance(60)
+        changes = state.update_state(dict(NORMAL, status='5', input_voltage='0'))
+        assert changes == {
+            'status': {'old': '3', 'new': '5'},
+            'input_voltage': {'old': '230', 'new': '0'},
+        }
+        assert state.is_critical(changes)
+
+    def test_recovery_after_trap_alerts_on_first_normal_poll(self, state, clock):
+        # El trap (upsTrapOnBattery) solo trae status: alerta en el acto
+        clock.advance(5)
+        assert state.update_state({'status': '5'}) == {'status': {'old': '3', 'new': '5'}}
+
+        # El sondeo que adelanta el trap confirma el corte: sin alerta nueva
+        clock.advance(1)
+        assert state.update_state(dict(NORMAL, status='5')) == {}
+
+        # Vuelve la red: status no tiene umbral, no espera confirmación ni hold
+        clock.advance(5)
+        changes = state.update_state(dict(NORMAL))
+        assert changes == {'status': {'old': '5', 'new': '3'}}
+        assert not state.is_critical(changes)
+
+    def test_non_critical_status_alerts_immediately(self, state, clock):
+        clock.advance(5)
+        assert state.update_state(dict(NORMAL, status='8')) == {'status': {'old': '3', 'new': '8'}}
+        clock.advance(5)
+        assert state.update_state(dict(NORMAL)) == {'status': {'old': '8', 'new': '3'}}
+
+    def test_new_alarm_alerts_on_first_poll(self, state, clock):
+        clock.advance(300)
+        changes = state.update_state(dict(NORMAL, alarms='1', active_alarms='outputOverload'))
+        assert changes == {
+            'alarms': {'old': '0', 'new': '1'},
+            'active_alarms': {'old': '', 'new': 'outputOverload'},
+        }
+
+    def test_trap_values_skip_confirmation(self, state, clock):
+        state.update_state(dict(NORMAL, battery_runtime='1800'))
+        clock.advance(5)
+        changes = state.update_state({'battery_runtime': '600'}, immediate=True)
+        assert changes == {'battery_runtime': {'old': '1800', 'new': '600'}}
+        clock.advance(1)
+        changes = state.update_state({'active_alarms': 'outputOverload'}, immediate=True)
+        assert changes == {'active_alarms': {'old': '', 'new': 'outputOverload'}}
+
+    def test_slow_drift_accumulates_against_alerted_value(self, state, clock):
+        # Cada paso es menor que el umbral (3 °C), pero se compara contra la referencia
+        alerts = []
+        for step in range(1, 9):
+            clock.advance(200)
+            changes = state.update_state(dict(NORMAL, temperature=str(22 + step)))
+            if changes:
+                alerts.append(changes['temperature'])
+        assert alerts == [{'old': '22', 'new': '26'}, {'old': '26', 'new': '30'}]
+
+    def test_reload_seeds_baselines_from_saved_state(self, state, clock, data_dir):
+        state.flush_interval = 0
+        state._dirty = True
+        state.flush()
+        reloaded = UPSState('prueba', alerts=AlertStateMachine(clock=clock))
+        clock.advance(1)
+        assert reloaded.update_state(dict(NORMAL, status='5')) == {'status': {'old': '3', 'new': '5'}}
@@ -0,0 +1,83 @@
+"""
+Anomalías por z-score y tendencia sobre ventanas de métricas (snmp-monitor/anomaly.py)
+"""
+import numpy as np
+import pytest
+from anomaly import AnomalyDetector
+
+T0 = 1_700_000_000.0
+
+
+def _feed(detector, values, key='input_voltage', device='ups', start=T0, step=60.0, **extra):
+    """Un sondeo por valor; retorna las anomalías de cada uno"""
+    return [
+        detector.observe(device, dict({'status': '3', key: f'{value:.2f}'}, **extra),
+                         timestamp=start + index * step)
+        for index, value in enumerate(values)
+    ]
+
+
+@pytest.fixture
+def baseline():
+    return 230 + np.random.default_rng(0).normal(0, 1.0, 40)
+
+
+def test_noisy_stable_metric_is_quiet(baseline):
+    assert not any(_feed(AnomalyDetector(), baseline))
+
+
+def test_jump_flags_zscore_once_and_rearms(baseline):
+    detector = AnomalyDetector()
+    _feed(detector, baseline)
+    results = _feed(detector, [250, 250, 250], start=T0 + 40 * 60)
+    assert [anomaly.kind for anomaly in results[0]] == ['zscore']
+    assert results[1] == [] and results[2] == []  # sigue activa: no se repite
+    assert results[0][0].score >= detector.z_threshold
+
+    # Vuelve a la normalidad (los saltos salen de la ventana) y se rearma
+    _feed(detector, np.concatenate([baseline, baseline]), start=T0 + 43 * 60)
+    rearmed = _feed(detector, [250], start=T0 + 123 * 60)
+    assert [anomaly.kind for anomaly in rearmed[0]] == ['zscore']
+
+
+def test_slow_drift_is_a_trend_over_sample_times():
+    # +2 °C/h muestreado cada 5 s y luego cada 300 s (sondeo adaptativo)
+    times = [5.0 * n for n in range(20)] + [100 + 300.0 * n for n in range(1, 19)]
+    detector = AnomalyDetector(window=60, min_samples=20)
+    found = []
+    for ts in times:
+        found += detector.observe('ups', {'status': '3', 'temperature': f'{22 + ts / 1800:.3f}'},
+                                  timestamp=T0 + ts)
+    (trend,) = [anomaly for anomaly in found if anomaly.kind == 'trend']
+    assert trend.key == 'temperature'
+    assert trend.change == pytest.approx(trend.seconds / 1800, rel=0.01)
+    assert trend.change >= 3.0  # umbral de cambio de la temperatura
+
+
+def test_on_battery_does_not_feed_the_window(baseline):
+    detector = AnomalyDetector()
+    _feed(detector, baseline)
+    assert detector.observe('ups', {'status': '5', 'input_voltage': '0'}, timestamp=T0 + 3000) == []
+    assert not any(_feed(detector, [230.5], start=T0 + 3060))
+
+
+def test_skip_hides_already_alerted_keys(baseline):
+    detector = AnomalyDetector()
+    _feed(detector, baseline)
+    assert detector.observe('ups', {'status': '3', 'input_voltage': '250'}, skip={'input_voltage'},
+                            timestamp=T0 + 3000) == []
+
+
+def test_devices_have_separate_windows(baseline):
+    detector = AnomalyDetector()
+    _feed(detector, baseline, device='ups1')
+    _feed(detector, baseline + 20, device='ups2')
+    assert not any(_feed(detector, [250], device='ups2', start=T0 + 3000))
+    assert _feed(detector, [250], device='ups1', start=T0 + 3000)[0]
+
+
+def test_format_message_describes_both_kinds(baseline):
+    detector = AnomalyDetector()
+    _feed(detector, baseline)
+    (anomaly,) = _feed(detector, [250], start=T0 + 3000)[0]
+    assert 'input_voltage' in AnomalyDetector.format_message([anomaly])
@@ -0,0 +1,195 @@
+"""
+Ventanas de agrupación de alertas y errores (snmp-monitor/coalescer.py)
+"""
+import pytest
+import coalescer
+from coalescer import AlertCoalescer
+
+WINDOW = 60
+
+
+class Recorder:
+    """Callbacks del coalescer que guardan lo emitido"""
+
+    def __init__(self):
+        self.changes = []
+        self.errors = []
+        self.recovered = []
+
+    def on_changes(self, device, changes, critical):
+        self.changes.append((device, changes, critical))
+
+    def on_error(self, device, message, repeats):
+        self.errors.append((device, message, repeats))
+
+    def on_recovered(self, device, repeats):
+        self.recovered.append((device, repeats))
+
+
+@pytest.fixture
+def emitted():
+    return Recorder()
+
+
+@pytest.fixture
+def make(emitted, clock, monkeypatch):
+    monkeypatch.setattr(coalescer, 'time', type('Time', (), {'monotonic': staticmethod(clock)}))
+
+    def make(**kwargs):
+        return AlertCoalescer(emitted.on_changes, emitted.on_error, WINDOW,
+                              on_recovered=emitted.on_recovered, **kwargs)
+    return make
+
+
+def _change(old, new):
+    return {'old': old, 'new': new}
+
+
+def test_first_change_is_immediate_then_merged_at_deadline(make, emitted, clock):
+    alerts = make()
+    alerts.add_changes('ups', {'input_voltage': _change('230', '220')})
+    assert emitted.changes == [('ups', {'input_voltage': {'old': '230', 'new': '220', 'count': 1}}, False)]
+
+    clock.advance(10)
+    alerts.add_changes('ups', {'input_voltage': _change('220', '210')})
+    clock.advance(10)
+    alerts.add_changes('ups', {'input_voltage': _change('210', '200')})
+    alerts.flush_due()
+    assert len(emitted.changes) == 1  # la ventana no venció
+
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert emitted.changes[1] == ('ups', {'input_voltage': {'old': '220', 'new': '200', 'count': 2}}, False)
+
+
+def test_net_zero_merge_is_not_emitted(make, emitted, clock):
+    alerts = make()
+    alerts.add_changes('ups', {'status': _change('3', '5')})
+    alerts.add_changes('ups', {'input_voltage': _change('230', '220')})
+    alerts.add_changes('ups', {'input_voltage': _change('220', '230')})
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert len(emitted.changes) == 1
+
+
+def test_empty_window_expires_and_next_change_is_immediate(make, emitted, clock):
+    alerts = make()
+    alerts.add_changes('ups', {'status': _change('3', '5')})
+    clock.advance(WINDOW)
+    alerts.flush_due()  # sin eventos nuevos: se descarta la ventana
+    clock.advance(1)
+    alerts.add_changes('ups', {'status': _change('5', '3')})
+    assert [changes for _, changes, _ in emitted.changes] == [
+        {'status': {'old': '3', 'new': '5', 'count': 1}},
+        {'status': {'old': '5', 'new': '3', 'count': 1}},
+    ]
+
+
+def test_windows_are_per_device(make, emitted):
+    alerts = make()
+    alerts.add_changes('ups', {'status': _change('3', '5')})
+    alerts.add_changes('ups2', {'status': _change('3', '5')})
+    assert [device for device, _, _ in emitted.changes] == ['ups', 'ups2']
+
+
+def test_critical_change_bypasses_window_with_accumulated(make, emitted, clock):
+    alerts = make()
+    alerts.add_changes('ups', {'input_voltage': _change('230', '220')})
+    clock.advance(5)
+    alerts.add_changes('ups', {'temperature': _change('22', '26')})
+    alerts.add_changes('ups', {'status': _change('3', '5')}, critical=True)
+    assert emitted.changes[1] == ('ups', {
+        'temperature': {'old': '22', 'new': '26', 'count': 1},
+        'status': {'old': '3', 'new': '5', 'count': 1},
+    }, True)
+
+
+def test_repeated_errors_are_counted(make, emitted, clock):
+    alerts = make()
+    for _ in range(4):
+        alerts.add_error('ups', 'timeout')
+        clock.advance(5)
+    assert emitted.errors == [('ups', 'timeout', 0)]
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert emitted.errors[1] == ('ups', 'timeout', 3)
+
+    alerts.add_error('ups', 'timeout')
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert emitted.errors[2] == ('ups', 'timeout', 1)
+
+
+def test_recover_drops_pending_errors_and_reports(make, emitted, clock):
+    alerts = make()
+    alerts.add_error('ups', 'timeout')
+    alerts.add_error('ups', 'timeout')
+    alerts.add_error('ups', 'timeout')
+    alerts.recover('ups')
+    assert emitted.recovered == [('ups', 2)]
+
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert emitted.errors == [('ups', 'timeout', 0)]  # nada tardío
+
+    alerts.recover('ups')  # sin error avisado: no se repite la recuperación
+    assert emitted.recovered == [('ups', 2)]
+
+
+def test_recover_without_errors_is_silent(make, emitted):
+    make().recover('ups')
+    assert emitted.recovered == []
+
+
+def test_full_backlog_defers_until_drained(make, emitted, clock):
+    backlog = [10]
+    alerts = make(max_backlog=5, backlog_fn=lambda: backlog[0])
+    alerts.add_changes('ups', {'input_voltage': _change('230', '220')})
+    alerts.add_error('ups', 'timeout')
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert emitted.changes == [] and emitted.errors == []
+
+    alerts.add_changes('ups', {'input_voltage': _change('220', '210')})
+    backlog[0] = 0
+    clock.advance(WINDOW)
+    alerts.flush_due()
+    assert emitted.changes == [('ups', {'input_voltage': {'old': '230', 'new': '210', 'count': 2}}, False)]
+    assert emitted.errors == [('ups', 'timeout', 0)]
+
+
+def test_full_backlog_does_not_hold_critical(make, emitted):
+    alerts = make(max_backlog=5, backlog_fn=lambda: 10)
+    alerts.add_changes('ups', {'status': _change('3', '5')}, critical=True)
+    assert len(emitted.changes) == 1
+
+
+def test_flush_all_emits_everything_pending(make, emitted, clock):
+    alerts = make()
+    alerts.add_changes('ups', {'status': _change('3', '5')})
+    alerts.add_changes('ups', {'input_voltage': _change('230', '0')})
+    alerts.add_error('ups2', 'timeout')
+    alerts.add_error('ups2', 'timeout')
+    alerts.flush_all()
+    assert emitted.changes[-1][1] == {'input_voltage': {'old': '230', 'new': '0', 'count': 1}}
+    assert emitted.errors == [('ups2', 'timeout', 0), ('ups2', 'timeout', 1)]
+
+
+def test_zero_window_disables_grouping(emitted):
+    alerts = AlertCoalescer(emitted.on_changes, emitted.on_error, 0, on_recovered=emitted.on_recovered)
+    alerts.add_changes('ups', {'status': _change('3', '5')})
+    alerts.add_changes('ups', {'status': _change('5', '3')})
+    alerts.add_error('ups', 'timeout')
+    alerts.add_error('ups', 'timeout')
+    assert len(emitted.changes) == 2
+    assert emitted.errors == [('ups', 'timeout', 0), ('ups', 'timeout', 0)]
+
+
+def test_critical_round_trip_within_window_is_emitted(make, emitted, clock):
+    alerts = make()
+    alerts.add_changes('ups', {'status': _change('3', '5')}, critical=True)
+    clock.advance(5)
+    alerts.add_changes('ups', {'status': _change('5', '3')})
+    clock.advance(5)
+    alerts.add_changes('ups', {'status': _change('3', '5')}, critical=True)
+    assert emitted.changes[1] == ('ups', {'status': {'old': '5', 'new': '5', 'count': 2}}, True)
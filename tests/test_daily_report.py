@@ -0,0 +1,96 @@
+"""
+Reporte diario multi-dispositivo empaquetado en pocos mensajes (snmp-monitor/daily_report.py)
+"""
+import time
+from datetime import datetime
+import pytest
+from daily_report import DailyReport, increments, merge_phases, pack, time_at, utf16_len
+from devices import Device
+from shared.history import HistoryStore
+
+HEADER = '📅 *Reporte Diario*'
+
+
+def test_utf16_len_counts_emoji_as_two():
+    assert utf16_len('abc') == 3
+    assert utf16_len('🔋') == 2
+
+
+def test_single_message_when_everything_fits():
+    assert pack(['a', 'b'], HEADER) == [f'{HEADER}\n\na\n\nb']
+    assert pack([], HEADER) == [f'{HEADER}\n\n']
+
+
+def test_blocks_fill_messages_in_order_within_limit():
+    blocks = [f'{n}' * 30 for n in range(10)]
+    messages = pack(blocks, HEADER, limit=120)
+    assert all(utf16_len(message) <= 120 for message in messages)
+    assert messages[0].startswith(f'{HEADER} (1/{len(messages)})')
+    joined = ''.join(message.split('\n\n', 1)[1] for message in messages).replace('\n', '')
+    assert joined == ''.join(blocks)
+    # Llenar antes de pasar al siguiente: dos bloques por mensaje
+    assert len(messages) == 5
+
+
+def test_emoji_count_against_the_limit():
+    blocks = ['🔋' * 40, '🔋' * 40]  # 80 unidades UTF-16 cada uno
+    assert len(pack(blocks, HEADER, limit=150)) == 2
+
+
+def test_oversized_block_is_split_by_lines():
+    block = '\n'.join(f'línea {n:02d}' for n in range(40))
+    messages = pack([block], HEADER, limit=100)
+    assert len(messages) > 1
+    assert all(utf16_len(message) <= 100 for message in messages)
+    lines = [line for message in messages for line in message.split('\n\n', 1)[1].split('\n')]
+    assert lines == block.split('\n')
+
+
+def test_merge_phases():
+    summaries = {
+        'input_voltage': (228.0, 230.0, 232.0, 10),
+        'input_voltage_l2': (220.0, 226.0, 235.0, 30),
+        'output_voltage': (230.0, 230.0, 230.0, 5),
+    }
+    assert merge_phases(summaries, 'input_voltage') == (220.0, 227.0, 235.0, 40)
+    assert merge_phases(summaries, 'temperature') is None
+
+
+def test_time_at_caps_gaps():
+    points = [(0, 3.0), (100, 5.0), (160, 3.0), (1000, 5.0), (5000, 3.0)]
+    seconds, entries = time_at(points, 5.0, until=6000, max_gap=900)
+    assert entries == 2
+    assert seconds == pytest.approx(60 + 900)  # el hueco de 4000 s no cuenta completo
+
+
+def test_increments_only_sum_new_alarms():
+    assert increments([(0, 0.0), (1, 2.0), (2, 1.0), (3, 3.0)]) == 4
+
+
+def test_is_fresh():
+    report = DailyReport(max_age=900)
+    now = time.time()
+    assert report.is_fresh({'last_update': datetime.fromtimestamp(now - 60).isoformat()}, now)
+    assert not report.is_fresh({'last_update': datetime.fromtimestamp(now - 3600).isoformat()}, now)
+    assert not report.is_fresh({}, now)
+
+
+def test_build_with_history(tmp_path):
+    until = time.time()
+    history = HistoryStore(str(tmp_path / 'history.db'))
+    for minute, (status, voltage) in enumerate([('3', 230), ('5', 0), ('5', 0), ('3', 228)]):
+        history.record('ups1', {'status': status, 'input_voltage': str(voltage)},
+                       until - 3600 + minute * 60)
+    history.flush()
+
+    devices = [Device('ups1', '10.0.0.1', oids={}, tables=[], label='UPS Sala 1'),
+               Device('ups2', '10.0.0.2', oids={}, tables=[], label='UPS Sala 2')]
+    entries = [(devices[0], {'status': '3', 'last_update': ''}, True), (devices[1], {}, False)]
+    (message,) = DailyReport(history, max_age=900).build(entries, until)
+    history.close()
+
+    assert message.startswith(HEADER)
+    assert '🏷️ *UPS Sala 1*' in message and '🏷️ *UPS Sala 2*' in message
+    assert '• Entrada: 0 / 114.5 / 230 V' in message
+    assert '• En batería: 2 min (1 corte)' in message
+    assert '❌ Sin datos del dispositivo' in message
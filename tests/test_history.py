@@ -0,0 +1,74 @@
+"""
+Histórico de sondeos en SQLite con rollups incrementales (shared/history.py)
+"""
+import time
+import pytest
+from shared.history import HistoryStore, parse_numeric
+
+# Minuto 2 de una hora reciente (dentro de la retención)
+T0 = float((int(time.time()) // 3600 - 2) * 3600 + 120)
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), batch_size=1000, flush_interval=3600)
+    yield store
+    store.close()
+
+
+def test_parse_numeric():
+    assert parse_numeric('50.0 Hz') == 50.0
+    assert parse_numeric('onLine') is None
+    assert parse_numeric(None) is None
+
+
+def test_only_numeric_values_are_buffered_until_flush(history):
+    history.record('ups', {'input_voltage': '230', 'active_alarms': 'onBattery'}, T0)
+    assert history.points('ups', 'input_voltage', 0, T0 + 1) == []
+    history.flush()
+    assert history.points('ups', 'input_voltage', 0, T0 + 1) == [(T0, 230.0)]
+    assert history.points('ups', 'active_alarms', 0, T0 + 1) == []
+
+
+def test_batch_size_forces_a_flush(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), batch_size=2, flush_interval=3600)
+    store.record('ups', {'a': '1'}, T0)
+    store.record('ups', {'a': '2'}, T0 + 1)
+    assert len(store.points('ups', 'a', 0, T0 + 2)) == 2
+    store.close()
+
+
+def test_rollups_merge_across_batches(history):
+    for offset, value in ((0, 220), (10, 240)):
+        history.record('ups', {'input_voltage': str(value)}, T0 + offset)
+    history.flush()
+    history.record('ups', {'input_voltage': '230'}, T0 + 20)
+    history.record('ups', {'input_voltage': '200'}, T0 + 70)  # minuto siguiente
+    history.flush()
+
+    assert history.series('ups', 'input_voltage', T0, T0 + 120) == [
+        (T0, 220.0, 230.0, 240.0),
+        (T0 + 60, 200.0, 200.0, 200.0),
+    ]
+    assert history.summary('ups', 'input_voltage', T0, T0 + 120) == (200.0, 222.5, 240.0, 4)
+    assert history.summaries('ups', T0, T0 + 120, table='rollup_1h') == {}  # el bucket de la hora empieza antes de T0
+    assert history.devices() == ['ups']
+
+
+def test_value_at_falls_back_to_rollup_after_pruning(history):
+    history.record('ups', {'temperature': '22'}, T0)
+    history.record('ups', {'temperature': '25'}, T0 + 30)
+    history.flush()
+    assert history.value_at('ups', 'temperature', T0 + 40) == (T0 + 30, 25.0)
+
+    history._connect().execute('DELETE FROM samples')
+    assert history.value_at('ups', 'temperature', T0 + 40) == (T0, 25.0)
+    assert history.value_at('ups', 'temperature', T0 - 3600) is None
+
+
+def test_readonly_reader_sees_writer_data(history, tmp_path):
+    history.record('ups', {'output_load': '40'}, T0)
+    history.flush()
+    reader = HistoryStore(history.path, readonly=True)
+    assert reader.summary('ups', 'output_load', T0, T0 + 60) == (40.0, 40.0, 40.0, 1)
+    reader.close()
@@ -0,0 +1,119 @@
+"""
+/status live: sondeo compartido (snmp-monitor/live.py) y canal de control (shared/control.py)
+"""
+import asyncio
+import pytest
+from live import LivePoller
+from shared import control
+from shared.control import ControlError, ControlServer
+
+
+def test_concurrent_requests_share_one_poll():
+    async def main():
+        async def poll(device_name):
+            await asyncio.sleep(0.05)
+            return {'device': device_name}
+
+        live = LivePoller(poll, window=0)
+        results = await asyncio.gather(*[live.get('ups') for _ in range(10)], live.get('ups2'))
+        return live, results
+
+    live, results = asyncio.run(main())
+    assert live.requests == 11
+    assert live.polls == 2
+    assert results == [{'device': 'ups'}] * 10 + [{'device': 'ups2'}]
+
+
+def test_result_is_reused_within_window_only():
+    async def main():
+        async def poll(device_name):
+            return live.polls
+
+        live = LivePoller(poll, window=0.05)
+        first = await live.get('ups')
+        reused = await live.get('ups')
+        await asyncio.sleep(0.1)
+        fresh = await live.get('ups')
+        return first, reused, fresh
+
+    assert asyncio.run(main()) == (1, 1, 2)
+
+
+def test_cancelled_requester_does_not_cancel_shared_poll():
+    async def main():
+        async def poll(device_name):
+            await asyncio.sleep(0.05)
+            return 'ok'
+
+        live = LivePoller(poll)
+        impatient = asyncio.ensure_future(live.get('ups'))
+        patient = asyncio.ensure_future(live.get('ups'))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient, live.polls
+
+    assert asyncio.run(main()) == ('ok', 1)
+
+
+def test_failed_poll_is_not_cached():
+    async def main():
+        async def poll(device_name):
+            if live.polls == 1:
+                raise OSError('timeout')
+            return 'ok'
+
+        live = LivePoller(poll)
+        with pytest.raises(OSError):
+            await live.get('ups')
+        return await live.get('ups')
+
+    assert asyncio.run(main()) == 'ok'
+
+
+def _serve(tmp_path, handlers, *payloads, timeout=1.0):
+    path = str(tmp_path / 'control.sock')
+
+    async def main():
+        server = ControlServer(path, handlers, timeout=timeout)
+        assert await server.start()
+        results = []
+        try:
+            for payload in payloads:
+                try:
+                    results.append(await control.request(path, payload, 1))
+                except ControlError as e:
+                    results.append(e)
+        finally:
+            await server.close()
+        return results
+
+    return asyncio.run(main())
+
+
+def test_control_request_round_trip(tmp_path):
+    async def status(request):
+        if request.get('device') == 'nada':
+            raise ValueError('Dispositivo desconocido: nada')
+        return {'message': f"estado de {request.get('device')}"}
+
+    ok, unknown_device, unknown_cmd = _serve(
+        tmp_path, {'status': status},
+        {'cmd': 'status', 'device': 'ups2'}, {'cmd': 'status', 'device': 'nada'}, {'cmd': 'otro'},
+    )
+    assert ok == {'message': 'estado de ups2', 'ok': True}
+    assert str(unknown_device) == 'Dispositivo desconocido: nada'
+    assert str(unknown_cmd) == 'Comando desconocido: otro'
+
+
+def test_control_handler_timeout(tmp_path):
+    async def slow(request):
+        await asyncio.sleep(1)
+        return {}
+
+    (error,) = _serve(tmp_path, {'status': slow}, {'cmd': 'status'}, timeout=0.05)
+    assert str(error) == 'Tiempo de espera agotado'
+
+
+def test_control_without_server_raises(tmp_path):
+    with pytest.raises(ControlError):
+        asyncio.run(control.request(str(tmp_path / 'control.sock'), {'cmd': 'status'}, 1))
@@ -0,0 +1,67 @@
+"""
+Avisos por socket Unix de datagramas entre monitor y bot (shared/notify.py)
+"""
+import asyncio
+from shared.notify import NotificationListener, Notifier
+
+
+def test_notify_without_listener_is_silent(tmp_path):
+    notifier = Notifier(str(tmp_path / 'notify.sock'))
+    notifier.notify('queue')
+    notifier.close()
+
+
+def test_listener_receives_and_deduplicates(tmp_path):
+    path = str(tmp_path / 'notify.sock')
+
+    async def main():
+        listener = NotificationListener(path)
+        assert await listener.start()
+        notifier = Notifier(path)
+        for event in ('queue', 'queue', 'state'):
+            notifier.notify(event)
+        await asyncio.sleep(0.05)
+        events = await listener.wait(1)
+        empty = await listener.wait(0.01)
+        notifier.close()
+        listener.close()
+        return events, empty
+
+    events, empty = asyncio.run(main())
+    assert events == {'queue', 'state'}
+    assert empty == set()
+
+
+def test_wait_wakes_up_on_notification(tmp_path):
+    path = str(tmp_path / 'notify.sock')
+
+    async def main():
+        listener = NotificationListener(path)
+        await listener.start()
+        notifier = Notifier(path)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, notifier.notify, 'queue')
+        started = loop.time()
+        events = await listener.wait(10)
+        elapsed = loop.time() - started
+        notifier.close()
+        listener.close()
+        return events, elapsed
+
+    events, elapsed = asyncio.run(main())
+    assert events == {'queue'}
+    assert elapsed < 1
+
+
+def test_orphan_socket_is_replaced(tmp_path):
+    path = tmp_path / 'notify.sock'
+    path.write_text('')
+
+    async def main():
+        listener = NotificationListener(str(path))
+        started = await listener.start()
+        listener.close()
+        return started
+
+    assert asyncio.run(main())
+    assert not path.exists()
@@ -0,0 +1,106 @@
+"""
+Sondeo concurrente de varios dispositivos (snmp-monitor/poller.py)
+"""
+import asyncio
+import pytest
+import poller
+from devices import Device
+from poller import DevicePoller
+
+
+class FakeEngine:
+    def close_dispatcher(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_engine(monkeypatch):
+    monkeypatch.setattr(poller, 'SnmpEngine', FakeEngine)
+
+
+def _devices(count, interval=60.0, **kwargs):
+    return [Device(f'ups{n}', f'10.0.0.{n}', oids={}, tables=[], interval=interval, **kwargs)
+            for n in range(count)]
+
+
+def _run_for(device_poller, seconds, during=None):
+    async def main():
+        task = asyncio.ensure_future(device_poller.run())
+        if during:
+            await during()
+        await asyncio.sleep(seconds)
+        device_poller.stop()
+        await task
+    asyncio.run(main())
+
+
+def test_devices_with_same_credentials_share_engine():
+    devices = _devices(3, user='a') + [Device('pdu', '10.0.1.1', user='b', oids={}, tables=[])]
+
+    async def main():
+        device_poller = DevicePoller(devices, None, concurrency=4)
+        device_poller.setup()
+        engines = {name: client._engine for name, client in device_poller.clients.items()}
+        assert engines['ups0'] is engines['ups1'] is engines['ups2']
+        assert engines['pdu'] is not engines['ups0']
+        await device_poller.close()
+    asyncio.run(main())
+
+
+def test_first_round_is_immediate_and_bounded_by_concurrency():
+    active = []
+    peak = []
+    polled = []
+
+    async def check(device, client):
+        active.append(device)
+        peak.append(len(active))
+        await asyncio.sleep(0.02)
+        active.remove(device)
+        polled.append(device.name)
+
+    device_poller = DevicePoller(_devices(5), check, concurrency=2)
+    _run_for(device_poller, 0.2)
+    assert sorted(polled) == [f'ups{n}' for n in range(5)]  # sin esperar el intervalo de 60 s
+    assert max(peak) == 2
+
+
+def test_failing_check_does_not_stop_the_loop():
+    calls = []
+
+    async def check(device, client):
+        calls.append(device.name)
+        raise RuntimeError('timeout')
+
+    device_poller = DevicePoller(_devices(1, interval=0.05), check, concurrency=1)
+    _run_for(device_poller, 0.3)
+    assert len(calls) >= 3
+
+
+def test_wake_polls_at_once():
+    calls = []
+
+    async def check(device, client):
+        calls.append(device.name)
+
+    devices = _devices(1)
+    device_poller = DevicePoller(devices, check, concurrency=1)
+
+    async def wake():
+        await asyncio.sleep(0.05)
+        assert calls == ['ups0']
+        device_poller.wake(devices[0])
+
+    _run_for(device_poller, 0.05, wake)
+    assert calls == ['ups0', 'ups0']
+
+
+def test_interval_fn_sets_next_poll():
+    calls = []
+
+    async def check(device, client):
+        calls.append(device.name)
+
+    device_poller = DevicePoller(_devices(1), check, concurrency=1, interval_fn=lambda device: 0.05)
+    _run_for(device_poller, 0.33)
+    assert 5 <= len(calls) <= 8
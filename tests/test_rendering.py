@@ -0,0 +1,69 @@
+"""
+Mensaje de estado compartido por monitor y bot (shared/rendering.py)
+"""
+from shared.rendering import StateRenderer, format_runtime, format_timestamp, phases
+
+STATE = {
+    'status': '3', 'battery_status': '2', 'battery_capacity': '100', 'battery_runtime': '7747',
+    'input_voltage': '229', 'input_voltage_l2': '230', 'input_voltage_l3': '231',
+    'input_frequency': '50.0', 'output_voltage': '230', 'output_load': '31',
+    'output_power': '12500', 'temperature': '22', 'alarms': '0',
+    'last_update': '2026-10-18T09:00:05.123456',
+}
+
+
+def test_phases_join_table_rows():
+    assert phases(STATE, 'input_voltage') == '229 / 230 / 231'
+    assert phases(STATE, 'output_voltage') == '230'
+    assert phases(STATE, 'bypass_voltage') is None
+
+
+def test_format_runtime():
+    assert format_runtime('7747') == '2h 9min'
+    assert format_runtime('7680 s') == '2h 8min'
+    assert format_runtime(540) == '9 min'
+    assert format_runtime(None) == 'N/A'
+    assert format_runtime('desconocido') == 'desconocido'
+
+
+def test_format_timestamp():
+    assert format_timestamp('2026-10-18T09:00:05.123456') == '2026-10-18 09:00:05'
+    assert format_timestamp('ayer') == 'ayer'
+
+
+def test_render_full_state():
+    message = StateRenderer().render(STATE)
+    assert '🟢 *Estado General:* Online' in message
+    assert '• Voltaje: 229 / 230 / 231 V' in message
+    assert '• Frecuencia: 50.0 Hz' in message
+    assert '• Potencia: 12.5 kW' in message
+    assert 'Alarmas Activas' not in message  # alarms = 0
+    assert 'Bypass' not in message
+    assert message.endswith('🕐 *Última actualización:* 2026-10-18 09:00:05')
+
+
+def test_render_critical_and_missing_values():
+    message = StateRenderer().render({'status': '5', 'battery_status': '3', 'active_alarms': 'onBattery'})
+    assert '🔴 *Estado General:* On Battery' in message
+    assert '🔴 *Batería:* Battery Low' in message
+    assert '• Carga: N/A%' in message
+    assert '🚨 *Alarmas UPS:* onBattery' in message
+
+
+def test_body_is_cached_without_last_update():
+    renderer = StateRenderer()
+    first = renderer.render(STATE)
+    second = renderer.render(dict(STATE, last_update='2026-10-18T09:01:05'))
+    assert (renderer.hits, renderer.misses) == (1, 1)
+    assert first.rsplit('\n', 1)[0] == second.rsplit('\n', 1)[0]
+    assert second.endswith('09:01:05')
+
+    renderer.render(dict(STATE, temperature='23'))
+    assert renderer.misses == 2
+
+
+def test_cache_is_bounded():
+    renderer = StateRenderer(cache_size=2)
+    for temperature in range(5):
+        renderer.render(dict(STATE, temperature=str(temperature)))
+    assert len(renderer._cache) == 2
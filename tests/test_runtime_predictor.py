@@ -0,0 +1,71 @@
+"""
+Predicción de autonomía en batería (snmp-monitor/runtime_predictor.py)
+"""
+import pytest
+from runtime_predictor import RuntimePredictor
+
+
+def _discharge(predictor, capacities, load=50, start=0.0, step=60.0, device='ups'):
+    """Un sondeo por capacidad, cada step segundos; retorna las estimaciones"""
+    return [
+        predictor.observe(device, {'status': '5', 'battery_capacity': str(capacity),
+                                   'output_load': str(load)}, now=start + index * step)
+        for index, capacity in enumerate(capacities)
+    ]
+
+
+def test_not_on_battery_gives_no_estimate():
+    predictor = RuntimePredictor()
+    assert predictor.observe('ups', {'status': '3', 'battery_capacity': '100'}, now=0) is None
+
+
+def test_needs_min_samples_and_falling_capacity():
+    predictor = RuntimePredictor(min_samples=3)
+    assert _discharge(predictor, [100, 99]) == [None, None]
+    assert _discharge(RuntimePredictor(), [100, 100, 100]) == [None, None, None]
+
+
+def test_constant_discharge_estimate():
+    # 1 % por minuto al 50 % de carga
+    predictor = RuntimePredictor(shutdown_capacity=10)
+    estimate = _discharge(predictor, [100, 99, 98, 97, 96])[-1]
+    assert estimate.capacity == pytest.approx(96)
+    assert estimate.shutdown_seconds == pytest.approx(86 * 60)
+    assert estimate.depletion_seconds == pytest.approx(96 * 60)
+
+
+def test_estimate_follows_load_change():
+    predictor = RuntimePredictor(shutdown_capacity=10)
+    _discharge(predictor, [100, 99, 98, 97, 96])
+    # La carga se duplica (tramo de carga media 75 %: 1.5 % en el minuto) y
+    # la misma pendiente por energía da 2 % por minuto desde ahora
+    estimate = predictor.observe('ups', {'status': '5', 'battery_capacity': '94.5', 'output_load': '100'},
+                                 now=300)
+    assert estimate.shutdown_seconds == pytest.approx(84.5 * 30)
+
+
+def test_phase_loads_are_averaged():
+    assert RuntimePredictor._load({'output_load': '40', 'output_load_l2': '60'}) == 50
+    assert RuntimePredictor._load({}) == 100
+
+
+def test_each_mark_alerts_once_and_resets_with_new_discharge():
+    predictor = RuntimePredictor(shutdown_capacity=10, alert_minutes=(15, 10, 5))
+    capacities = list(range(40, 10, -1))  # de 30 a 1 min hasta el apagado
+    marks = [estimate.alert_minutes for estimate in _discharge(predictor, capacities) if estimate]
+    assert [mark for mark in marks if mark] == [15, 10, 5]
+
+    predictor.observe('ups', {'status': '3'}, now=10_000)  # vuelve la red
+    again = _discharge(predictor, [18, 17, 16, 15], start=20_000)
+    assert again[-1].alert_minutes == 5  # cruzadas todas juntas: un solo aviso
+
+
+def test_format_alert_includes_reported_runtime():
+    predictor = RuntimePredictor(shutdown_capacity=10)
+    estimate = predictor.observe('ups', {'status': '5', 'battery_capacity': '100'}, now=0)
+    assert estimate is None
+    estimate = _discharge(predictor, [99, 98, 97], start=60)[-1]
+    estimate.reported_runtime = 5400
+    message = predictor.format_alert(estimate)
+    assert '1h 30min' in message
+    assert 'hasta el apagado (10%)' in message
@@ -0,0 +1,103 @@
+"""
+Envío con límite de tasa, prioridades y reintentos (telegram-bot/sender.py)
+"""
+import asyncio
+from telegram.error import BadRequest
+from sender import MessageSender, message_priority
+from shared.message_queue import QueueRecord
+
+CHAT = 1
+
+
+def _record(offset, message, **data):
+    return QueueRecord(offset, offset + 1, 1, dict(data, message=message))
+
+
+def _run(scenario):
+    """Ejecuta scenario(sender, sent) con un sender de un chat sin límites efectivos"""
+    sent = []
+
+    async def send(message, chat_id):
+        sent.append(message)
+
+    async def main():
+        sender = MessageSender(send, [CHAT], per_chat_rate=1000, group_rate=1000, global_rate=1000,
+                               max_backoff=0.2)
+        sender.start()
+        try:
+            await scenario(sender, sent)
+        finally:
+            await sender.stop()
+    asyncio.run(main())
+    return sent
+
+
+def test_priority_from_explicit_priority_or_type():
+    assert message_priority({'type': 'alert', 'priority': 'critical'}) == 0
+    assert message_priority({'type': 'daily_report'}) == 3
+    assert message_priority({'type': 'desconocido'}) == 2
+
+
+def test_higher_priority_is_sent_first():
+    async def scenario(sender, sent):
+        done = []
+        sender.submit(_record(0, 'reporte', type='daily_report'), lambda r, f: done.append(r))
+        sender.submit(_record(1, 'corte', type='alert', priority='critical'), lambda r, f: done.append(r))
+        while len(done) < 2:
+            await asyncio.sleep(0.01)
+    assert _run(scenario) == ['corte', 'reporte']
+
+
+def test_retried_record_does_not_hold_back_new_alerts():
+    async def scenario(sender, sent):
+        done = []
+        sender.submit(_record(0, 'reintento', type='error', attempts=3), lambda r, f: done.append(r))
+        assert sender.backlog() == 1  # en espera fuera de la cola del chat
+        sender.submit(_record(1, 'corte', type='alert', priority='critical'), lambda r, f: done.append(r))
+        while len(done) < 1:
+            await asyncio.sleep(0.01)
+        assert sent == ['corte']
+        while len(done) < 2:
+            await asyncio.sleep(0.01)
+    assert _run(scenario) == ['corte', 'reintento']
+
+
+def test_permanent_error_is_done_without_failed_chats():
+    results = []
+
+    async def send(message, chat_id):
+        raise BadRequest("Can't parse entities")
+
+    async def main():
+        sender = MessageSender(send, [CHAT], 1000, 1000, 1000)
+        sender.start()
+        sender.submit(_record(0, '*roto'), lambda record, failed: results.append(failed))
+        while not results:
+            await asyncio.sleep(0.01)
+        await sender.stop()
+    asyncio.run(main())
+    assert results == [[]]
+
+
+def test_transient_error_reports_failed_chat():
+    results = []
+
+    async def send(message, chat_id):
+        raise OSError('red caída')
+
+    async def main():
+        sender = MessageSender(send, [CHAT, -2], 1000, 1000, 1000)
+        sender.start()
+        sender.submit(_record(0, 'hola'), lambda record, failed: results.append(sorted(failed)))
+        while not results:
+            await asyncio.sleep(0.01)
+        await sender.stop()
+    asyncio.run(main())
+    assert results == [[-2, CHAT]]
+
+
+def test_stop_cancels_pending_retries():
+    async def scenario(sender, sent):
+        sender.submit(_record(0, 'reintento', attempts=10), lambda r, f: None)
+        assert sender.backlog() == 1
+    assert _run(scenario) == []
@@ -0,0 +1,203 @@
+"""
+Consultas del cliente SNMP contra un agente simulado en memoria (snmp-monitor/snmp_client.py)
+
+get_cmd / bulk_cmd se reemplazan por el agente; ObjectType, ObjectIdentity y
+ObjectName por la identidad, así el agente recibe los OIDs tal cual.
+"""
+import asyncio
+import pytest
+import snmp_client
+from pysnmp.proto.rfc1902 import Integer, ObjectName
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchObject
+from config import SNMPConfig
+from devices import Device
+from snmp_client import SNMPClient
+
+
+class Status:
+    """error-status de una respuesta SNMP"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def prettyPrint(self):
+        return self.name
+
+
+class FakeAgent:
+    """Agente SNMP en memoria: OID (string) -> valor para GET, tabla OID (tupla) -> valor para GETBULK"""
+
+    def __init__(self, values, rejected=(), max_varbinds=None):
+        self.values = values
+        self.rejected = set(rejected)
+        self.max_varbinds = max_varbinds
+        self.gets = []
+        self.table = {}
+        self.bulks = []
+
+    async def get_cmd(self, engine, auth, transport, context, *oids):
+        self.gets.append(list(oids))
+        if self.max_varbinds and len(oids) > self.max_varbinds:
+            return None, Status('tooBig'), 0, []
+        if self.rejected.intersection(oids):
+            return None, Status('genErr'), 1, []
+        return None, 0, 0, [(oid, self.values.get(oid, NoSuchObject(''))) for oid in oids]
+
+    async def bulk_cmd(self, engine, auth, transport, context, non_repeaters, repetitions, *oids,
+                       lookupMib=True):
+        self.bulks.append((repetitions, list(oids)))
+        if self.max_varbinds and repetitions * len(oids) > self.max_varbinds:
+            return None, Status('tooBig'), 0, []
+        ordered = sorted(self.table)
+        cursors = list(oids)
+        var_binds = []
+        for _ in range(repetitions):  # la respuesta viene por filas
+            for index, cursor in enumerate(cursors):
+                following = next((oid for oid in ordered if oid > cursor), None)
+                if following is None:
+                    var_binds.append((cursor, EndOfMibView('')))
+                else:
+                    var_binds.append((following, self.table[following]))
+                    cursors[index] = following
+        return None, 0, 0, var_binds
+
+
+class FakeEngine:
+    def close_dispatcher(self):
+        pass
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = FakeAgent({})
+    monkeypatch.setattr(snmp_client, 'get_cmd', agent.get_cmd)
+    monkeypatch.setattr(snmp_client, 'bulk_cmd', agent.bulk_cmd)
+    monkeypatch.setattr(snmp_client, 'SnmpEngine', FakeEngine)
+    for name in ('ObjectType', 'ObjectIdentity', 'ObjectName'):
+        monkeypatch.setattr(snmp_client, name, lambda value: value)
+    monkeypatch.setattr(SNMPConfig, 'BATCH_GET', True)
+    monkeypatch.setattr(SNMPConfig, 'MAX_OIDS_PER_PDU', 20)
+    return agent
+
+
+def _client(oids, tables=()):
+    client = SNMPClient(Device('ups', '127.0.0.1', oids=oids, tables=list(tables)))
+
+    async def transport():
+        return None
+    client._get_transport = transport
+    return client
+
+
+def _poll(client, oids, walk_tables=False):
+    return asyncio.run(client._get_all_async(oids, walk_tables))
+
+
+OIDS = {f'metric_{n}': f'1.3.6.1.4.1.99.{n}.0' for n in range(5)}
+
+
+def test_batches_capped_by_max_oids_per_pdu(agent, monkeypatch):
+    monkeypatch.setattr(SNMPConfig, 'MAX_OIDS_PER_PDU', 2)
+    agent.values = {oid: Integer(n) for n, oid in enumerate(OIDS.values())}
+    results = _poll(_client(OIDS), OIDS)
+    assert [len(pdu) for pdu in agent.gets] == [2, 2, 1]
+    assert results == {name: str(n) for n, name in enumerate(OIDS)}
+
+
+def test_rejected_oid_is_isolated_by_bisection(agent):
+    agent.values = {oid: Integer(n) for n, oid in enumerate(OIDS.values())}
+    agent.rejected = {OIDS['metric_3']}
+    results = _poll(_client(OIDS), OIDS)
+    assert results['metric_3'] is None
+    assert results['metric_0'] == '0' and results['metric_4'] == '4'
+    # 5 → 2 + 3 → (3) 1 + 2 → (2) 1 + 1: solo se repiten los lotes con el OID rechazado
+    assert [len(pdu) for pdu in agent.gets] == [5, 2, 3, 1, 2, 1, 1]
+
+
+def test_too_big_splits_until_pdus_fit(agent):
+    agent.values = {oid: Integer(n) for n, oid in enumerate(OIDS.values())}
+    agent.max_varbinds = 2
+    results = _poll(_client(OIDS), OIDS)
+    assert results == {name: str(n) for n, name in enumerate(OIDS)}
+
+
+def test_missing_oid_and_unconfigured_oid(agent):
+    oids = dict(OIDS, metric_none=None)
+    agent.values = {OIDS['metric_0']: Integer(1)}
+    results = _poll(_client(oids), oids)
+    assert results['metric_0'] == '1'
+    assert results['metric_1'] is None  # noSuchObject
+    assert 'metric_none' not in results
+
+
+def test_frequency_is_scaled(agent):
+    oids = {'input_frequency': '1.3.6.1.2.1.33.1.3.3.1.2.1'}
+    agent.values = {oids['input_frequency']: Integer(500)}
+    assert _poll(_client(oids), oids) == {'input_frequency': '50.0'}
+
+
+def test_unbatched_mode_sends_one_oid_per_get(agent, monkeypatch):
+    monkeypatch.setattr(SNMPConfig, 'BATCH_GET', False)
+    agent.values = {oid: Integer(n) for n, oid in enumerate(OIDS.values())}
+    _poll(_client(OIDS), OIDS)
+    assert [len(pdu) for pdu in agent.gets] == [1] * len(OIDS)
+
+
+INPUT = (1, 3, 6, 1, 2, 1, 33, 1, 3, 3, 1)
+OUTPUT = (1, 3, 6, 1, 2, 1, 33, 1, 4, 4, 1)
+ALARM = (1, 3, 6, 1, 2, 1, 33, 1, 6, 2, 1)
+AFTER_TABLES = (1, 3, 6, 1, 2, 1, 33, 1, 7, 1, 0)
+
+
+def _three_phase_ups():
+    table = {}
+    for phase in (1, 2, 3):
+        table[INPUT + (2, phase)] = Integer(500)        # frequency (0.1 Hz)
+        table[INPUT + (3, phase)] = Integer(228 + phase)  # voltage
+        table[OUTPUT + (2, phase)] = Integer(230)
+        table[OUTPUT + (5, phase)] = Integer(30 + phase)  # load
+    table[ALARM + (2, 1)] = ObjectName('1.3.6.1.2.1.33.1.6.3.2')   # onBattery
+    table[ALARM + (2, 2)] = ObjectName('1.3.6.1.4.1.534.1.7.8')     # alarma del fabricante
+    table[AFTER_TABLES] = Integer(0)
+    return table
+
+
+def test_tables_become_phase_keys_and_alarms(agent):
+    agent.table = _three_phase_ups()
+    oids = {'input_voltage': '1.3.6.1.2.1.33.1.3.3.1.3.1', 'status': '1.3.6.1.2.1.33.1.4.1.0'}
+    agent.values = {oids['status']: Integer(3)}
+    results = _poll(_client(oids, tables=('input', 'output', 'alarm')), oids, walk_tables=True)
+
+    assert results['status'] == '3'
+    assert results['input_voltage'] == '229'  # celda de la tabla, sin GET aparte
+    assert results['input_voltage_l3'] == '231'
+    assert results['input_frequency_l2'] == '50.0'
+    assert results['output_load'] == '31'
+    assert results['active_alarms'] == 'onBattery, 1.3.6.1.4.1.534.1.7.8'
+    assert agent.gets == [[oids['status']]]
+
+
+def test_walk_drops_finished_columns(agent, monkeypatch):
+    monkeypatch.setattr(SNMPConfig, 'BULK_MAX_REPETITIONS', 2)
+    agent.table = _three_phase_ups()
+    _poll(_client({}, tables=('input', 'alarm')), {}, walk_tables=True)
+    # 5 columnas con 2 filas; tras el primer PDU, alarm (2 filas) ya no sigue
+    widths = [len(oids) for _, oids in agent.bulks]
+    assert widths[0] == 5
+    assert widths[-1] < widths[0]
+
+
+def test_too_big_halves_repetitions(agent, monkeypatch):
+    monkeypatch.setattr(SNMPConfig, 'BULK_MAX_REPETITIONS', 8)
+    agent.table = _three_phase_ups()
+    agent.max_varbinds = 10
+    results = _poll(_client({}, tables=('output',)), {}, walk_tables=True)
+    # 4 columnas: 32 y 16 varbinds no entran, 8 sí
+    assert [repetitions for repetitions, _ in agent.bulks][:3] == [8, 4, 2]
+    assert results['output_voltage_l3'] == '230'
+
+
+def test_empty_alarm_table_clears_active_alarms(agent):
+    agent.table = {AFTER_TABLES: Integer(0)}
+    results = _poll(_client({}, tables=('alarm',)), {}, walk_tables=True)
+    assert results == {'active_alarms': ''}
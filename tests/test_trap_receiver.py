@@ -0,0 +1,61 @@
+"""
+Decodificación de traps/informs de UPS-MIB y XUPS-MIB (snmp-monitor/trap_receiver.py)
+"""
+from trap_receiver import SNMP_TRAP_OID, UPS_MINUTES_REMAINING, decode
+
+UPTIME = ('1.3.6.1.2.1.1.3.0', '12345')
+ALARM_DESCR = '1.3.6.1.2.1.33.1.6.2.1.2.7'
+WELL_KNOWN = '1.3.6.1.2.1.33.1.6.3.'
+
+
+def _trap(oid, *var_binds):
+    return [UPTIME, (SNMP_TRAP_OID, oid), *var_binds]
+
+
+def test_ups_on_battery_sets_status_and_runtime():
+    event = decode(_trap('1.3.6.1.2.1.33.2.1', (UPS_MINUTES_REMAINING, '25')))
+    assert event.name == 'onBattery'
+    assert event.values == {'status': '5', 'battery_runtime': '1500'}
+
+
+def test_on_battery_without_minutes_only_sets_status():
+    event = decode(_trap('1.3.6.1.2.1.33.2.1', (UPS_MINUTES_REMAINING, '')))
+    assert event.values == {'status': '5'}
+
+
+def test_xups_traps_share_specific_number_across_branches():
+    for prefix in ('1.3.6.1.4.1.534.1.11.', '1.3.6.1.4.1.534.1.11.4.'):
+        event = decode(_trap(prefix + '4'))
+        assert event.name == 'lowBattery'
+        assert event.values == {'battery_status': '3'}
+
+
+def test_unknown_xups_trap_keeps_its_number():
+    event = decode(_trap('1.3.6.1.4.1.534.1.11.99'))
+    assert event.name == 'xups99'
+    assert event.values == {}
+
+
+def test_alarm_added_maps_well_known_alarm():
+    event = decode(_trap('1.3.6.1.2.1.33.2.3', (ALARM_DESCR, WELL_KNOWN + '4')))
+    assert event.alarm == 'depletedBattery'
+    assert not event.removed
+    assert event.values == {'battery_status': '4'}
+
+
+def test_alarm_removed_implies_no_values():
+    event = decode(_trap('1.3.6.1.2.1.33.2.4', (ALARM_DESCR, WELL_KNOWN + '2')))
+    assert event.alarm == 'onBattery'
+    assert event.removed
+    assert event.values == {}
+
+
+def test_vendor_alarm_keeps_its_oid():
+    event = decode(_trap('1.3.6.1.2.1.33.2.3', (ALARM_DESCR, '1.3.6.1.4.1.534.1.7.8')))
+    assert event.alarm == '1.3.6.1.4.1.534.1.7.8'
+    assert event.values == {}
+
+
+def test_foreign_notification_is_ignored():
+    assert decode(_trap('1.3.6.1.6.3.1.1.5.3')) is None
+    assert decode([UPTIME]) is None
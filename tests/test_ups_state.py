@@ -0,0 +1,69 @@
+"""
+Persistencia del estado en memoria con escritura diferida (snmp-monitor/ups_state.py)
+"""
+import json
+import os
+from ups_state import UPSState
+
+NORMAL = {'status': '3', 'input_voltage': '230', 'temperature': '22'}
+
+
+def _saved(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_first_poll_is_written_at_once(data_dir):
+    state = UPSState('prueba', flush_interval=float('inf'))
+    state.update_state(dict(NORMAL))
+    assert _saved(state.state_file)['input_voltage'] == '230'
+
+
+def test_stable_poll_refreshes_last_update_when_due(data_dir):
+    state = UPSState('prueba', flush_interval=float('inf'))
+    state.update_state(dict(NORMAL))
+    first = _saved(state.state_file)['last_update']
+
+    state.update_state(dict(NORMAL))  # sin cambios: espera a flush_interval
+    assert _saved(state.state_file)['last_update'] == first
+
+    state.flush_interval = 0
+    state.update_state(dict(NORMAL))
+    assert _saved(state.state_file)['last_update'] == state.get_state()['last_update']
+    assert state.get_state()['last_update'] != first
+
+
+def test_minor_change_waits_for_flush(data_dir):
+    state = UPSState('prueba', flush_interval=float('inf'))
+    state.update_state(dict(NORMAL))
+    state.update_state(dict(NORMAL, input_voltage='231'))
+    assert _saved(state.state_file)['input_voltage'] == '230'
+    state.flush()
+    assert _saved(state.state_file)['input_voltage'] == '231'
+
+
+def test_primary_name_is_saved_outside_checksum(data_dir):
+    state = UPSState(None, primary_name='ups', flush_interval=0)
+    state.update_state(dict(NORMAL))
+    assert _saved(state.state_file)['_device'] == 'ups'
+    assert UPSState(None).get_state()['status'] == '3'
+
+
+def test_corrupt_state_is_quarantined(data_dir):
+    state = UPSState('prueba')
+    state.update_state(dict(NORMAL))
+    saved = _saved(state.state_file)
+    saved['status'] = '5'  # no coincide con _checksum
+    with open(state.state_file, 'w') as f:
+        json.dump(saved, f)
+
+    assert UPSState('prueba').get_state() == {}
+    assert not os.path.exists(state.state_file)
+    assert any(name.startswith('ups_state_prueba.json.corrupt-') for name in os.listdir(data_dir))
+
+
+def test_parse_numeric_with_units():
+    assert UPSState._parse_numeric('50.0 Hz') == 50.0
+    assert UPSState._parse_numeric('220') == 220.0
+    assert UPSState._parse_numeric('N/A') is None
+    assert UPSState._parse_numeric(None) is None